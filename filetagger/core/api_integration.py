@@ -1,19 +1,25 @@
 # core/api_integration.py
-import requests
+# requests tar en märkbar del av starttiden, så det laddas först i
+# funktionerna som gör nätverksanrop. Alla anrop går via http_client.
 from tkinter import messagebox
-from serpapi import GoogleSearch
 import threading
 import os # <--- DENNA RAD MÅSTE FINNAS!
 import tkinter as tk # <-- LÄGG TILL DENNA IMPORT
 
+from filetagger.core import geocode_cache, http_client
+
+IMGBB_UPLOAD_URL = "https://api.imgbb.com/1/upload"
+SERPAPI_SEARCH_URL = "https://serpapi.com/search.json"
+GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
 def upload_image_to_imgbb(file_path, imgbb_api_key):
+    import requests
     try:
         with open(file_path, "rb") as file:
-            url = "https://api.imgbb.com/1/upload"
             data = {"key": imgbb_api_key}
             files = {"image": (os.path.basename(file_path), file, "image/jpeg")}
-            response = requests.post(url, data=data, files=files)
-            response.raise_for_status()
+            response = http_client.post(IMGBB_UPLOAD_URL, "imgbb.upload", data=data, files=files,
+                                        timeout=(http_client.CONNECT_TIMEOUT, http_client.UPLOAD_READ_TIMEOUT))
             data = response.json()
             if data.get("success"):
                 return data["data"]["url"]
@@ -28,22 +34,22 @@ def upload_image_to_imgbb(file_path, imgbb_api_key):
         return None
 
 def analyze_image_with_google_lens(app):
-    selected_indices = app.file_listbox.curselection()
-    if len(selected_indices) != 1:
+    selected_ids = app.file_listbox.selected_ids()
+    if len(selected_ids) != 1:
         messagebox.showwarning("Varning", "Välj exakt en fil för analys.")
         return
 
     app.analyze_btn.config(state="disabled")
     app.show_progress()
 
-    thread = threading.Thread(target=_analyze_image_thread, args=(app, selected_indices))
+    # Sökvägen slås upp i UI-tråden; tråden rör inte fillistan
+    file_path = app.file_model.full_path(selected_ids[0])
+    thread = threading.Thread(target=_analyze_image_thread, args=(app, file_path))
     thread.start()
 
-def _analyze_image_thread(app, selected_indices):
+def _analyze_image_thread(app, file_path):
+    import requests
     try:
-        rel_path = app.file_listbox.get(selected_indices[0])
-        file_path = os.path.join(app.folder, rel_path)
-
         image_url = upload_image_to_imgbb(file_path, app.imgbb_api_key)
         if not image_url:
             app.root.after(0, lambda: app.hide_progress())
@@ -56,8 +62,9 @@ def _analyze_image_thread(app, selected_indices):
             "api_key": app.serpapi_api_key,
             "hl": "sv"
         }
-        search = GoogleSearch(params)
-        results = search.get_dict()
+        results = http_client.get(SERPAPI_SEARCH_URL, "serpapi.google_lens", params=params).json()
+        if "error" in results:
+            raise Exception(results["error"])
 
         tags = []
         if "knowledge_graph" in results:
@@ -117,15 +124,36 @@ def _update_tags(app, tags):
         # ... (felhantering) ...
         messagebox.showerror("Fel vid uppdatering", f"Kunde inte uppdatera taggfälten: {e}")
 
-def get_gps_coordinates_from_location(location, google_maps_api_key):
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
-    params = {
-        "address": location,
-        "key": google_maps_api_key
-    }
-    response = requests.get(url, params=params)
-    response.raise_for_status()
+def _geocode(kind, cache_key, params, endpoint, google_maps_api_key):
+    """Svaret från Geocoding API för params, från den lokala cachen om det finns där.
+
+    Bara svar med status OK eller ZERO_RESULTS sparas; fel som
+    REQUEST_DENIED eller OVER_QUERY_LIMIT frågas om nästa gång.
+    """
+    cache = geocode_cache.get_cache()
+    if cache is not None:
+        data = cache.get(kind, cache_key)
+        if data is not None:
+            return data
+    response = http_client.get(GEOCODE_URL, endpoint, params={**params, "key": google_maps_api_key})
     data = response.json()
+    if data.get("status") in ("OK", "ZERO_RESULTS"):
+        data = geocode_cache.trim_response(data)
+        if cache is not None:
+            cache.put(kind, cache_key, data)
+    return data
+
+def _reverse_geocode(lat, lon, google_maps_api_key):
+    """Slår upp mittpunkten i cachens rutnät, så att närliggande koordinater delar svar."""
+    cache = geocode_cache.get_cache()
+    if cache is not None:
+        lat, lon = cache.quantize(lat, lon)
+    latlng = f"{lat},{lon}"
+    return _geocode("latlng", latlng, {"latlng": latlng}, "maps.reverse_geocode", google_maps_api_key)
+
+def get_gps_coordinates_from_location(location, google_maps_api_key):
+    data = _geocode("address", geocode_cache.address_key(location), {"address": location},
+                    "maps.geocode", google_maps_api_key)
 
     if data["status"] != "OK":
         raise Exception(f"Kunde inte hämta koordinater: {data['status']}")
@@ -138,14 +166,7 @@ def get_gps_coordinates_from_location(location, google_maps_api_key):
     return lat, lon
 
 def get_place_from_gps_coordinates(lat, lon, google_maps_api_key, text_entries):
-    url = "https://maps.googleapis.com/maps/api/geocode/json"
-    params = {
-        "latlng": f"{lat},{lon}",
-        "key": google_maps_api_key
-    }
-    response = requests.get(url, params=params)
-    response.raise_for_status()
-    data = response.json()
+    data = _reverse_geocode(lat, lon, google_maps_api_key)
 
     if data["status"] != "OK":
         error_message = data.get("error_message", "Okänt fel")
@@ -181,3 +202,23 @@ def get_place_from_gps_coordinates(lat, lon, google_maps_api_key, text_entries):
     place_tags = list(dict.fromkeys(place_tags))
     place_tags = [tag for tag in place_tags if len(tag) > 2][:len(text_entries)]
     return place_tags
+
+PLACE_NAME_TYPES = ("locality", "postal_town", "sublocality", "administrative_area_level_2")
+
+def get_place_name_from_gps_coordinates(lat, lon, google_maps_api_key):
+    """Returnerar ortnamnet för koordinaterna (t.ex. "Visby"), eller None om inget hittas."""
+    data = _reverse_geocode(lat, lon, google_maps_api_key)
+
+    if data["status"] == "ZERO_RESULTS":
+        return None
+    if data["status"] != "OK":
+        error_message = data.get("error_message", "Okänt fel")
+        raise Exception(f"Kunde inte hämta plats: {data['status']}\nFelmeddelande: {error_message}")
+
+    # Den mest specifika orten vinner, oavsett vilket resultat den står i
+    for place_type in PLACE_NAME_TYPES:
+        for result in data["results"]:
+            for component in result.get("address_components", []):
+                if place_type in component.get("types", []):
+                    return component.get("long_name")
+    return None
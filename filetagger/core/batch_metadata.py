@@ -0,0 +1,372 @@
+# core/batch_metadata.py
+import base64
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tkinter import messagebox
+
+from filetagger.core.config import JOURNAL_DIR
+from filetagger.core.exif_reader import read_exif_bytes
+from filetagger.core.exif_writer import (TAG_DATE_TIME_ORIGINAL, TAG_GPS_LATITUDE, TAG_GPS_LATITUDE_REF,
+                                         TAG_GPS_LONGITUDE, TAG_GPS_LONGITUDE_REF, empty_exif, load_exif_bytes,
+                                         set_date_taken, set_gps, write_exif, write_exif_bytes)
+
+BATCH_WORKERS = 4     # Skrivningarna är mest I/O, så trådar räcker
+BATCH_POLL_MS = 100
+MAX_LISTED_FAILURES = 10
+
+_GPS_TAGS = {
+    "lat": TAG_GPS_LATITUDE,
+    "lat_ref": TAG_GPS_LATITUDE_REF,
+    "lon": TAG_GPS_LONGITUDE,
+    "lon_ref": TAG_GPS_LONGITUDE_REF,
+}
+
+class BatchEdit:
+    """En EXIF-ändring som görs likadant i varje fil i en batch."""
+    __slots__ = ("date_taken", "gps")
+
+    def __init__(self, date_taken=None, gps=None):
+        self.date_taken = date_taken  # "YYYY:MM:DD HH:MM:SS"
+        self.gps = gps                # (lat, lon)
+
+    def fields(self):
+        fields = set()
+        if self.date_taken:
+            fields.add("date_taken")
+        if self.gps:
+            fields.add("gps")
+        return fields
+
+    def apply(self, exif_dict):
+        if self.date_taken:
+            set_date_taken(exif_dict, self.date_taken)
+        if self.gps:
+            set_gps(exif_dict, *self.gps)
+
+    def describe(self):
+        parts = []
+        if self.date_taken:
+            parts.append(f"fotodatum {self.date_taken}")
+        if self.gps:
+            parts.append(f"GPS {self.gps[0]:.6f}, {self.gps[1]:.6f}")
+        return ", ".join(parts)
+
+class TagSnapshot:
+    """Återställer fält till värden som sparats med capture_tags; används för ångra och gör om."""
+    __slots__ = ("snapshot",)
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def fields(self):
+        return set(self.snapshot)
+
+    def apply(self, exif_dict):
+        restore_tags(exif_dict, self.snapshot)
+
+def capture_tags(exif_dict, fields):
+    """Sparar de fält som en ändring rör som en liten JSON-vänlig dict.
+
+    Bara de taggar som BatchEdit skriver sparas, så historiken behöver inte
+    hela EXIF-segmentet (med miniatyrbild) för varje fil.
+    """
+    snapshot = {}
+    if "date_taken" in fields:
+        value = exif_dict["Exif"].get(TAG_DATE_TIME_ORIGINAL)
+        snapshot["date_taken"] = value.decode("utf-8", errors="replace") if value else None
+    if "gps" in fields:
+        gps = {}
+        for name, tag in _GPS_TAGS.items():
+            value = exif_dict["GPS"].get(tag)
+            if isinstance(value, bytes):
+                gps[name] = value.decode("ascii", errors="replace")
+            elif value is not None:
+                gps[name] = [list(part) for part in value]
+        snapshot["gps"] = gps or None
+    return snapshot
+
+def restore_tags(exif_dict, snapshot):
+    if "date_taken" in snapshot:
+        if snapshot["date_taken"]:
+            set_date_taken(exif_dict, snapshot["date_taken"])
+        else:
+            exif_dict["Exif"].pop(TAG_DATE_TIME_ORIGINAL, None)
+    if "gps" in snapshot:
+        for tag in _GPS_TAGS.values():
+            exif_dict["GPS"].pop(tag, None)
+        for name, value in (snapshot["gps"] or {}).items():
+            if isinstance(value, str):
+                exif_dict["GPS"][_GPS_TAGS[name]] = value.encode("ascii")
+            else:
+                exif_dict["GPS"][_GPS_TAGS[name]] = [tuple(part) for part in value]
+
+class BatchJournal:
+    """Journal med filernas ursprungliga EXIF-data under en batch.
+
+    Innan någon fil ändras skrivs varje fils EXIF-segment (eller att den
+    saknade EXIF) till en JSONL-fil som synkas till disk. Journalen tas bort
+    när batchen är klar; finns den kvar när programmet startar avbröts
+    programmet mitt i en batch och filerna kan återställas från den.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def create(cls, description, originals, journal_dir=JOURNAL_DIR):
+        """originals är en lista med (sökväg, exif-bytes eller None)."""
+        os.makedirs(journal_dir, exist_ok=True)
+        path = os.path.join(journal_dir, f"batch-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"description": description, "created": time.time()}) + "\n")
+            for file_path, exif_bytes in originals:
+                exif = base64.b64encode(exif_bytes).decode("ascii") if exif_bytes else None
+                f.write(json.dumps({"path": file_path, "exif": exif}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return cls(path)
+
+    @classmethod
+    def pending(cls, journal_dir=JOURNAL_DIR):
+        """Journaler som finns kvar efter batcher som aldrig blev klara."""
+        return [cls(path) for path in sorted(glob.glob(os.path.join(journal_dir, "batch-*.jsonl")))]
+
+    def _read(self):
+        with open(self.path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            entries = []
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                exif = base64.b64decode(entry["exif"]) if entry["exif"] else None
+                entries.append((entry["path"], exif))
+        return header, entries
+
+    def description(self):
+        return self._read()[0].get("description", "")
+
+    def file_count(self):
+        return len(self._read()[1])
+
+    def restore(self, paths=None):
+        """Skriver tillbaka den ursprungliga EXIF-datan. paths begränsar till vissa filer.
+
+        Filer som redan har sin ursprungliga EXIF lämnas orörda. Returnerar
+        (antal återställda, lista med (sökväg, fel)).
+        """
+        _, entries = self._read()
+        if paths is not None:
+            paths = set(paths)
+            entries = [entry for entry in entries if entry[0] in paths]
+        restored = 0
+        failures = []
+        for file_path, original in entries:
+            try:
+                if read_exif_bytes(file_path) == original:
+                    continue
+                write_exif_bytes(file_path, original)
+                restored += 1
+            except Exception as e:
+                failures.append((file_path, str(e)))
+        return restored, failures
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def _read_original(file_path):
+    try:
+        return file_path, read_exif_bytes(file_path), None
+    except Exception as e:
+        return file_path, None, str(e)
+
+def _apply_edit(file_path, original, edit):
+    """Gör ändringen i filen och returnerar (före, efter) för de fält den rör."""
+    exif_dict = load_exif_bytes(original) if original else empty_exif()
+    fields = edit.fields()
+    before = capture_tags(exif_dict, fields)
+    edit.apply(exif_dict)
+    after = capture_tags(exif_dict, fields)
+    write_exif(file_path, exif_dict)
+    return before, after
+
+def apply_edit(app, file_path, edit, description):
+    """Gör edit i en enda fil direkt och för in den i historiken. Kastar ett undantag om det misslyckas."""
+    before, after = _apply_edit(file_path, read_exif_bytes(file_path), edit)
+    app.exif_reader.invalidate(file_path)
+    if edit.fields():
+        app.operation_journal.record("metadata", description, changes=[(file_path, before, after)])
+
+def start_batch_edit(app, file_paths, edit):
+    """Gör edit i alla filer i bakgrunden, med förlopp i verktygsfältet och möjlighet att avbryta."""
+    start_batch_edits(app, [(file_path, edit) for file_path in file_paths], edit.describe())
+
+def start_batch_edits(app, edits, description, on_done=None):
+    """Som start_batch_edit, men med en egen BatchEdit per fil. edits är en lista med (sökväg, edit).
+
+    De ändrade filerna förs in i historiken för ångra/gör om, eller, om
+    on_done anges, anropas on_done(ändringar) i stället, med None om
+    batchen avbröts eller inte kunde slutföras.
+    """
+    if app.batch_cancel_event is not None:
+        messagebox.showwarning("Varning", "En batchändring pågår redan.")
+        return
+    cancel_event = threading.Event()
+    result_queue = queue.Queue()
+    app.batch_cancel_event = cancel_event
+    threading.Thread(
+        target=_batch_thread,
+        args=(list(edits), description, result_queue, cancel_event),
+        daemon=True
+    ).start()
+    total = len(edits)
+    app.show_task_progress("batch", f"Sparar metadata... 0/{total}", 0, total, on_cancel=cancel_event.set)
+    file_paths = [file_path for file_path, _ in edits]
+    app.root.after(BATCH_POLL_MS, lambda: _poll_batch(app, result_queue, cancel_event, file_paths,
+                                                      description, on_done))
+
+def _batch_thread(edits, description, result_queue, cancel_event):
+    failures = []
+    journal = None
+    try:
+        edit_for = dict(edits)
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+            originals = list(pool.map(_read_original, edit_for))
+        readable = []
+        for file_path, original, error in originals:
+            if error is None:
+                readable.append((file_path, original))
+            else:
+                failures.append((file_path, error))
+        journal = BatchJournal.create(description, readable)
+
+        done_paths = []
+        changes = []
+        with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+            futures = {pool.submit(_apply_edit, file_path, original, edit_for[file_path]): file_path
+                       for file_path, original in readable}
+            finished = len(failures)
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                try:
+                    before, after = future.result()
+                    done_paths.append(futures[future])
+                    changes.append((futures[future], before, after))
+                except Exception as e:
+                    failures.append((futures[future], str(e)))
+                finished += 1
+                result_queue.put(("progress", finished))
+                if cancel_event.is_set():
+                    for pending in futures:
+                        pending.cancel()
+
+        if cancel_event.is_set():
+            restored, restore_failures = journal.restore(done_paths)
+            if not restore_failures:
+                journal.discard()
+            result_queue.put(("aborted", (restored, restore_failures)))
+        else:
+            journal.discard()
+            result_queue.put(("done", (len(done_paths), failures, changes)))
+    except Exception as e:
+        # Journalen lämnas kvar så att filerna kan återställas vid nästa start
+        print(f"Error in _batch_thread: {type(e).__name__}: {e}")
+        result_queue.put(("error", str(e)))
+
+def _format_failures(failures):
+    lines = [f"{os.path.basename(path)}: {error}" for path, error in failures[:MAX_LISTED_FAILURES]]
+    if len(failures) > MAX_LISTED_FAILURES:
+        lines.append(f"... och {len(failures) - MAX_LISTED_FAILURES} till")
+    return "\n".join(lines)
+
+def _poll_batch(app, result_queue, cancel_event, file_paths, description, on_done):
+    total = len(file_paths)
+    result = None
+    finished = None
+    try:
+        while True:
+            kind, payload = result_queue.get_nowait()
+            if kind == "progress":
+                finished = payload
+            else:
+                result = (kind, payload)
+                break
+    except queue.Empty:
+        pass
+
+    if result is None:
+        if finished is not None:
+            text = "Avbryter..." if cancel_event.is_set() else f"Sparar metadata... {finished}/{total}"
+            app.show_task_progress("batch", text, finished, total, on_cancel=cancel_event.set)
+        app.root.after(BATCH_POLL_MS, lambda: _poll_batch(app, result_queue, cancel_event, file_paths,
+                                                          description, on_done))
+        return
+
+    app.batch_cancel_event = None
+    app.hide_task_progress("batch")
+    for file_path in file_paths:
+        app.exif_reader.invalidate(file_path)
+    app.update_preview(None)
+    if app.current_file_path:
+        app.update_metadata(app.current_file_path)  # Samma fil kan ha ändrats
+    kind, payload = result
+    if on_done is not None:
+        on_done(payload[2] if kind == "done" else None)
+    elif kind == "done" and payload[2]:
+        app.operation_journal.record("metadata", description, changes=payload[2])
+    if kind == "done":
+        saved, failures, _ = payload
+        if failures:
+            messagebox.showwarning(
+                "Klart med fel",
+                f"Metadata sparades i {saved} av {total} filer. Följande misslyckades:\n\n{_format_failures(failures)}"
+            )
+        else:
+            messagebox.showinfo("Klart", f"Metadata har sparats i {saved} filer.")
+    elif kind == "aborted":
+        restored, restore_failures = payload
+        if restore_failures:
+            messagebox.showerror(
+                "Avbrutet",
+                f"Batchen avbröts. {restored} filer återställdes, men följande kunde inte återställas "
+                f"(journalen har sparats):\n\n{_format_failures(restore_failures)}"
+            )
+        else:
+            messagebox.showinfo("Avbrutet", f"Batchen avbröts och {restored} redan ändrade filer har återställts.")
+    else:
+        messagebox.showerror("Fel", f"Batchen kunde inte slutföras: {payload}\n\nFilerna kan återställas nästa gång programmet startar.")
+
+def recover_interrupted_batches(app):
+    """Erbjuder att återställa filer från batcher som avbröts när programmet stängdes eller kraschade."""
+    for journal in BatchJournal.pending():
+        try:
+            description = journal.description()
+            count = journal.file_count()
+        except (OSError, ValueError) as e:
+            print(f"Kunde inte läsa journalen {journal.path}: {e}")
+            continue
+        answer = messagebox.askyesno(
+            "Avbruten batch",
+            f"En batchändring ({description}) av {count} filer blev aldrig klar.\n\n"
+            "Vill du återställa filerna till hur de var före ändringen?"
+        )
+        if not answer:
+            journal.discard()
+            continue
+        restored, failures = journal.restore()
+        if failures:
+            messagebox.showerror(
+                "Fel",
+                f"{restored} filer återställdes, men följande misslyckades:\n\n{_format_failures(failures)}"
+            )
+        else:
+            journal.discard()
+            messagebox.showinfo("Klart", f"{restored} filer har återställts.")
@@ -3,27 +3,23 @@ import os
 import sys
 import json
 import string
-from dotenv import load_dotenv, find_dotenv
-
-# Läs in .env-filen MER ROBUST
-# find_dotenv() letar efter .env uppåt från denna fils katalog
-dotenv_path = find_dotenv(raise_error_if_not_found=False) # raise_error=False gör att det inte kraschar om den inte hittas
-
-
-if dotenv_path:
-    # Ladda från den specifika sökvägen som hittades
-    loaded = load_dotenv(dotenv_path=dotenv_path, override=True) # override=True kan hjälpa om variabler redan är satta i miljön
-else:
-    print("Warning: .env file not found by find_dotenv(). Will rely on existing environment variables if any.")
-    # Programmet fortsätter, men os.getenv() kommer troligen returnera "" för nycklarna
-
 
 SETTINGS_FILE = "resources/config/settings.json" # Ny sökväg för inställningar
+CACHE_DIR = "resources/cache" # Cachefiler som kan återskapas (index, miniatyrer m.m.)
+FILE_INDEX_FILE = os.path.join(CACHE_DIR, "file_index.sqlite")
+THUMBNAIL_CACHE_DIR = os.path.join(CACHE_DIR, "thumbnails")
+GRID_THUMBNAIL_CACHE_DIR = os.path.join(CACHE_DIR, "grid_thumbnails")
+METADATA_STORE_FILE = os.path.join(CACHE_DIR, "metadata.sqlite")
+ICON_CACHE_DIR = os.path.join(CACHE_DIR, "icons") # Färdigskalade knappbilder
+GEOCODE_CACHE_FILE = os.path.join(CACHE_DIR, "geocode.sqlite") # Sparade svar från Google Geocoding API
+JOURNAL_DIR = "resources/journal" # Journaler för att kunna återställa avbrutna ändringar
+OPERATION_HISTORY_FILE = os.path.join(JOURNAL_DIR, "history.jsonl") # Historik för ångra/gör om
 DEFAULT_SHORTCUT_KEYS = ["F1", "F2", "F3", "F4", "F5", "F6", "F7", "F8", "F9", "F10", "F11", "F12"]
 ALLOWED_SHORTCUT_KEYS = set(list(string.ascii_uppercase) + list(string.digits) + list(string.punctuation) +
                            ['F1', 'F2', 'F3', 'F4', 'F5', 'F6', 'F7', 'F8', 'F9', 'F10', 'F11', 'F12'])
 DISALLOWED_KEYS = {"CAPSLOCK", "TAB", "ESCAPE"}
 DEFAULT_ALLOWED_EXTENSIONS = [".jpg", ".png", ".jpeg", ".gif"]
+ARCHIVE_DIR_NAME = "Arkiv" # Undermapp dit arkiverade filer flyttas, hoppas över vid listning
 
 # Funktion för att hitta resurser i både paketerad och opakterad miljö
 def resource_path(relative_path):
@@ -36,6 +32,22 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, "resources", "icons", relative_path) # Ändrat sökvägen till "resources/icons"
 
+def load_environment():
+    """Läser in API-nycklarna från .env. Anropas från load_settings i stället för vid
+    import, så att moduler som bara behöver konstanterna här slipper sökningen."""
+    from dotenv import load_dotenv, find_dotenv
+
+    # Läs in .env-filen MER ROBUST
+    # find_dotenv() letar efter .env uppåt från denna fils katalog
+    dotenv_path = find_dotenv(raise_error_if_not_found=False) # raise_error=False gör att det inte kraschar om den inte hittas
+
+    if dotenv_path:
+        # Ladda från den specifika sökvägen som hittades
+        load_dotenv(dotenv_path=dotenv_path, override=True) # override=True kan hjälpa om variabler redan är satta i miljön
+    else:
+        print("Warning: .env file not found by find_dotenv(). Will rely on existing environment variables if any.")
+        # Programmet fortsätter, men os.getenv() kommer troligen returnera "" för nycklarna
+
 def load_settings():
     # Standardvärden för inställningar som *ska* sparas/laddas från JSON
     default_persistent_settings = {
@@ -47,8 +59,10 @@ def load_settings():
         "horizontal_sash_pos": 300,
         "vertical_sash_pos": 400,
         "metadata_sash_pos": 300,
-        "archived_files": [],
-        "external_viewer_path": ""
+        "archived_files": [], # Läses bara för att föra över gamla arkiveringar till historiken
+        "external_viewer_path": "",
+        "gpx_clock_offset": "+00:00",
+        "rename_template": "{date:%Y%m%d}_{seq}"
     }
 
     # Skapa en kopia att arbeta med
@@ -69,6 +83,7 @@ def load_settings():
             print(f"Varning: Fel vid läsning av {SETTINGS_FILE}: {e}. Använder standardvärden.")
 
     # Läs ALLTID API-nycklar från miljövariabler (laddade från .env)
+    load_environment()
     # Ge tom sträng som standard om de inte finns
     settings["imgbb_api_key"] = os.getenv("IMGBB_API_KEY", "")
     settings["serpapi_api_key"] = os.getenv("SERPAPI_API_KEY", "")
@@ -92,6 +107,7 @@ def load_settings():
     return settings
 
 def save_settings(app):
+    """Lämnar över alla inställningar till app.settings_store. Läser fönstrets mått från Tk."""
     window_geometry = app.root.geometry()
     horizontal_sash_pos = app.paned_window.sashpos(0)
     vertical_sash_pos = app.right_paned_window.sashpos(0)
@@ -111,14 +127,10 @@ def save_settings(app):
         # "imgbb_api_key": app.imgbb_api_key,        # << BORTTAGEN
         # "serpapi_api_key": app.serpapi_api_key,    # << BORTTAGEN
         # "google_maps_api_key": app.google_maps_api_key, # << BORTTAGEN
-        "archived_files": app.archived_files,
         "external_viewer_path": app.external_viewer_path,
+        "gpx_clock_offset": app.gpx_clock_offset,
+        "rename_template": app.rename_template,
     }
 
-    try:
-        # Säkerställ att katalogen finns
-        os.makedirs(os.path.dirname(SETTINGS_FILE), exist_ok=True)
-        with open(SETTINGS_FILE, "w") as f:
-            json.dump(settings_to_save, f, indent=4) # Lägg till indent för läsbarhet
-    except Exception as e:
-         print(f"Fel vid sparande av inställningar till {SETTINGS_FILE}: {e}")
+    # Själva skrivningen görs av SettingsStore i bakgrunden
+    app.settings_store.replace(settings_to_save)
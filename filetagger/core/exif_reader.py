@@ -0,0 +1,174 @@
+# core/exif_reader.py
+import os
+import struct
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+EXIF_CACHE_ENTRIES = 4096
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+
+class ImageMetadata:
+    """Metadata för en bild, så som den visas i metadatapanelen."""
+    __slots__ = ("width", "height", "date_taken", "make", "model",
+                 "latitude", "longitude", "mtime", "file_size")
+
+    def __init__(self, mtime, file_size):
+        self.width = None
+        self.height = None
+        self.date_taken = None
+        self.make = None
+        self.model = None
+        self.latitude = None
+        self.longitude = None
+        self.mtime = mtime
+        self.file_size = file_size
+
+def get_gps_coord(gps_data, coord_tag, ref_tag):
+    coord = gps_data.get(coord_tag)
+    ref = gps_data.get(ref_tag)
+    if not coord or not ref:
+        return None
+    ref = ref.decode('utf-8')
+    try:
+        degrees = coord[0][0] / coord[0][1]
+        minutes = coord[1][0] / coord[1][1]
+        seconds = coord[2][0] / coord[2][1]
+    except (ZeroDivisionError, IndexError, TypeError):
+        return None
+    decimal = degrees + (minutes / 60.0) + (seconds / 3600.0)
+    if ref in ["S", "W"]:
+        decimal = -decimal
+    return decimal
+
+def _read_jpeg_header(f):
+    """Går igenom JPEG-segmenten fram till bilddatat.
+
+    Returnerar (storlek, exif) där exif är APP1-segmentets innehåll
+    (börjar med b"Exif\\0\\0"). Ingenting efter SOF-segmentet läses.
+    """
+    size = None
+    exif = None
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            break
+        code = marker[1]
+        while code == 0xFF:  # Utfyllnadsbyte före markören
+            byte = f.read(1)
+            if not byte:
+                return size, exif
+            code = byte[0]
+        if code in JPEG_STANDALONE_MARKERS:
+            continue
+        if code in (0xD9, 0xDA):  # Slut på bilden eller början på bilddatat
+            break
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            break
+        length = struct.unpack(">H", length_bytes)[0] - 2
+        if code == 0xE1 and exif is None:
+            data = f.read(length)
+            if data.startswith(b"Exif\x00\x00"):
+                exif = data
+        elif code in JPEG_SOF_MARKERS:
+            sof = f.read(5)
+            if len(sof) != 5:
+                raise ValueError("Ogiltig JPEG-fil: SOF-segmentet är avkortat.")
+            height, width = struct.unpack(">xHH", sof)
+            size = (width, height)
+            break  # EXIF ligger alltid före SOF
+        else:
+            f.seek(length, os.SEEK_CUR)
+    return size, exif
+
+def _decode_text(value):
+    if not value:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("utf-8", errors="replace")
+    return value.rstrip("\x00").strip() or None
+
+def _apply_exif(metadata, exif_raw):
+    import piexif  # Laddas först när en fil med EXIF läses
+    exif_dict = piexif.load(exif_raw)
+    exif_data = exif_dict.get("Exif", {})
+    zeroth_ifd = exif_dict.get("0th", {})
+    gps_data = exif_dict.get("GPS", {})
+    metadata.date_taken = (_decode_text(exif_data.get(piexif.ExifIFD.DateTimeOriginal))
+                           or _decode_text(exif_data.get(piexif.ExifIFD.DateTimeDigitized)))
+    metadata.make = _decode_text(zeroth_ifd.get(piexif.ImageIFD.Make))
+    metadata.model = _decode_text(zeroth_ifd.get(piexif.ImageIFD.Model))
+    metadata.latitude = get_gps_coord(gps_data, piexif.GPSIFD.GPSLatitude, piexif.GPSIFD.GPSLatitudeRef)
+    metadata.longitude = get_gps_coord(gps_data, piexif.GPSIFD.GPSLongitude, piexif.GPSIFD.GPSLongitudeRef)
+
+def read_exif_bytes(path):
+    """Returnerar den råa EXIF-datan från filhuvudet (börjar med b"Exif\\0\\0"), eller None."""
+    with open(path, "rb") as f:
+        if f.read(2) == b"\xff\xd8":
+            return _read_jpeg_header(f)[1]
+        f.seek(0)
+        with Image.open(f) as img:
+            return img.info.get("exif")
+
+def read_metadata(path, st=None):
+    """Läser metadata från filhuvudet utan att avkoda bilden.
+
+    För JPEG läses bara segmenten fram till SOF; andra format öppnas med
+    Pillow, som också bara läser huvudet. st kan anges om anroparen redan
+    har gjort os.stat på filen.
+    """
+    with open(path, "rb") as f:
+        if st is None:
+            st = os.fstat(f.fileno())
+        metadata = ImageMetadata(st.st_mtime, st.st_size)
+        if f.read(2) == b"\xff\xd8":
+            size, exif_raw = _read_jpeg_header(f)
+        else:
+            f.seek(0)
+            with Image.open(f) as img:
+                size = img.size
+                exif_raw = img.info.get("exif")
+    if size:
+        metadata.width, metadata.height = size
+    if exif_raw and isinstance(exif_raw, bytes):
+        try:
+            _apply_exif(metadata, exif_raw)
+        except Exception as e:
+            print(f"Fel vid läsning av EXIF-data: {e}")
+    return metadata
+
+class ExifReader:
+    """Läser bildmetadata och cachar resultatet.
+
+    Nyckeln är (sökväg, mtime, storlek), så en fil som ändrats läses om
+    medan en oförändrad fil bara kostar ett os.stat. Klassen är trådsäker.
+    """
+    def __init__(self, max_entries=EXIF_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()  # sökväg -> ((mtime_ns, storlek), ImageMetadata)
+        self._lock = threading.Lock()
+
+    def read(self, path):
+        """Returnerar ImageMetadata för filen. Kastar OSError eller ValueError om den inte går att läsa."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            cached = self._cache.get(path)
+            if cached is not None and cached[0] == stamp:
+                self._cache.move_to_end(path)
+                return cached[1]
+        metadata = read_metadata(path, st)
+        with self._lock:
+            self._cache[path] = (stamp, metadata)
+            self._cache.move_to_end(path)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return metadata
+
+    def invalidate(self, path):
+        """Glömmer filen, t.ex. efter att dess EXIF skrivits om; mtime räcker inte på alla filsystem."""
+        with self._lock:
+            self._cache.pop(os.path.abspath(path), None)
@@ -0,0 +1,144 @@
+# core/exif_writer.py
+import os
+import shutil
+import struct
+from PIL import Image
+
+from filetagger.core.exif_reader import JPEG_STANDALONE_MARKERS
+from filetagger.core.file_transfer import stream_copy
+
+EXIF_HEADER = b"Exif\x00\x00"
+MAX_SEGMENT_PAYLOAD = 0xFFFF - 2  # Ett JPEG-segment kan inte bli större än så
+
+# EXIF-taggarna som skrivs här (piexif.ExifIFD.DateTimeOriginal, piexif.GPSIFD.GPSLatitude osv.).
+# Numren står här så att piexif bara laddas när EXIF faktiskt tolkas eller skrivs.
+TAG_DATE_TIME_ORIGINAL = 0x9003
+TAG_GPS_LATITUDE_REF = 1
+TAG_GPS_LATITUDE = 2
+TAG_GPS_LONGITUDE_REF = 3
+TAG_GPS_LONGITUDE = 4
+
+def empty_exif():
+    return {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}, "thumbnail": None}
+
+def load_exif_bytes(exif_raw):
+    """Tolkar ett EXIF-segment till en piexif-dict."""
+    import piexif  # Laddas först när EXIF tolkas, inte vid start
+    return piexif.load(exif_raw)
+
+def set_date_taken(exif_dict, date_taken):
+    """date_taken är en sträng i formatet YYYY:MM:DD HH:MM:SS."""
+    exif_dict["Exif"][TAG_DATE_TIME_ORIGINAL] = date_taken.encode('utf-8')
+
+def set_gps(exif_dict, lat, lon):
+    lat_ref = "N" if lat >= 0 else "S"
+    lon_ref = "E" if lon >= 0 else "W"
+    lat = abs(lat)
+    lon = abs(lon)
+
+    lat_deg = int(lat)
+    lat_min = int((lat - lat_deg) * 60)
+    lat_sec = int((lat - lat_deg - lat_min / 60) * 3600 * 10000)
+    lon_deg = int(lon)
+    lon_min = int((lon - lon_deg) * 60)
+    lon_sec = int((lon - lon_deg - lon_min / 60) * 3600 * 10000)
+
+    exif_dict["GPS"][TAG_GPS_LATITUDE] = [(lat_deg, 1), (lat_min, 1), (lat_sec, 10000)]
+    exif_dict["GPS"][TAG_GPS_LATITUDE_REF] = lat_ref.encode('utf-8')
+    exif_dict["GPS"][TAG_GPS_LONGITUDE] = [(lon_deg, 1), (lon_min, 1), (lon_sec, 10000)]
+    exif_dict["GPS"][TAG_GPS_LONGITUDE_REF] = lon_ref.encode('utf-8')
+
+def write_exif(path, exif_dict):
+    """Skriver exif_dict till filen, se write_exif_bytes."""
+    import piexif
+    write_exif_bytes(path, piexif.dump(exif_dict))
+
+def write_exif_bytes(path, exif_bytes):
+    """Ersätter filens EXIF med exif_bytes, eller tar bort den om exif_bytes är None.
+
+    För JPEG byts bara APP1/EXIF-segmentet ut; övriga segment (ICC-profil,
+    XMP, tillverkardata) och den komprimerade bilden kopieras byte för byte,
+    så bilden avkodas aldrig och förlorar ingen kvalitet. Andra format sparas
+    om med Pillow. Resultatet skrivs till en temporär fil i samma katalog som
+    sedan ersätter originalet atomärt.
+    """
+    with open(path, "rb") as f:
+        is_jpeg = f.read(2) == b"\xff\xd8"
+    temp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.{os.getpid()}.tmp")
+    try:
+        if is_jpeg:
+            _write_jpeg_with_exif(path, temp_path, exif_bytes)
+        else:
+            with Image.open(path) as img:
+                img.save(temp_path, format=img.format, exif=exif_bytes or b"")
+        shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+def _read_header_segments(src):
+    """Läser segmenten före bilddatat. Returnerar (segment, exif_index) där segment är råa bytes.
+
+    exif_index är platsen där EXIF-segmentet låg eller ska in: där det gamla
+    låg, annars efter ett inledande JFIF-segment (APP0).
+    """
+    segments = []
+    exif_index = None
+    while True:
+        position = src.tell()
+        marker = src.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise ValueError("Ogiltig JPEG-fil: segmenten före bilddatat kunde inte läsas.")
+        code = marker[1]
+        while code == 0xFF:
+            byte = src.read(1)
+            if not byte:
+                raise ValueError("Ogiltig JPEG-fil: filen tar slut i ett segmenthuvud.")
+            code = byte[0]
+        if code in (0xDA, 0xD9):
+            src.seek(position)  # Resten, från SOS, kopieras oförändrat
+            break
+        if code in JPEG_STANDALONE_MARKERS:
+            segments.append(bytes((0xFF, code)))
+            continue
+        length_bytes = src.read(2)
+        if len(length_bytes) != 2:
+            raise ValueError("Ogiltig JPEG-fil: filen tar slut i ett segmenthuvud.")
+        length = struct.unpack(">H", length_bytes)[0]
+        if length < 2:
+            raise ValueError("Ogiltig JPEG-fil: ett segment har ogiltig längd.")
+        data = src.read(length - 2)
+        if len(data) != length - 2:
+            raise ValueError("Ogiltig JPEG-fil: ett segment är avkortat.")
+        if code == 0xE1 and data.startswith(EXIF_HEADER):
+            if exif_index is None:
+                exif_index = len(segments)
+            continue  # Det gamla EXIF-segmentet ersätts
+        segments.append(bytes((0xFF, code)) + length_bytes + data)
+    if exif_index is None:
+        exif_index = 1 if segments and segments[0][1] == 0xE0 else 0
+    return segments, exif_index
+
+def _write_jpeg_with_exif(path, temp_path, exif_bytes):
+    exif_segment = None
+    if exif_bytes:
+        payload = exif_bytes if exif_bytes.startswith(EXIF_HEADER) else EXIF_HEADER + exif_bytes
+        if len(payload) > MAX_SEGMENT_PAYLOAD:
+            raise ValueError(f"EXIF-datan är för stor för ett JPEG-segment ({len(payload)} byte).")
+        exif_segment = b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+
+    with open(path, "rb") as src, open(temp_path, "wb") as dst:
+        src.read(2)
+        segments, exif_index = _read_header_segments(src)
+        if exif_segment is not None:
+            segments.insert(exif_index, exif_segment)
+        dst.write(b"\xff\xd8")
+        dst.write(b"".join(segments))
+        dst.flush()
+        stream_copy(src, dst)
+        dst.flush()
+        os.fsync(dst.fileno())
@@ -0,0 +1,172 @@
+# core/file_index.py
+import os
+import sqlite3
+
+from filetagger.core.config import ARCHIVE_DIR_NAME, FILE_INDEX_FILE
+
+COMMIT_EVERY_DIRS = 200  # Hur många omskannade kataloger som samlas per transaktion
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    root TEXT NOT NULL,
+    rel_dir TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (root, rel_dir)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS files (
+    root TEXT NOT NULL,
+    rel_path TEXT NOT NULL,
+    rel_dir TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    ext TEXT NOT NULL,
+    PRIMARY KEY (root, rel_path)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS files_by_dir ON files (root, rel_dir);
+"""
+
+def index_root(folder):
+    """Normaliserad nyckel för en rotkatalog i indexet."""
+    return os.path.normcase(os.path.abspath(folder))
+
+class FileIndex:
+    """Beständigt index över filerna i en katalog, lagrat i SQLite.
+
+    Varje fil lagras med relativ sökväg, storlek, mtime, inode och filändelse.
+    Katalogernas mtime sparas också, så att en ny skanning bara behöver läsa om
+    kataloger vars innehåll har ändrats sedan förra gången.
+
+    En instans får bara användas från tråden som skapade den.
+    """
+    def __init__(self, db_path=FILE_INDEX_FILE):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def iter_files(self, folder, extensions, batch_size=1000):
+        """Ger listor med relativa sökvägar för indexerade filer med en av filändelserna."""
+        extensions = sorted({ext.lower() for ext in extensions})
+        if not extensions:
+            return
+        placeholders = ",".join("?" * len(extensions))
+        cursor = self.conn.execute(
+            f"SELECT rel_path FROM files WHERE root = ? AND ext IN ({placeholders}) ORDER BY rel_path",
+            (index_root(folder), *extensions)
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [row[0] for row in rows]
+
+    def refresh(self, folder, on_added=None, on_removed=None, cancel_event=None):
+        """Uppdaterar indexet mot filsystemet.
+
+        Bara kataloger som är nya eller vars mtime har ändrats läses om; övriga
+        kataloger stat:as en gång var. on_added och on_removed anropas med listor
+        av (rel_path, ext) respektive rel_path för filer som tillkommit eller
+        försvunnit. Returnerar False om skanningen avbröts via cancel_event.
+
+        Observera att en fil som skrivs om på plats inte ändrar katalogens mtime,
+        så dess storlek och mtime i indexet uppdateras först när katalogen ändras.
+        """
+        root = index_root(folder)
+        conn = self.conn
+        known_dirs = dict(conn.execute("SELECT rel_dir, mtime_ns FROM dirs WHERE root = ?", (root,)))
+        known_children = {}
+        for rel_dir in known_dirs:
+            if rel_dir:
+                known_children.setdefault(os.path.dirname(rel_dir), []).append(rel_dir)
+
+        seen_dirs = set()
+        dirty_dirs = 0
+        stack = [""]
+        while stack:
+            if cancel_event is not None and cancel_event.is_set():
+                conn.commit()
+                return False
+            rel_dir = stack.pop()
+            dir_path = os.path.join(folder, rel_dir) if rel_dir else folder
+            try:
+                dir_mtime = os.stat(dir_path).st_mtime_ns
+            except OSError:
+                continue
+            seen_dirs.add(rel_dir)
+
+            if known_dirs.get(rel_dir) == dir_mtime:
+                # Oförändrad katalog: fortsätt bara ner i de kända underkatalogerna
+                stack.extend(known_children.get(rel_dir, ()))
+                continue
+
+            subdirs, added, removed = self._rescan_dir(root, dir_path, rel_dir, dir_mtime)
+            stack.extend(reversed(subdirs))
+            if added and on_added:
+                on_added(added)
+            if removed and on_removed:
+                on_removed(removed)
+            dirty_dirs += 1
+            if dirty_dirs % COMMIT_EVERY_DIRS == 0:
+                conn.commit()
+
+        # Kataloger som inte längre finns tas bort tillsammans med sina filer
+        vanished = [rel_dir for rel_dir in known_dirs if rel_dir not in seen_dirs]
+        for rel_dir in vanished:
+            removed = [row[0] for row in conn.execute(
+                "SELECT rel_path FROM files WHERE root = ? AND rel_dir = ?", (root, rel_dir)
+            )]
+            conn.execute("DELETE FROM files WHERE root = ? AND rel_dir = ?", (root, rel_dir))
+            conn.execute("DELETE FROM dirs WHERE root = ? AND rel_dir = ?", (root, rel_dir))
+            if removed and on_removed:
+                on_removed(removed)
+        conn.commit()
+        return True
+
+    def _rescan_dir(self, root, dir_path, rel_dir, dir_mtime):
+        conn = self.conn
+        old_files = {
+            row[0]: row[1:] for row in conn.execute(
+                "SELECT rel_path, size, mtime_ns, inode FROM files WHERE root = ? AND rel_dir = ?",
+                (root, rel_dir)
+            )
+        }
+        subdirs = []
+        added = []
+        rows = []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name != ARCHIVE_DIR_NAME:
+                                subdirs.append(os.path.join(rel_dir, entry.name) if rel_dir else entry.name)
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                    ext = os.path.splitext(entry.name)[1].lower()
+                    values = (st.st_size, st.st_mtime_ns, st.st_ino)
+                    previous = old_files.pop(rel_path, None)
+                    if previous is None:
+                        added.append((rel_path, ext))
+                    if previous != values:
+                        rows.append((root, rel_path, rel_dir, *values, ext))
+        except OSError as e:
+            print(f"Kunde inte läsa katalogen {dir_path}: {e}")
+            return [], [], []
+
+        conn.executemany(
+            "INSERT OR REPLACE INTO files (root, rel_path, rel_dir, size, mtime_ns, inode, ext) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        removed = list(old_files)
+        conn.executemany("DELETE FROM files WHERE root = ? AND rel_path = ?", [(root, p) for p in removed])
+        conn.execute("INSERT OR REPLACE INTO dirs (root, rel_dir, mtime_ns) VALUES (?, ?, ?)",
+                     (root, rel_dir, dir_mtime))
+        return subdirs, added, removed
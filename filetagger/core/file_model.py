@@ -0,0 +1,155 @@
+# core/file_model.py
+import os
+from array import array
+
+SMALL_LOOKUP = 64  # Upp till så många id:n slås upp ett och ett, annars ett varv över listan
+
+class FileEntry:
+    """En listad fil: katalogen lagras som ett internerat id, namnet separat."""
+    __slots__ = ("file_id", "dir_id", "name")
+
+    def __init__(self, file_id, dir_id, name):
+        self.file_id = file_id
+        self.dir_id = dir_id
+        self.name = name
+
+class FileModel:
+    """Kompakt modell över filerna som visas i fillistan.
+
+    Varje fil får ett stabilt heltals-id som behålls vid namnbyte. Katalogdelen
+    av sökvägen lagras en gång per katalog och visningsordningen hålls i en
+    array av id:n. Fillistan i UI:t visar bara modellen; all kod som behöver
+    veta vilka filer som finns frågar modellen i stället för widgeten.
+    """
+    def __init__(self, folder=""):
+        self.folder = folder
+        self._dirs = []        # dir_id -> relativ katalog
+        self._dir_ids = {}     # relativ katalog -> dir_id
+        self._by_dir = []      # dir_id -> {namn: file_id}
+        self._entries = {}     # file_id -> FileEntry
+        self._order = array("q")
+        self._next_id = 0      # Id:n återanvänds aldrig, inte ens efter reset()
+
+    def reset(self, folder):
+        self.folder = folder
+        self._dirs = []
+        self._dir_ids = {}
+        self._by_dir = []
+        self._entries = {}
+        self._order = array("q")
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, file_id):
+        return file_id in self._entries
+
+    def _dir_id(self, rel_dir):
+        dir_id = self._dir_ids.get(rel_dir)
+        if dir_id is None:
+            dir_id = len(self._dirs)
+            self._dirs.append(rel_dir)
+            self._dir_ids[rel_dir] = dir_id
+            self._by_dir.append({})
+        return dir_id
+
+    def _new_entry(self, rel_path):
+        rel_dir, name = os.path.split(rel_path)
+        dir_id = self._dir_id(rel_dir)
+        file_id = self._next_id
+        self._next_id += 1
+        self._entries[file_id] = FileEntry(file_id, dir_id, name)
+        self._by_dir[dir_id][name] = file_id
+        return file_id
+
+    # ----- Ändringar -----
+
+    def extend(self, rel_paths):
+        """Lägger till filer sist i listan och returnerar deras id:n."""
+        file_ids = [self._new_entry(rel_path) for rel_path in rel_paths]
+        self._order.extend(file_ids)
+        return file_ids
+
+    def remove(self, file_ids):
+        """Tar bort filerna med de angivna id:na. Returnerar antal borttagna."""
+        file_ids = {file_id for file_id in file_ids if file_id in self._entries}
+        if not file_ids:
+            return 0
+        if len(file_ids) <= SMALL_LOOKUP:
+            for file_id in file_ids:
+                self._order.remove(file_id)
+        else:
+            self._order = array("q", (file_id for file_id in self._order if file_id not in file_ids))
+        for file_id in file_ids:
+            entry = self._entries.pop(file_id)
+            self._by_dir[entry.dir_id].pop(entry.name, None)
+        return len(file_ids)
+
+    def rename(self, file_id, new_rel_path):
+        """Byter sökväg för en fil; id och plats i listan behålls."""
+        entry = self._entries[file_id]
+        self._by_dir[entry.dir_id].pop(entry.name, None)
+        rel_dir, name = os.path.split(new_rel_path)
+        entry.dir_id = self._dir_id(rel_dir)
+        entry.name = name
+        self._by_dir[entry.dir_id][name] = file_id
+
+    # ----- Uppslag -----
+
+    def find(self, rel_path):
+        """Returnerar id för en relativ sökväg, eller None om filen inte är listad."""
+        rel_dir, name = os.path.split(rel_path)
+        dir_id = self._dir_ids.get(rel_dir)
+        if dir_id is None:
+            return None
+        return self._by_dir[dir_id].get(name)
+
+    def rel_path(self, file_id):
+        entry = self._entries[file_id]
+        rel_dir = self._dirs[entry.dir_id]
+        return os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+
+    def full_path(self, file_id):
+        return os.path.join(self.folder, self.rel_path(file_id))
+
+    def name(self, file_id):
+        return self._entries[file_id].name
+
+    def id_at(self, position):
+        return self._order[position]
+
+    def ids_between(self, first, last):
+        return self._order[first:last + 1]
+
+    def all_ids(self):
+        return self._order
+
+    def display_text(self, position):
+        return self.rel_path(self._order[position])
+
+    def ids_under(self, rel_dir):
+        """Id:n för alla listade filer i rel_dir och dess underkataloger."""
+        prefix = rel_dir + os.sep
+        file_ids = []
+        for dir_id, current in enumerate(self._dirs):
+            if current == rel_dir or current.startswith(prefix):
+                file_ids.extend(self._by_dir[dir_id].values())
+        return file_ids
+
+    def positions_of(self, file_ids):
+        """Sorterade positioner i listan för de angivna id:na."""
+        file_ids = set(file_ids)
+        if len(file_ids) <= SMALL_LOOKUP:
+            positions = []
+            for file_id in file_ids:
+                if file_id in self._entries:
+                    positions.append(self._order.index(file_id))
+            return sorted(positions)
+        return [position for position, file_id in enumerate(self._order) if file_id in file_ids]
+
+    def in_order(self, file_ids):
+        """Returnerar id:na sorterade efter plats i listan."""
+        file_ids = list(file_ids)
+        if len(file_ids) <= 1:
+            return file_ids
+        return [self._order[position] for position in self.positions_of(file_ids)]
@@ -1,42 +1,254 @@
 # core/file_operations.py
 import os
+import queue
+import sqlite3
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
+from filetagger.core.config import ARCHIVE_DIR_NAME
+from filetagger.core import rename_engine, startup_profile
+from filetagger.core.file_index import FileIndex
+from filetagger.core.folder_watcher import FolderWatcher
+from filetagger.core.metadata_extraction import start_extraction, cancel_extraction
+
+SCAN_BATCH_SIZE = 500      # Antal sökvägar per omgång från skanningstråden
+SCAN_POLL_MS = 50          # Hur ofta UI-tråden hämtar nya omgångar
+SCAN_MAX_PER_POLL = 5000   # Tak för antal rader som läggs in per UI-uppdatering
+
 def select_folder(app):
     initial_dir = app.folder if app.folder and os.path.isdir(app.folder) else os.path.expanduser("~")
     folder_selected = filedialog.askdirectory(initialdir=initial_dir)
     if folder_selected:
         app.folder = folder_selected
         app.path_label.config(text=f"Sökväg: {app.folder}")
-        app.archived_files = []
         app.last_archived_label.config(text="Senast arkiverad: Ingen")
         app.save_settings()
         list_files(app)
 
 def list_files(app):
-    app.file_listbox.delete(0, tk.END)
+    cancel_scan(app)
+    app.rename_queue.clear()  # Köade namnbyten gäller filerna i den gamla listan
+    app.file_model.reset(app.folder)
+    app.file_listbox.refresh()
     if not app.folder or not os.path.isdir(app.folder):
         app.file_count_label.config(text="Filer: 0")
-        app.file_listbox.insert(tk.END, "Katalogen är ogiltig eller tom.")
+        app.file_listbox.set_placeholder("Katalogen är ogiltig eller tom.")
         print("Folder is invalid or empty.")
         return
 
-    file_count = 0
-    for root_dir, _, files in os.walk(app.folder):
-        if "Arkiv" in os.path.relpath(root_dir, app.folder).split(os.sep):
+    app.file_listbox.set_placeholder("")
+    app.file_count_label.config(text="Filer: 0 (söker...)")
+    app.update_preview(None)
+
+    # Skanningen körs i en bakgrundstråd och resultaten hämtas i omgångar via after()
+    cancel_event = threading.Event()
+    result_queue = queue.Queue()
+    extensions = frozenset(ext.lower() for ext in app.allowed_extensions)
+    app.scan_cancel_event = cancel_event
+    app.scan_thread = threading.Thread(
+        target=_scan_folder_thread,
+        args=(app.folder, extensions, result_queue, cancel_event),
+        daemon=True
+    )
+    app.scan_thread.start()
+    app.root.after(SCAN_POLL_MS, lambda: _poll_scan_queue(app, result_queue, cancel_event))
+
+def cancel_scan(app):
+    """Avbryter en pågående skanning och bevakning, t.ex. när en ny mapp väljs."""
+    cancel_event = getattr(app, "scan_cancel_event", None)
+    if cancel_event is not None:
+        cancel_event.set()
+    app.scan_cancel_event = None
+    stop_watching(app)
+    cancel_extraction(app)
+
+def start_watching(app):
+    """Startar bevakning av app.folder så att externa ändringar syns i fillistan."""
+    stop_watching(app)
+
+    def on_changes(changes):
+        # Anropas från bevakningstråden; själva uppdateringen görs i UI-tråden
+        app.root.after(0, lambda: _apply_folder_changes(app, watcher, changes))
+
+    watcher = FolderWatcher(app.folder, app.allowed_extensions, on_changes)
+    app.folder_watcher = watcher
+    watcher.start()
+
+def stop_watching(app):
+    watcher = getattr(app, "folder_watcher", None)
+    if watcher is not None:
+        watcher.stop()
+    app.folder_watcher = None
+
+def _apply_folder_changes(app, watcher, changes):
+    """Tillämpar en sammanslagen omgång ändringar från bevakaren i en enda uppdatering."""
+    if watcher is not app.folder_watcher:
+        return
+
+    model = app.file_model
+    selected = set(app.file_listbox.selected_ids())
+    selection_changed = False
+
+    # Omdöpta filer byter namn på sin plats i listan
+    for old, new in changes.renamed.items():
+        if model.find(new) is not None:
+            continue  # Redan bytt namn här i appen
+        file_id = model.find(old)
+        if file_id is None:
+            changes.added[new] = None
             continue
-        for filename in files:
-            if any(filename.lower().endswith(ext.lower()) for ext in app.allowed_extensions):
-                rel_path = os.path.relpath(os.path.join(root_dir, filename), app.folder)
-                app.file_listbox.insert(tk.END, rel_path)
-                file_count += 1
-
-    app.file_count_label.config(text=f"Filer: {file_count}")
-    if file_count == 0:
-        app.file_listbox.insert(tk.END, "Inga matchande filer hittades.")
+        model.rename(file_id, new)
+        if file_id in selected:
+            selection_changed = True
+
+    removed_ids = {model.find(rel_path) for rel_path in changes.removed}
+    for rel_dir in changes.removed_dirs:
+        removed_ids.update(model.ids_under(rel_dir))
+    removed_ids.discard(None)
+    model.remove(removed_ids)
+    if selected.intersection(removed_ids):
+        selection_changed = True
+
+    model.extend([rel_path for rel_path in changes.added if model.find(rel_path) is None])
+    _file_list_changed(app)
+    if selection_changed:
+        app.update_preview(None)
+
+def _scan_folder_thread(folder, extensions, result_queue, cancel_event):
+    """Visar först filerna från indexet och läser sedan bara om ändrade kataloger."""
+    def queue_added(added):
+        matching = [rel_path for rel_path, ext in added if ext in extensions]
+        for i in range(0, len(matching), SCAN_BATCH_SIZE):
+            result_queue.put(("files", matching[i:i + SCAN_BATCH_SIZE]))
+
+    index = None
+    try:
+        index = FileIndex()
+        for batch in index.iter_files(folder, extensions, SCAN_BATCH_SIZE):
+            if cancel_event.is_set():
+                return
+            result_queue.put(("files", batch))
+        index.refresh(
+            folder,
+            on_added=queue_added,
+            on_removed=lambda removed: result_queue.put(("removed", removed)),
+            cancel_event=cancel_event
+        )
+    except sqlite3.Error as e:
+        # Indexet är inte tillgängligt (t.ex. skrivskyddad katalog), skanna utan det
+        print(f"Filindexet kunde inte användas: {e}")
+        result_queue.put(("reset", None))
+        _scan_without_index(folder, extensions, result_queue, cancel_event)
+    except Exception as e:
+        print(f"Error in _scan_folder_thread: {type(e).__name__}: {e}")
+    finally:
+        if index is not None:
+            index.close()
+        result_queue.put(("done", None))
+
+def _scan_without_index(folder, extensions, result_queue, cancel_event):
+    """Går igenom katalogträdet med os.scandir och skickar träffar i omgångar."""
+    batch = []
+    # Stacken innehåller (absolut sökväg, relativ sökväg) och ger samma ordning som os.walk
+    stack = [(folder, "")]
+    while stack:
+        if cancel_event.is_set():
+            return
+        dir_path, rel_dir = stack.pop()
+        subdirs = []
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+                    if is_dir:
+                        if entry.name != ARCHIVE_DIR_NAME:
+                            subdirs.append((entry.path, rel_path))
+                    elif os.path.splitext(entry.name)[1].lower() in extensions:
+                        batch.append(rel_path)
+                        if len(batch) >= SCAN_BATCH_SIZE:
+                            result_queue.put(("files", batch))
+                            batch = []
+        except OSError as e:
+            print(f"Kunde inte läsa katalogen {dir_path}: {e}")
+        stack.extend(reversed(subdirs))
+    if batch:
+        result_queue.put(("files", batch))
+
+def _poll_scan_queue(app, result_queue, cancel_event):
+    if cancel_event.is_set():
+        return
+
+    new_files = []
+    removed_files = set()
+    done = False
+    try:
+        while len(new_files) < SCAN_MAX_PER_POLL:
+            kind, payload = result_queue.get_nowait()
+            if kind == "files":
+                new_files.extend(payload)
+            elif kind == "removed":
+                # Lägg in väntande filer först så att borttagningen ser dem
+                _insert_files(app, new_files)
+                new_files = []
+                removed_files.update(payload)
+            elif kind == "reset":
+                new_files = []
+                removed_files.clear()
+                app.file_model.reset(app.folder)
+            elif kind == "done":
+                done = True
+                break
+    except queue.Empty:
+        pass
+    _insert_files(app, new_files)
+    if removed_files:
+        remove_files_from_list(app, removed_files)
+
+    if not done:
+        _file_list_changed(app, scanning=True)
+        app.root.after(SCAN_POLL_MS, lambda: _poll_scan_queue(app, result_queue, cancel_event))
+        return
+
+    app.scan_cancel_event = None
+    _file_list_changed(app)
+    if not len(app.file_model):
         print("No matching files found.")
-    app.update_preview(None)
+    startup_profile.mark("första list_files")
+    startup_profile.report()
+    start_watching(app)
+    start_extraction(app)
+
+def _insert_files(app, rel_paths):
+    if rel_paths:
+        app.file_model.extend(rel_paths)
+
+def remove_files_from_list(app, rel_paths):
+    """Tar bort de angivna relativa sökvägarna ur fillistan, om de finns där."""
+    app.file_model.remove(app.file_model.find(rel_path) for rel_path in rel_paths)
+
+def _file_list_changed(app, scanning=False):
+    """Ritar om fillistan och uppdaterar räknaren efter ändringar i modellen."""
+    count = len(app.file_model)
+    app.file_listbox.refresh()
+    if scanning:
+        app.file_count_label.config(text=f"Filer: {count} (söker...)")
+    else:
+        app.file_count_label.config(text=f"Filer: {count}")
+        if count == 0:
+            app.file_listbox.set_placeholder("Inga matchande filer hittades.")
+
+def selected_file_ids(app):
+    """Markerade fil-id:n i fillistans ordning."""
+    return app.file_listbox.selected_ids()
+
+def selected_file_paths(app):
+    """Fullständiga sökvägar för de markerade filerna."""
+    return [app.file_model.full_path(file_id) for file_id in selected_file_ids(app)]
 
 def update_extensions(app):
     ext_text = app.extension_entry.get()
@@ -50,56 +262,56 @@ def update_extensions(app):
     list_files(app)
 
 def archive_file(app):
-    selected_indices = app.file_listbox.curselection()
-    if len(selected_indices) != 1:
-        messagebox.showwarning("Varning", "Välj exakt en fil att arkivera.")
-        return
+    """Flyttar de markerade filerna till arkivmappen i bakgrunden.
 
-    idx = selected_indices[0]
-    rel_path = app.file_listbox.get(idx)
-    old_full_path = os.path.join(app.folder, rel_path)
+    Flytten görs av rename_engine som en omgång: fillistan uppdateras en
+    gång när allt är klart, och misslyckas en fil flyttas alla tillbaka.
+    Ligger arkivmappen på ett annat filsystem kopieras filerna och
+    kontrolleras innan originalen tas bort.
+    """
+    selected_ids = selected_file_ids(app)
+    if not selected_ids:
+        messagebox.showwarning("Varning", "Välj en eller flera filer att arkivera.")
+        return
+    if app.rename_cancel_event is not None:
+        messagebox.showwarning("Varning", "En flytt eller ett namnbyte pågår redan.")
+        return
 
-    archive_dir = os.path.join(app.folder, "Arkiv")
-    if not os.path.exists(archive_dir):
-        os.makedirs(archive_dir)
+    archive_dir = os.path.join(app.folder, ARCHIVE_DIR_NAME)
+    moves = [(app.file_model.full_path(file_id), os.path.join(archive_dir, app.file_model.name(file_id)))
+             for file_id in selected_ids]
+    plan = rename_engine.plan_moves(moves)
+    if plan.conflicts:
+        if not plan.moves:
+            messagebox.showerror("Fel vid arkivering",
+                                 f"Inga filer kunde arkiveras:\n\n{rename_engine.format_paths(plan.conflicts)}")
+            return
+        if not messagebox.askyesno(
+            "Namnkonflikter",
+            f"{len(plan.conflicts)} filer kan inte arkiveras:\n\n{rename_engine.format_paths(plan.conflicts)}\n\n"
+            f"Arkivera de övriga {len(plan.moves)} filerna?"
+        ):
+            return
 
-    filename = os.path.basename(rel_path)
-    new_full_path = os.path.join(archive_dir, filename)
-    try:
-        os.rename(old_full_path, new_full_path)
-        app.archived_files.append((old_full_path, new_full_path))
-        app.last_archived_label.config(text=f"Senast arkiverad: {filename}")
-        app.file_listbox.delete(idx)
-        file_count = int(app.file_count_label.cget("text").split(": ")[1]) - 1
-        app.file_count_label.config(text=f"Filer: {file_count}")
-        app.update_preview(None)
-        app.save_settings()
-    except Exception as e:
-        messagebox.showerror("Fel vid arkivering", f"Kunde inte arkivera filen:\n{str(e)}")
+    if len(plan.moves) == 1:
+        description = f"arkivering av {os.path.basename(plan.moves[0][0])}"
+    else:
+        description = f"arkivering av {len(plan.moves)} filer"
 
-def undo_archive(app):
-    if not app.archived_files:
-        messagebox.showwarning("Varning", "Ingen arkivering att ångra.")
-        return
+    def on_done(moves):
+        if moves is None:
+            return
+        app.operation_journal.record("archive", description, moves=moves)
+        if len(moves) == 1:
+            app.last_archived_label.config(text=f"Senast arkiverad: {os.path.basename(moves[0][0])}")
+        else:
+            app.last_archived_label.config(text=f"Senast arkiverade: {len(moves)} filer")
 
-    old_full_path, new_full_path = app.archived_files.pop()
-    try:
-        os.rename(new_full_path, old_full_path)
-        rel_path = os.path.relpath(old_full_path, app.folder)
-        app.file_listbox.insert(tk.END, rel_path)
-        file_count = int(app.file_count_label.cget("text").split(": ")[1]) + 1
-        app.file_count_label.config(text=f"Filer: {file_count}")
-        app.file_listbox.selection_set(tk.END)
-        app.last_archived_label.config(text="Senast arkiverad: Ingen")
-        app.update_preview(None)
-        app.save_settings()
-    except Exception as e:
-        messagebox.showerror("Fel vid ångring", f"Kunde inte ångra arkiveringen:\n{str(e)}")
-        app.archived_files.append((old_full_path, new_full_path))
+    rename_engine.start_moves(app, plan, description, kind="archive", on_done=on_done)
 
 def rename_single_file(app):
-    selected_indices = app.file_listbox.curselection()
-    if len(selected_indices) != 1:
+    selected_ids = selected_file_ids(app)
+    if len(selected_ids) != 1:
         messagebox.showwarning("Varning", "Välj exakt en fil.")
         return
     new_name_part = app.single_entry.get().strip()
@@ -107,9 +319,9 @@ def rename_single_file(app):
         messagebox.showwarning("Varning", "Ange ett nytt namn.")
         return
 
-    idx = selected_indices[0]
-    old_rel_path = app.file_listbox.get(idx)
-    old_full_path = os.path.join(app.folder, old_rel_path)
+    file_id = selected_ids[0]
+    old_rel_path = app.file_model.rel_path(file_id)
+    old_full_path = app.file_model.full_path(file_id)
     dir_name = os.path.dirname(old_full_path)
     _, ext = os.path.splitext(old_rel_path)
     new_filename = f"{new_name_part}{ext}"
@@ -117,10 +329,9 @@ def rename_single_file(app):
     try:
         if old_full_path != new_full_path:
             os.rename(old_full_path, new_full_path)
-            new_rel_path = os.path.relpath(new_full_path, app.folder)
-            app.file_listbox.delete(idx)
-            app.file_listbox.insert(idx, new_rel_path)
-            app.file_listbox.selection_set(idx)
+            app.operation_journal.record("rename", f"namnbyte till {new_filename}", moves=[(old_full_path, new_full_path)])
+            app.file_model.rename(file_id, os.path.relpath(new_full_path, app.folder))
+            app.file_listbox.refresh()
         app.update_preview(None)
     except Exception as e:
         messagebox.showerror("Fel vid namnbyte", f"Kunde inte byta namn:\n{str(e)}")
@@ -130,13 +341,12 @@ def open_in_external_viewer(app, event):
         messagebox.showwarning("Varning", "Ingen extern bildvisare är konfigurerad i settings.json.")
         return
 
-    selected_indices = app.file_listbox.curselection()
-    if len(selected_indices) != 1:
+    selected_ids = selected_file_ids(app)
+    if len(selected_ids) != 1:
         messagebox.showwarning("Varning", "Välj exakt en fil för att visa i extern bildvisare.")
         return
 
-    rel_path = app.file_listbox.get(selected_indices[0])
-    file_path = os.path.join(app.folder, rel_path)
+    file_path = app.file_model.full_path(selected_ids[0])
     if not os.path.exists(file_path):
         messagebox.showerror("Fel", "Filen hittades inte.")
         return
@@ -0,0 +1,95 @@
+# core/file_transfer.py
+import errno
+import hashlib
+import os
+import shutil
+
+COPY_CHUNK_BYTES = 1024 * 1024
+
+def stream_copy(src, dst):
+    """Kopierar resten av src (från nuvarande position) till dst.
+
+    Kopieringen görs i kärnan med copy_file_range eller sendfile när det
+    går, annars i block via Python. Båda filerna ska vara öppnade binärt.
+    """
+    offset = src.tell()
+    remaining = os.fstat(src.fileno()).st_size - offset
+    dst.flush()
+    # Varje sätt kopierar så långt det kan; nästa fortsätter där det förra
+    # slutade (t.ex. olika filsystem på äldre kärnor)
+    for copy in (_copy_file_range, _sendfile):
+        if remaining > 0:
+            offset, remaining = copy(src, dst, offset, remaining)
+    if remaining > 0:
+        src.seek(offset)
+        dst.seek(0, os.SEEK_END)
+        shutil.copyfileobj(src, dst, COPY_CHUNK_BYTES)
+
+def _copy_file_range(src, dst, offset, remaining):
+    if not hasattr(os, "copy_file_range"):
+        return offset, remaining
+    while remaining > 0:
+        try:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining, offset)
+        except OSError:
+            break
+        if copied == 0:
+            break
+        offset += copied
+        remaining -= copied
+    return offset, remaining
+
+def _sendfile(src, dst, offset, remaining):
+    if not hasattr(os, "sendfile"):
+        return offset, remaining
+    dst.seek(0, os.SEEK_END)
+    while remaining > 0:
+        try:
+            sent = os.sendfile(dst.fileno(), src.fileno(), offset, min(remaining, 1 << 30))
+        except OSError:
+            break
+        if sent == 0:
+            break
+        offset += sent
+        remaining -= sent
+    return offset, remaining
+
+def file_checksum(path):
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(COPY_CHUNK_BYTES), b""):
+            digest.update(block)
+    return digest.digest()
+
+def move_file(src, dst):
+    """Flyttar src till dst, även mellan olika filsystem.
+
+    Inom samma filsystem är det ett vanligt os.rename. Ger det EXDEV
+    strömmas filen till en temporär fil bredvid dst, kontrollsumman jämförs
+    med originalets och först därefter ersätter kopian dst och originalet
+    tas bort. Returnerar True om filen kopierades.
+    """
+    try:
+        os.rename(src, dst)
+        return False
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    temp_path = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.{os.getpid()}.part")
+    try:
+        with open(src, "rb") as fsrc, open(temp_path, "wb") as fdst:
+            stream_copy(fsrc, fdst)
+            fdst.flush()
+            os.fsync(fdst.fileno())
+        if file_checksum(src) != file_checksum(temp_path):
+            raise OSError(errno.EIO, f"Kopian av {os.path.basename(src)} stämmer inte med originalet")
+        shutil.copystat(src, temp_path)
+        os.replace(temp_path, dst)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    os.unlink(src)
+    return True
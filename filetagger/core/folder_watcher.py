@@ -0,0 +1,333 @@
+# core/folder_watcher.py
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from filetagger.core.config import ARCHIVE_DIR_NAME
+from filetagger.core.file_index import FileIndex
+
+POLL_INTERVAL_S = 5.0     # Intervall för reservläget utan inotify
+COALESCE_QUIET_S = 0.3    # Skicka ändringar när det varit tyst så här länge...
+COALESCE_MAX_DELAY_S = 2.0  # ...men aldrig senare än så här efter första händelsen
+SELECT_TIMEOUT_S = 0.2
+
+# Konstanter från <sys/inotify.h>
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+_EVENT_HEADER = struct.Struct("iIII")
+
+def _load_inotify():
+    """Laddar inotify-funktionerna ur libc, eller returnerar None om de saknas."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_init1.restype = ctypes.c_int
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_add_watch.restype = ctypes.c_int
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        libc.inotify_rm_watch.restype = ctypes.c_int
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+class FolderChanges:
+    """Sammanslagna ändringar i en bevakad katalog sedan förra leveransen."""
+    __slots__ = ("added", "removed", "renamed", "removed_dirs")
+
+    def __init__(self):
+        self.added = {}          # rel_path -> None, ordnad mängd
+        self.removed = set()
+        self.renamed = {}        # gammal rel_path -> ny rel_path
+        self.removed_dirs = set()
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.renamed or self.removed_dirs)
+
+    def add(self, rel_path):
+        self.removed.discard(rel_path)
+        self.added[rel_path] = None
+
+    def remove(self, rel_path):
+        if rel_path in self.added:
+            del self.added[rel_path]
+            return
+        for old, new in list(self.renamed.items()):
+            if new == rel_path:
+                del self.renamed[old]
+                self.removed.add(old)
+                return
+        self.removed.add(rel_path)
+
+    def rename(self, old, new):
+        self.removed.discard(new)
+        if old in self.added:
+            del self.added[old]
+            self.added[new] = None
+            return
+        for first, previous in self.renamed.items():
+            if previous == old:
+                self.renamed[first] = new
+                return
+        self.renamed[old] = new
+
+class FolderWatcher:
+    """Bevakar en katalog och levererar skapade, borttagna och omdöpta filer.
+
+    På Linux används inotify via ctypes. Om inotify saknas, eller om gränsen för
+    antal bevakningar nås, används i stället en periodisk inkrementell skanning
+    via filindexet. Ändringar slås ihop och levereras med ett anrop till
+    on_changes(FolderChanges) från bevakningstråden.
+    """
+    def __init__(self, folder, extensions, on_changes):
+        self.folder = folder
+        self.extensions = frozenset(ext.lower() for ext in extensions)
+        self.on_changes = on_changes
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.libc = None
+        self.fd = None
+        self.wd_to_dir = {}
+        self.dir_to_wd = {}
+        self.pending = FolderChanges()
+        self.moved_from = {}  # cookie -> (rel_path, is_dir)
+        self.first_event_time = None
+        self.last_event_time = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _matches(self, name):
+        return os.path.splitext(name)[1].lower() in self.extensions
+
+    def _run(self):
+        try:
+            self.libc = _load_inotify()
+            if self.libc is not None and self._start_inotify():
+                # Fånga upp ändringar som skedde innan bevakningarna kom på plats
+                self._refresh_index()
+                try:
+                    self._inotify_loop()
+                except OSError as e:
+                    print(f"inotify-bevakningen avbröts ({e}), bevakar med periodisk skanning i stället.")
+                    self._close_inotify()
+                    self._polling_loop()
+            else:
+                self._polling_loop()
+        except Exception as e:
+            print(f"Error in FolderWatcher: {type(e).__name__}: {e}")
+        finally:
+            self._close_inotify()
+
+    def _close_inotify(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+        self.wd_to_dir.clear()
+        self.dir_to_wd.clear()
+
+    # ----- Reservläge: periodisk inkrementell skanning -----
+
+    def _refresh_index(self):
+        """Läser om ändrade kataloger via filindexet och levererar skillnaderna."""
+        changes = FolderChanges()
+
+        def on_added(added):
+            for rel_path, ext in added:
+                if ext in self.extensions:
+                    changes.add(rel_path)
+
+        def on_removed(removed):
+            for rel_path in removed:
+                changes.remove(rel_path)
+
+        index = FileIndex()
+        try:
+            index.refresh(self.folder, on_added, on_removed, cancel_event=self.stop_event)
+        finally:
+            index.close()
+        if changes and not self.stop_event.is_set():
+            self.on_changes(changes)
+
+    def _polling_loop(self):
+        while not self.stop_event.wait(POLL_INTERVAL_S):
+            self._refresh_index()
+
+    # ----- inotify -----
+
+    def _start_inotify(self):
+        fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return False
+        self.fd = fd
+        try:
+            self._add_watches("")
+        except OSError as e:
+            print(f"inotify kunde inte användas ({e}), bevakar med periodisk skanning i stället.")
+            self._close_inotify()
+            return False
+        return True
+
+    def _add_watches(self, rel_dir, collect_files=False):
+        """Lägger till bevakningar för rel_dir och alla dess underkataloger."""
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            path = os.path.join(self.folder, current) if current else self.folder
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err in (errno.ENOSPC, errno.ENOMEM):
+                    raise OSError(err, "för många inotify-bevakningar")
+                continue  # Katalogen försvann eller är oläsbar
+            self.wd_to_dir[wd] = current
+            self.dir_to_wd[current] = wd
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        rel_path = os.path.join(current, entry.name) if current else entry.name
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if is_dir:
+                            if entry.name != ARCHIVE_DIR_NAME:
+                                stack.append(rel_path)
+                        elif collect_files and self._matches(entry.name):
+                            self.pending.add(rel_path)
+            except OSError:
+                pass
+
+    def _remove_watches(self, rel_dir):
+        prefix = rel_dir + os.sep
+        for current, wd in list(self.dir_to_wd.items()):
+            if current == rel_dir or current.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.dir_to_wd[current]
+                self.wd_to_dir.pop(wd, None)
+
+    def _inotify_loop(self):
+        while not self.stop_event.is_set():
+            readable, _, _ = select.select([self.fd], [], [], SELECT_TIMEOUT_S)
+            if readable:
+                try:
+                    data = os.read(self.fd, 64 * 1024)
+                except BlockingIOError:
+                    data = b""
+                if self._handle_events(data):
+                    continue
+            self._flush_if_due()
+
+    def _handle_events(self, data):
+        """Tolkar en buffert med inotify-händelser. Returnerar True vid överfull kö."""
+        offset = 0
+        now = time.monotonic()
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b"\0"))
+            offset += name_len
+
+            if mask & IN_Q_OVERFLOW:
+                # Händelser har tappats: återställ och låt anroparen läsa om allt
+                self.pending = FolderChanges()
+                self.moved_from.clear()
+                self.first_event_time = None
+                self._refresh_index()
+                return True
+            if mask & IN_IGNORED:
+                rel_dir = self.wd_to_dir.pop(wd, None)
+                if rel_dir is not None and self.dir_to_wd.get(rel_dir) == wd:
+                    del self.dir_to_wd[rel_dir]
+                continue
+            parent = self.wd_to_dir.get(wd)
+            if parent is None or not name or mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                continue
+
+            rel_path = os.path.join(parent, name) if parent else name
+            is_dir = bool(mask & IN_ISDIR)
+            if is_dir and name == ARCHIVE_DIR_NAME:
+                continue
+
+            if mask & IN_MOVED_FROM:
+                self.moved_from[cookie] = (rel_path, is_dir)
+            elif mask & IN_MOVED_TO:
+                source = self.moved_from.pop(cookie, None)
+                if is_dir:
+                    if source is not None:
+                        self._dir_removed(source[0])
+                    self._add_watches(rel_path, collect_files=True)
+                elif source is not None and not source[1] and self._matches(name):
+                    if self._matches(os.path.basename(source[0])):
+                        self.pending.rename(source[0], rel_path)
+                    else:
+                        # Från ett namn som inte bevakas, t.ex. ett temporärt namn vid namnbyte
+                        self.pending.add(rel_path)
+                else:
+                    if source is not None:
+                        self.pending.remove(source[0])
+                    if self._matches(name):
+                        self.pending.add(rel_path)
+            elif mask & IN_CREATE:
+                if is_dir:
+                    self._add_watches(rel_path, collect_files=True)
+                elif self._matches(name):
+                    self.pending.add(rel_path)
+            elif mask & IN_DELETE:
+                if is_dir:
+                    self._dir_removed(rel_path)
+                else:
+                    self.pending.remove(rel_path)
+
+            if self.first_event_time is None:
+                self.first_event_time = now
+            self.last_event_time = now
+        return False
+
+    def _dir_removed(self, rel_dir):
+        self._remove_watches(rel_dir)
+        prefix = rel_dir + os.sep
+        for rel_path in [p for p in self.pending.added if p.startswith(prefix)]:
+            del self.pending.added[rel_path]
+        self.pending.removed_dirs.add(rel_dir)
+
+    def _flush_if_due(self):
+        if self.first_event_time is None:
+            return
+        now = time.monotonic()
+        if (now - self.last_event_time < COALESCE_QUIET_S
+                and now - self.first_event_time < COALESCE_MAX_DELAY_S):
+            return
+        # Flyttningar ut ur den bevakade katalogen får aldrig någon IN_MOVED_TO
+        for rel_path, is_dir in self.moved_from.values():
+            if is_dir:
+                self._dir_removed(rel_path)
+            else:
+                self.pending.remove(rel_path)
+        self.moved_from.clear()
+        changes, self.pending = self.pending, FolderChanges()
+        self.first_event_time = None
+        if changes and not self.stop_event.is_set():
+            self.on_changes(changes)
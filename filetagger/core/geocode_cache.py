@@ -0,0 +1,143 @@
+# core/geocode_cache.py
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+from filetagger.core.config import GEOCODE_CACHE_FILE
+
+GEOCODE_TTL_SECONDS = 90 * 24 * 3600  # Platser och adresser ändras sällan
+MAX_ENTRIES = 20_000                  # Äldsta svaren tas bort när cachen blir större
+PRUNE_EVERY = 100                     # Kontrollera storleken var hundrade ny rad
+REVERSE_GRID_DEGREES = 0.001          # Ungefär 100 m; bilder i samma ruta delar uppslag
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS geocode_by_age ON geocode (created);
+"""
+
+def address_key(address):
+    """Normaliserad nyckel för en adress: gemener, enkla blanksteg och ", " mellan delarna."""
+    text = unicodedata.normalize("NFKC", address).casefold()
+    parts = (" ".join(part.split()) for part in text.split(","))
+    return ", ".join(part for part in parts if part)
+
+def trim_response(data):
+    """Behåller bara det ur ett svar från Geocoding API som programmet läser."""
+    results = []
+    for result in data.get("results", []):
+        trimmed = {
+            "address_components": [
+                {"long_name": component.get("long_name", ""), "types": component.get("types", [])}
+                for component in result.get("address_components", [])
+            ],
+            "formatted_address": result.get("formatted_address", ""),
+        }
+        location = result.get("geometry", {}).get("location")
+        if location:
+            trimmed["geometry"] = {"location": {"lat": location["lat"], "lng": location["lng"]}}
+        results.append(trimmed)
+    return {"status": data["status"], "results": results}
+
+class GeocodeCache:
+    """Svar från Google Geocoding API sparade i SQLite, så att samma plats bara slås upp en gång.
+
+    Adressuppslag sparas under address_key(adress) och koordinatuppslag
+    under koordinaterna avrundade till ett rutnät (quantize), så att
+    bilder tagna nära varandra delar ett svar. Svar äldre än ttl räknas
+    som saknade, och när cachen har mer än max_entries rader tas de
+    äldsta bort.
+
+    Cachen delas mellan trådar; anropen serialiseras med ett lås.
+    """
+    def __init__(self, db_path=GEOCODE_CACHE_FILE, ttl=GEOCODE_TTL_SECONDS, max_entries=MAX_ENTRIES,
+                 grid=REVERSE_GRID_DEGREES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.grid = grid
+        self._lock = threading.Lock()
+        self._inserts = 0
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        with self._lock:
+            self._prune()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def quantize(self, lat, lon):
+        """Närmaste punkt i rutnätet; koordinater inom en halv ruta från samma punkt delar nyckel."""
+        return (round(round(lat / self.grid) * self.grid, 6), round(round(lon / self.grid) * self.grid, 6))
+
+    def get(self, kind, key):
+        """Returnerar det sparade svaret, eller None om det saknas eller är för gammalt."""
+        try:
+            with self._lock:
+                row = self.conn.execute(
+                    "SELECT response, created FROM geocode WHERE kind = ? AND key = ?", (kind, key)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Fel vid läsning från geokodningscachen: {e}")
+            return None
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def put(self, kind, key, response):
+        try:
+            with self._lock:
+                with self.conn:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?)",
+                        (kind, key, json.dumps(response, ensure_ascii=False), time.time())
+                    )
+                self._inserts += 1
+                if self._inserts % PRUNE_EVERY == 0:
+                    self._prune()
+        except sqlite3.Error as e:
+            print(f"Fel vid sparande i geokodningscachen: {e}")
+
+    def _prune(self):
+        """Tar bort utgångna svar och de äldsta om cachen är för stor. Anropas med låset taget."""
+        with self.conn:
+            self.conn.execute("DELETE FROM geocode WHERE created < ?", (time.time() - self.ttl,))
+            (count,) = self.conn.execute("SELECT COUNT(*) FROM geocode").fetchone()
+            if count > self.max_entries:
+                self.conn.execute(
+                    "DELETE FROM geocode WHERE (kind, key) IN (SELECT kind, key FROM geocode ORDER BY created LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Den delade cachen, som öppnas vid första uppslaget. None om databasen inte kan öppnas."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = GeocodeCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Geokodningscachen kunde inte öppnas: {e}")
+                return None
+        return _cache
+
+def close():
+    global _cache
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+            _cache = None
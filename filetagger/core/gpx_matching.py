@@ -0,0 +1,178 @@
+# core/gpx_matching.py
+import bisect
+import queue
+import re
+import threading
+import xml.etree.ElementTree as ET
+from array import array
+from datetime import datetime, timezone
+
+from filetagger.core.metadata_extraction import current_metadata
+
+MAX_TRACK_GAP_S = 300    # Längsta tid mellan spårpunkter som det interpoleras över
+MAX_POINT_DISTANCE_S = 120  # Längsta tid från närmaste punkt när det inte interpoleras
+GPX_POLL_MS = 100
+
+_OFFSET_PATTERN = re.compile(r"^([+-])?(\d{1,2}):(\d{2})(?::(\d{2}))?$")
+
+class GpxTrack:
+    """Spårpunkter ur en GPX-fil, sorterade på tid.
+
+    Tiderna lagras som sekunder sedan epoken (UTC) i en array, så att en
+    bilds position kan slås upp med binärsökning även i spår med hundratusen
+    punkter.
+    """
+    __slots__ = ("times", "lats", "lons")
+
+    def __init__(self, points):
+        points = sorted(points)
+        self.times = array("d", (point[0] for point in points))
+        self.lats = array("d", (point[1] for point in points))
+        self.lons = array("d", (point[2] for point in points))
+
+    def __len__(self):
+        return len(self.times)
+
+    def position_at(self, timestamp, interpolate=True,
+                    max_gap=MAX_TRACK_GAP_S, max_distance=MAX_POINT_DISTANCE_S):
+        """Returnerar (lat, lon) vid timestamp, eller None om spåret inte täcker tiden.
+
+        Med interpolate räknas positionen fram linjärt mellan punkterna före
+        och efter, om de ligger högst max_gap sekunder isär. Annars, eller
+        utan interpolate, används närmaste punkt om den ligger inom
+        max_distance sekunder.
+        """
+        times = self.times
+        if not times:
+            return None
+        i = bisect.bisect_left(times, timestamp)
+        if i < len(times) and times[i] == timestamp:
+            return self.lats[i], self.lons[i]
+        if interpolate and 0 < i < len(times):
+            t0, t1 = times[i - 1], times[i]
+            if t1 - t0 <= max_gap:
+                fraction = (timestamp - t0) / (t1 - t0)
+                lat = self.lats[i - 1] + (self.lats[i] - self.lats[i - 1]) * fraction
+                lon = self.lons[i - 1] + (self.lons[i] - self.lons[i - 1]) * fraction
+                return lat, lon
+        nearest = None
+        for j in (i - 1, i):
+            if 0 <= j < len(times) and (nearest is None or abs(times[j] - timestamp) < abs(times[nearest] - timestamp)):
+                nearest = j
+        if abs(times[nearest] - timestamp) > max_distance:
+            return None
+        return self.lats[nearest], self.lons[nearest]
+
+def _parse_gpx_time(text):
+    text = text.strip()
+    if text.endswith(("Z", "z")):
+        text = text[:-1] + "+00:00"
+    value = datetime.fromisoformat(text)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # GPX-tider är UTC enligt standarden
+    return value.timestamp()
+
+def load_gpx(path):
+    """Läser alla spår- och ruttpunkter med tidsstämpel ur en GPX-fil.
+
+    Filen läses strömmande med iterparse och varje punkt släpps när den har
+    lästs, så även stora spårloggar tar lite minne. Kastar ValueError om
+    filen inte innehåller några punkter med tid.
+    """
+    points = []
+    try:
+        for _, element in ET.iterparse(path, events=("end",)):
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag not in ("trkpt", "rtept"):
+                continue
+            time_text = None
+            for child in element:
+                if child.tag.rsplit("}", 1)[-1] == "time":
+                    time_text = child.text
+                    break
+            try:
+                if time_text:
+                    points.append((_parse_gpx_time(time_text),
+                                   float(element.get("lat")), float(element.get("lon"))))
+            except (TypeError, ValueError):
+                pass  # Punkter med trasig tid eller position hoppas över
+            element.clear()
+    except ET.ParseError as e:
+        raise ValueError(f"Filen är ingen giltig GPX-fil: {e}")
+    if not points:
+        raise ValueError("GPX-filen innehåller inga spårpunkter med tidsstämpel.")
+    return GpxTrack(points)
+
+def parse_clock_offset(text):
+    """Tolkar kamerans tidsförskjutning mot UTC, t.ex. "+02:00" eller "-00:01:30", till sekunder."""
+    text = text.strip()
+    if not text:
+        return 0
+    match = _OFFSET_PATTERN.match(text)
+    if not match:
+        raise ValueError("Tidsförskjutningen måste anges som +HH:MM eller +HH:MM:SS (t.ex. +02:00).")
+    sign, hours, minutes, seconds = match.groups()
+    offset = int(hours) * 3600 + int(minutes) * 60 + int(seconds or 0)
+    return -offset if sign == "-" else offset
+
+def photo_timestamp(date_taken, clock_offset):
+    """Gör om DateTimeOriginal ("YYYY:MM:DD HH:MM:SS", kamerans klocka) till UTC-sekunder."""
+    try:
+        local = datetime.strptime(date_taken.strip()[:19], "%Y:%m:%d %H:%M:%S")
+    except (AttributeError, ValueError):
+        return None
+    return local.replace(tzinfo=timezone.utc).timestamp() - clock_offset
+
+def read_dates_taken(folder, file_paths, exif_reader):
+    """Returnerar {sökväg: fotodatum} för de filer som har ett fotodatum."""
+    metadata = current_metadata(folder, file_paths, exif_reader)
+    return {path: item.date_taken for path, item in metadata.items() if item.date_taken}
+
+def match_photos(track, dates, clock_offset, interpolate=True):
+    """Returnerar {sökväg: (lat, lon)} för de bilder vars tid täcks av spåret."""
+    matches = {}
+    for path, date_taken in dates.items():
+        timestamp = photo_timestamp(date_taken, clock_offset)
+        if timestamp is None:
+            continue
+        position = track.position_at(timestamp, interpolate)
+        if position is not None:
+            matches[path] = position
+    return matches
+
+def start_gpx_matching(app, gpx_path, file_paths, clock_offset, on_done):
+    """Läser spåret och bildernas fotodatum i bakgrunden och matchar dem.
+
+    on_done(resultat) anropas i UI-tråden med {"matches": {sökväg: (lat, lon)},
+    "undated": antal filer utan fotodatum, "points": antal spårpunkter},
+    eller {"error": meddelande}.
+    """
+    result_queue = queue.Queue()
+    threading.Thread(
+        target=_match_thread,
+        args=(app.folder, gpx_path, list(file_paths), clock_offset, app.exif_reader, result_queue),
+        daemon=True
+    ).start()
+    app.show_task_progress("gpx", "Matchar bilder mot GPX-spåret...", 0, 0)
+    app.root.after(GPX_POLL_MS, lambda: _poll_matching(app, result_queue, on_done))
+
+def _match_thread(folder, gpx_path, file_paths, clock_offset, exif_reader, result_queue):
+    try:
+        track = load_gpx(gpx_path)
+        dates = read_dates_taken(folder, file_paths, exif_reader)
+        matches = match_photos(track, dates, clock_offset)
+        result_queue.put({"matches": matches, "undated": len(file_paths) - len(dates), "points": len(track)})
+    except (OSError, ValueError) as e:
+        result_queue.put({"error": str(e)})
+    except Exception as e:
+        print(f"Error in _match_thread: {type(e).__name__}: {e}")
+        result_queue.put({"error": str(e)})
+
+def _poll_matching(app, result_queue, on_done):
+    try:
+        result = result_queue.get_nowait()
+    except queue.Empty:
+        app.root.after(GPX_POLL_MS, lambda: _poll_matching(app, result_queue, on_done))
+        return
+    app.hide_task_progress("gpx")
+    on_done(result)
@@ -0,0 +1,185 @@
+# core/grid_thumbnails.py
+import multiprocessing
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image
+
+from filetagger.core.config import GRID_THUMBNAIL_CACHE_DIR
+from filetagger.core.thumbnail_cache import ThumbnailCache, decode_preview
+
+GRID_THUMBNAIL_SIZE = (160, 160)
+GRID_MEMORY_BUDGET_BYTES = 64 * 1024 * 1024
+GRID_DISK_BUDGET_BYTES = 256 * 1024 * 1024
+GRID_POLL_MS = 50
+
+def _default_workers():
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+def decode_grid_thumbnail(path, max_size):
+    """Körs i en arbetsprocess. Returnerar (mode, storlek, pixeldata) så att resultatet blir billigt att skicka tillbaka."""
+    image = decode_preview(path, max_size)
+    return image.mode, image.size, image.tobytes()
+
+class GridThumbnailLoader:
+    """Skapar miniatyrer till rutnätsvyn i en processpool.
+
+    Avkodningen körs i separata processer så att den inte konkurrerar med
+    UI-tråden om GIL. Filerna statas och slås upp i diskcachen i en egen
+    bakgrundstråd, så att UI-tråden aldrig väntar på disken. Färdiga
+    miniatyrer sparas i en egen ThumbnailCache (minne och disk) och
+    on_loaded anropas i UI-tråden med (file_id, sökväg, nyckel) för de
+    filer vars miniatyr nu finns i minnet. request() anger vilka filer som
+    syns just nu; köade jobb för filer som inte längre syns avbryts.
+    """
+    def __init__(self, widget, on_loaded, cache=None, workers=None):
+        self.widget = widget        # Används för after() mot UI-tråden
+        self.on_loaded = on_loaded
+        self.cache = cache or ThumbnailCache(GRID_THUMBNAIL_CACHE_DIR, GRID_MEMORY_BUDGET_BYTES,
+                                             GRID_DISK_BUDGET_BYTES, GRID_THUMBNAIL_SIZE)
+        self.workers = workers or _default_workers()
+        self.failed = set()         # Nycklar som inte gick att avkoda
+        self._executor = None
+        self._resolver = None       # En tråd som statar filerna och läser diskcachen
+        self._resolve_future = None
+        self._wanted = None         # Senaste request() som bakgrundstråden inte hunnit ta
+        self._pending = {}          # nyckel -> Future
+        self._lock = threading.Lock()
+        self._closed = False
+        self._results = queue.Queue()
+        self._poll_job = None
+
+    def get(self, key):
+        """Miniatyren för nyckeln om den finns i minnet, annars None. Läser aldrig från disk."""
+        return self.cache.get(key) if self.cache.in_memory(key) else None
+
+    def request(self, entries):
+        """entries är (file_id, sökväg, visad nyckel) för de synliga filerna, i prioritetsordning.
+
+        Visad nyckel är nyckeln för miniatyren som rutan redan visar, eller
+        None. Filer vars nyckel ändrats, t.ex. efter att filen skrivits om,
+        laddas på nytt.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            scheduled = self._wanted is not None
+            self._wanted = list(entries)
+            if not scheduled:
+                if self._resolver is None:
+                    self._resolver = ThreadPoolExecutor(max_workers=1)
+                self._resolve_future = self._resolver.submit(self._resolve)
+        self._schedule_poll()
+
+    def _resolve(self):
+        # Körs i bakgrundstråden; bara den senaste begäran behöver hanteras
+        with self._lock:
+            entries, self._wanted = self._wanted, None
+        if entries is None:
+            return
+        wanted = set()
+        for file_id, path, shown_key in entries:
+            key = ThumbnailCache.make_key(path)
+            if key is None or key in self.failed:
+                continue
+            wanted.add(key)
+            if self.cache.get(key) is not None:
+                if key != shown_key:
+                    self._results.put((file_id, path, key, None))
+            elif not self._submit(file_id, path, key):
+                break
+
+        with self._lock:
+            for key, future in list(self._pending.items()):
+                if key not in wanted and future.cancel():
+                    del self._pending[key]
+
+    def _submit(self, file_id, path, key):
+        with self._lock:
+            if self._closed:
+                return False
+            if key in self._pending:
+                return True
+            try:
+                future = self._get_executor().submit(decode_grid_thumbnail, path, self.cache.max_size)
+            except BrokenProcessPool:
+                # En arbetsprocess har dött; starta en ny pool vid nästa anrop
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                return False
+            self._pending[key] = future
+        future.add_done_callback(lambda future: self._on_done(file_id, path, key, future))
+        return True
+
+    def cancel(self):
+        with self._lock:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+        self.cancel()
+        if self._poll_job is not None:
+            self.widget.after_cancel(self._poll_job)
+            self._poll_job = None
+        if self._resolver is not None:
+            self._resolver.shutdown(wait=False, cancel_futures=True)
+            self._resolver = None
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn i stället för fork: att forka en process med Tk och trådar är inte säkert
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _on_done(self, file_id, path, key, future):
+        # Körs i poolens hjälptråd, så cachen (och diskskrivningen) hålls borta från UI-tråden
+        if future.cancelled():
+            return
+        try:
+            mode, size, data = future.result()
+            self.cache.put(key, Image.frombytes(mode, size, data))
+        except BrokenProcessPool:
+            pass  # Inte filens fel; den provas igen med en ny pool
+        except Exception as e:
+            print(f"Kunde inte skapa miniatyr för {key[0]}: {e}")
+            self.failed.add(key)
+        self._results.put((file_id, path, key, future))
+
+    def _busy(self):
+        # Bakgrundstråden kontrolleras före resultatkön: är den klar ligger dess resultat redan där
+        resolving = self._resolve_future is not None and not self._resolve_future.done()
+        with self._lock:
+            pending = bool(self._pending)
+        return resolving or pending or not self._results.empty()
+
+    def _schedule_poll(self):
+        if self._poll_job is None and not self._closed and self._busy():
+            self._poll_job = self.widget.after(GRID_POLL_MS, self._poll)
+
+    def _poll(self):
+        self._poll_job = None
+        loaded = []
+        while True:
+            try:
+                file_id, path, key, future = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None:
+                with self._lock:
+                    if self._pending.get(key) is future:
+                        del self._pending[key]
+            if key not in self.failed:
+                loaded.append((file_id, path, key))
+        if loaded:
+            self.on_loaded(loaded)
+        self._schedule_poll()
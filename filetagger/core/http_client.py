@@ -0,0 +1,123 @@
+# core/http_client.py
+import threading
+import time
+
+CONNECT_TIMEOUT = 5     # Sekunder att vänta på anslutning och TLS-handskakning
+READ_TIMEOUT = 20       # Sekunder att vänta på svar
+UPLOAD_READ_TIMEOUT = 60
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.5     # Väntar 0,5, 1, 2 ... sekunder mellan försöken
+RETRY_BACKOFF_MAX = 8
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+POOL_CONNECTIONS = 4    # En pool per värd (ImgBB, SerpApi, Google Maps)
+POOL_MAXSIZE = 8
+
+_session = None
+_session_lock = threading.Lock()
+_stats = {}  # endpoint -> EndpointStats
+_stats_lock = threading.Lock()
+
+class EndpointStats:
+    """Antal anrop och svarstider för en endpoint."""
+    __slots__ = ("requests", "errors", "total_seconds", "max_seconds", "last_seconds")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last_seconds = 0.0
+
+    def add(self, seconds, failed):
+        self.requests += 1
+        if failed:
+            self.errors += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last_seconds = seconds
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "mean_seconds": self.total_seconds / self.requests if self.requests else 0.0,
+            "max_seconds": self.max_seconds,
+            "last_seconds": self.last_seconds,
+        }
+
+def _create_session():
+    # requests laddas först vid första anropet så att det inte kostar något vid start
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    # Anslutningsfel görs om för alla metoder eftersom inget hunnit skickas;
+    # läsfel och felkoder bara för GET, så att en uppladdning inte görs två gånger
+    options = dict(
+        total=MAX_RETRIES,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    try:
+        retry = Retry(backoff_max=RETRY_BACKOFF_MAX, **options)
+    except TypeError:
+        # urllib3 1.x har ingen backoff_max utan läser taket från klassen;
+        # en underklass ändrar det bara för programmets egna anrop
+        class _Retry(Retry):
+            DEFAULT_BACKOFF_MAX = RETRY_BACKOFF_MAX
+            BACKOFF_MAX = RETRY_BACKOFF_MAX  # Namnet före urllib3 1.26.9
+        retry = _Retry(**options)
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def get_session():
+    """Den delade sessionen; anslutningarna återanvänds mellan anropen."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session()
+        return _session
+
+def request(method, url, endpoint, timeout=None, **kwargs):
+    """Gör ett anrop via den delade sessionen och mäter svarstiden för endpoint.
+
+    timeout är (anslutning, läsning) i sekunder. Svar med felkod ger
+    requests.HTTPError precis som raise_for_status().
+    """
+    if timeout is None:
+        timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    started = time.perf_counter()
+    failed = True
+    try:
+        response = get_session().request(method, url, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        failed = False
+        return response
+    finally:
+        seconds = time.perf_counter() - started
+        with _stats_lock:
+            _stats.setdefault(endpoint, EndpointStats()).add(seconds, failed)
+
+def get(url, endpoint, **kwargs):
+    return request("GET", url, endpoint, **kwargs)
+
+def post(url, endpoint, **kwargs):
+    return request("POST", url, endpoint, **kwargs)
+
+def latency_stats():
+    """Svarstider per endpoint: {endpoint: {"requests", "errors", "mean_seconds", ...}}."""
+    with _stats_lock:
+        return {endpoint: stats.to_dict() for endpoint, stats in _stats.items()}
+
+def close():
+    """Stänger anslutningarna i poolen, t.ex. när programmet avslutas."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -1,47 +1,55 @@
 # core/image_processing.py
 import os
 import tkinter as tk
-from tkinter import messagebox
-from PIL import Image, ImageTk
+from tkinter import messagebox, filedialog, simpledialog
 from datetime import datetime
-import piexif
-import webbrowser
+
+from filetagger.core.exif_reader import get_gps_coord
+from filetagger.core.batch_metadata import BatchEdit, apply_edit, start_batch_edit, start_batch_edits
+from filetagger.core.gpx_matching import parse_clock_offset, start_gpx_matching
+
+PREFETCH_RADIUS = 4  # Antal filer före och efter den aktuella som avkodas i förväg
 
 def update_preview(app, event=None):
-    app.preview_canvas.delete("all")
-    selected_indices = app.file_listbox.curselection()
-    if len(selected_indices) == 1:
+    """Visar den markerade filen i förhandsvisningen.
+
+    Metadata läses bara om när en annan fil har valts; är det samma fil som
+    förut ritas enbart bilden om (från cachen).
+    """
+    selected_ids = app.file_listbox.selected_ids()
+    file_path = app.file_model.full_path(selected_ids[0]) if selected_ids else None
+    if len(selected_ids) == 1:
         try:
-            selected_rel_path = app.file_listbox.get(selected_indices[0])
-            filename = os.path.basename(selected_rel_path)
-            name_part, _ = os.path.splitext(filename)
+            name_part, _ = os.path.splitext(app.file_model.name(selected_ids[0]))
             app.single_entry.delete(0, tk.END)
             app.single_entry.insert(0, name_part)
-            file_path = os.path.join(app.folder, selected_rel_path)
-            update_metadata(app, file_path)
+            if file_path != app.current_file_path:
+                update_metadata(app, file_path)
         except:
             app.single_entry.delete(0, tk.END)
             update_metadata(app, None)
     else:
         app.single_entry.delete(0, tk.END)
-        update_metadata(app, None)
+        if app.current_file_path is not None:
+            update_metadata(app, None)
 
-    if selected_indices:
-        try:
-            first_selected_rel_path = app.file_listbox.get(selected_indices[0])
-            file_path = os.path.join(app.folder, first_selected_rel_path)
-            if os.path.exists(file_path):
-                image = Image.open(file_path)
-                canvas_width = app.preview_canvas.winfo_width()
-                canvas_height = app.preview_canvas.winfo_height()
-                if canvas_width > 1 and canvas_height > 1:
-                    image.thumbnail((canvas_width - 10, canvas_height - 10))
-                    app.current_photo = ImageTk.PhotoImage(image)
-                    x = (canvas_width - app.current_photo.width()) // 2
-                    y = (canvas_height - app.current_photo.height()) // 2
-                    app.preview_canvas.create_image(x, y, anchor=tk.NW, image=app.current_photo)
-        except Exception as e:
-            print(f"Error loading preview: {e}")
+    app.preview_renderer.show(file_path)
+    if selected_ids:
+        schedule_prefetch(app)
+    else:
+        app.preview_prefetcher.cancel()
+
+def schedule_prefetch(app):
+    """Ber förhämtaren avkoda grannarna till den aktiva raden, närmast först."""
+    model = app.file_model
+    count = len(model)
+    position = app.file_listbox.active_index()
+    paths = []
+    for offset in range(1, PREFETCH_RADIUS + 1):
+        for neighbour in (position + offset, position - offset):
+            if 0 <= neighbour < count:
+                paths.append(model.full_path(model.id_at(neighbour)))
+    app.preview_prefetcher.schedule(paths)
 
 def update_metadata(app, file_path):
     app.current_file_path = file_path
@@ -51,127 +59,94 @@ def update_metadata(app, file_path):
     for field in app.metadata_labels:
         app.metadata_labels[field].config(text="N/A")
 
-    if file_path is None or not os.path.exists(file_path):
+    if file_path is None:
         return
 
     try:
-        with Image.open(file_path) as img:
-            width, height = img.size
-            app.metadata_labels["Bildstorlek"].config(text=f"{width}×{height} pixlar")
-
-            exif_raw = img.info.get("exif")
-            if exif_raw and isinstance(exif_raw, bytes) and len(exif_raw) > 0:
-                try:
-                    exif_dict = piexif.load(exif_raw)
-                    exif_data = exif_dict.get("Exif", {})
-                    zeroth_ifd = exif_dict.get("0th", {})
-                    gps_data = exif_dict.get("GPS", {})
-
-                    date_taken = exif_data.get(piexif.ExifIFD.DateTimeOriginal)
-                    if date_taken:
-                        date_taken = date_taken.decode('utf-8')
-                        app.metadata_entries["Fotodatum"].delete(0, tk.END)
-                        app.metadata_entries["Fotodatum"].insert(0, date_taken)
-                    else:
-                        date_digitized = exif_data.get(piexif.ExifIFD.DateTimeDigitized)
-                        if date_digitized:
-                            date_digitized = date_digitized.decode('utf-8')
-                            app.metadata_entries["Fotodatum"].delete(0, tk.END)
-                            app.metadata_entries["Fotodatum"].insert(0, date_digitized)
-
-                    make = zeroth_ifd.get(piexif.ImageIFD.Make)
-                    if make:
-                        app.metadata_labels["Kameratillverkare"].config(text=make.decode('utf-8'))
-                    model = zeroth_ifd.get(piexif.ImageIFD.Model)
-                    if model:
-                        app.metadata_labels["Kameramodell"].config(text=model.decode('utf-8'))
-
-                    lat = get_gps_coord(gps_data, piexif.GPSIFD.GPSLatitude, piexif.GPSIFD.GPSLatitudeRef)
-                    lon = get_gps_coord(gps_data, piexif.GPSIFD.GPSLongitude, piexif.GPSIFD.GPSLongitudeRef)
-                    if lat:
-                        app.metadata_labels["GPS Latitud"].config(text=f"{lat:.6f}")
-                    if lon:
-                        app.metadata_labels["GPS Longitud"].config(text=f"{lon:.6f}")
-                except Exception as e:
-                    print(f"Fel vid läsning av EXIF-data: {e}")
-            else:
-                pass
-
-        mtime = os.path.getmtime(file_path)
-        last_modified = datetime.fromtimestamp(mtime).strftime('%Y:%m:%d %H:%M:%S')
-        app.metadata_labels["Senast ändrad"].config(text=last_modified)
-
-        file_size = os.path.getsize(file_path) / 1024  # KB
-        if file_size >= 1024:
-            file_size = file_size / 1024  # MB
-            size_str = f"{file_size:.2f} MB"
-        else:
-            size_str = f"{file_size:.2f} KB"
-        current_text = app.metadata_labels["Bildstorlek"].cget("text")
-        app.metadata_labels["Bildstorlek"].config(text=f"{current_text}, {size_str}")
-
+        metadata = app.exif_reader.read(file_path)
+    except FileNotFoundError:
+        return
     except Exception as e:
         print(f"Fel vid läsning av metadata: {e}")
+        return
+
+    if metadata.date_taken:
+        app.metadata_entries["Fotodatum"].delete(0, tk.END)
+        app.metadata_entries["Fotodatum"].insert(0, metadata.date_taken)
+    if metadata.make:
+        app.metadata_labels["Kameratillverkare"].config(text=metadata.make)
+    if metadata.model:
+        app.metadata_labels["Kameramodell"].config(text=metadata.model)
+    if metadata.latitude is not None:
+        app.metadata_labels["GPS Latitud"].config(text=f"{metadata.latitude:.6f}")
+    if metadata.longitude is not None:
+        app.metadata_labels["GPS Longitud"].config(text=f"{metadata.longitude:.6f}")
+
+    last_modified = datetime.fromtimestamp(metadata.mtime).strftime('%Y:%m:%d %H:%M:%S')
+    app.metadata_labels["Senast ändrad"].config(text=last_modified)
+
+    file_size = metadata.file_size / 1024  # KB
+    if file_size >= 1024:
+        file_size = file_size / 1024  # MB
+        size_str = f"{file_size:.2f} MB"
+    else:
+        size_str = f"{file_size:.2f} KB"
+    if metadata.width:
+        app.metadata_labels["Bildstorlek"].config(text=f"{metadata.width}×{metadata.height} pixlar, {size_str}")
+    else:
+        app.metadata_labels["Bildstorlek"].config(text=size_str)
 
-def get_gps_coord(gps_data, coord_tag, ref_tag):
-    coord = gps_data.get(coord_tag)
-    ref = gps_data.get(ref_tag)
-    if not coord or not ref:
-        return None
-    ref = ref.decode('utf-8')
-    degrees = coord[0][0] / coord[0][1]
-    minutes = coord[1][0] / coord[1][1]
-    seconds = coord[2][0] / coord[2][1]
-    decimal = degrees + (minutes / 60.0) + (seconds / 3600.0)
-    if ref in ["S", "W"]:
-        decimal = -decimal
-    return decimal
+def _selected_paths(app):
+    return [app.file_model.full_path(file_id) for file_id in app.file_listbox.selected_ids()]
 
 def save_metadata(app):
+    selected_paths = _selected_paths(app)
+    if len(selected_paths) > 1:
+        save_metadata_batch(app, selected_paths)
+        return
     if not app.current_file_path:
         messagebox.showwarning("Varning", "Ingen fil är vald.")
         return
 
-    try:
-        img = Image.open(app.current_file_path)
-        exif_raw = img.info.get("exif")
-        if exif_raw and isinstance(exif_raw, bytes) and len(exif_raw) > 0:
-            try:
-                exif_dict = piexif.load(exif_raw)
-            except Exception as e:
-                messagebox.showerror("Fel", f"Kunde inte läsa befintlig EXIF-data: {e}")
-                img.close()
-                return
-        else:
-            exif_dict = {
-                "0th": {},
-                "Exif": {},
-                "GPS": {},
-                "1st": {},
-                "thumbnail": None
-            }
-
-        fotodatum = app.metadata_entries["Fotodatum"].get()
-        if fotodatum and fotodatum != "N/A":
-            try:
-                datetime.strptime(fotodatum, '%Y:%m:%d %H:%M:%S')
-                exif_dict["Exif"][piexif.ExifIFD.DateTimeOriginal] = fotodatum.encode('utf-8')
-            except ValueError:
-                messagebox.showerror("Fel", "Fotodatum måste vara i formatet YYYY:MM:DD HH:MM:SS (t.ex. 2025:04:14 12:00:00)")
-                img.close()
-                return
-
-        exif_bytes = piexif.dump(exif_dict)
-        img.save(app.current_file_path, exif=exif_bytes)
-        img.close()
-
-        messagebox.showinfo("Klart", "Metadata har sparats!")
-        update_metadata(app, app.current_file_path)
+    fotodatum = app.metadata_entries["Fotodatum"].get()
+    edit = BatchEdit()
+    if fotodatum and fotodatum != "N/A":
+        try:
+            datetime.strptime(fotodatum, '%Y:%m:%d %H:%M:%S')
+        except ValueError:
+            messagebox.showerror("Fel", "Fotodatum måste vara i formatet YYYY:MM:DD HH:MM:SS (t.ex. 2025:04:14 12:00:00)")
+            return
+        edit.date_taken = fotodatum
 
+    try:
+        apply_edit(app, app.current_file_path, edit, edit.describe())
     except Exception as e:
         messagebox.showerror("Fel", f"Kunde inte spara metadata: {e}")
+        return
+
+    messagebox.showinfo("Klart", "Metadata har sparats!")
+    update_metadata(app, app.current_file_path)
+
+def save_metadata_batch(app, file_paths):
+    """Sparar fotodatumet från metadatapanelen i alla markerade filer."""
+    fotodatum = app.metadata_entries["Fotodatum"].get().strip()
+    if not fotodatum or fotodatum == "N/A":
+        messagebox.showwarning("Varning", "Ange ett fotodatum att spara i de markerade filerna.")
+        return
+    try:
+        datetime.strptime(fotodatum, '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        messagebox.showerror("Fel", "Fotodatum måste vara i formatet YYYY:MM:DD HH:MM:SS (t.ex. 2025:04:14 12:00:00)")
+        return
+    if not messagebox.askyesno("Bekräfta", f"Spara fotodatum {fotodatum} i {len(file_paths)} filer?"):
+        return
+    start_batch_edit(app, file_paths, BatchEdit(date_taken=fotodatum))
 
 def fetch_and_save_gps(app):
+    selected_paths = _selected_paths(app)
+    if len(selected_paths) > 1:
+        fetch_and_save_gps_batch(app, selected_paths)
+        return
     if not app.current_file_path:
         messagebox.showwarning("Varning", "Ingen fil är vald.")
         return
@@ -181,23 +156,13 @@ def fetch_and_save_gps(app):
         messagebox.showwarning("Varning", "Ange en plats för att hämta GPS-koordinater.")
         return
 
-    img = Image.open(app.current_file_path)
-    exif_raw = img.info.get("exif")
-    lat = None
-    lon = None
-    if exif_raw and isinstance(exif_raw, bytes) and len(exif_raw) > 0:
-        try:
-            exif_dict = piexif.load(exif_raw)
-            gps_data = exif_dict.get("GPS", {})
-            lat = get_gps_coord(gps_data, piexif.GPSIFD.GPSLatitude, piexif.GPSIFD.GPSLatitudeRef)
-            lon = get_gps_coord(gps_data, piexif.GPSIFD.GPSLongitude, piexif.GPSIFD.GPSLongitudeRef)
-        except Exception as e:
-            messagebox.showerror("Fel", f"Kunde inte läsa befintlig EXIF-data: {e}")
-            img.close()
-            return
-    img.close()
+    try:
+        metadata = app.exif_reader.read(app.current_file_path)
+    except Exception as e:
+        messagebox.showerror("Fel", f"Kunde inte läsa befintlig EXIF-data: {e}")
+        return
 
-    if lat is not None and lon is not None:
+    if metadata.latitude is not None and metadata.longitude is not None:
         result = messagebox.askyesno(
             "Varning",
             "Befintliga GPS-koordinater finns redan i bilden.\nVill du verkligen skriva över dem?"
@@ -218,6 +183,82 @@ def fetch_and_save_gps(app):
     except Exception as e:
         messagebox.showerror("Fel", f"Kunde inte hämta eller spara GPS-koordinater: {e}")
 
+def fetch_and_save_gps_batch(app, file_paths):
+    """Slår upp platsen en gång och skriver koordinaterna i alla markerade filer."""
+    location = app.gps_location_entry.get().strip()
+    if not location:
+        messagebox.showwarning("Varning", "Ange en plats för att hämta GPS-koordinater.")
+        return
+    if not messagebox.askyesno(
+        "Bekräfta",
+        f"Skriva GPS-koordinater för {location} i {len(file_paths)} filer?\nBefintliga koordinater skrivs över."
+    ):
+        return
+
+    from filetagger.core.api_integration import get_gps_coordinates_from_location
+    try:
+        lat, lon = get_gps_coordinates_from_location(location, app.google_maps_api_key)
+    except Exception as e:
+        messagebox.showerror("Fel", f"Kunde inte hämta GPS-koordinater: {e}")
+        return
+    start_batch_edit(app, file_paths, BatchEdit(gps=(lat, lon)))
+
+def geotag_from_gpx(app):
+    """Geotaggar bilderna från en GPX-spårlogg: de markerade om flera är markerade, annars alla listade.
+
+    Varje bilds fotodatum matchas mot spåret; inga API-anrop görs.
+    """
+    file_paths = _selected_paths(app)
+    if len(file_paths) < 2:
+        file_paths = [app.file_model.full_path(file_id) for file_id in app.file_model.all_ids()]
+    if not file_paths:
+        messagebox.showwarning("Varning", "Det finns inga filer att geotagga.")
+        return
+    gpx_path = filedialog.askopenfilename(
+        title="Välj GPX-spår",
+        filetypes=[("GPX-spår", "*.gpx"), ("Alla filer", "*.*")]
+    )
+    if not gpx_path:
+        return
+    offset_text = simpledialog.askstring(
+        "Kamerans klocka",
+        "Kamerans tid i förhållande till UTC, t.ex. +02:00 för svensk sommartid.\n"
+        "Ange sekunder också om klockan gick fel, t.ex. +02:01:30:",
+        initialvalue=app.gpx_clock_offset,
+        parent=app.root
+    )
+    if offset_text is None:
+        return
+    try:
+        clock_offset = parse_clock_offset(offset_text)
+    except ValueError as e:
+        messagebox.showerror("Fel", str(e))
+        return
+    app.gpx_clock_offset = offset_text.strip()
+    app.save_settings()
+    start_gpx_matching(app, gpx_path, file_paths, clock_offset,
+                       lambda result: _on_gpx_matched(app, gpx_path, len(file_paths), result))
+
+def _on_gpx_matched(app, gpx_path, total, result):
+    if "error" in result:
+        messagebox.showerror("Fel", f"GPX-spåret kunde inte användas: {result['error']}")
+        return
+    matches = result["matches"]
+    if not matches:
+        messagebox.showwarning(
+            "Inga träffar",
+            f"Ingen av de {total} bilderna togs medan spåret ({result['points']} punkter) spelades in.\n"
+            "Kontrollera kamerans tidsförskjutning."
+        )
+        return
+    details = f"{len(matches)} av {total} bilder matchade spåret."
+    if result["undated"]:
+        details += f"\n{result['undated']} bilder saknar fotodatum."
+    if not messagebox.askyesno("Bekräfta", f"{details}\n\nSkriva GPS-koordinater i dem? Befintliga koordinater skrivs över."):
+        return
+    edits = [(path, BatchEdit(gps=position)) for path, position in sorted(matches.items())]
+    start_batch_edits(app, edits, f"GPS från {os.path.basename(gpx_path)}")
+
 def fetch_place_from_gps(app):
     if not app.current_file_path:
         messagebox.showwarning("Varning", "Ingen fil är vald.")
@@ -272,50 +313,12 @@ def open_google_maps(app, field):
 
     maps_url = f"https://www.google.com/maps?q={lat},{lon}"
     try:
+        import webbrowser  # Laddas först när den behövs
         webbrowser.open(maps_url)
     except Exception as e:
         messagebox.showerror("Fel", f"Kunde inte öppna Google Maps: {e}")
 
 def save_gps_to_image(app, lat, lon):
-    img = Image.open(app.current_file_path)
-    exif_raw = img.info.get("exif")
-    if exif_raw and isinstance(exif_raw, bytes) and len(exif_raw) > 0:
-        try:
-            exif_dict = piexif.load(exif_raw)
-        except Exception as e:
-            messagebox.showerror("Fel", f"Kunde inte läsa befintlig EXIF-data: {e}")
-            img.close()
-            return
-    else:
-        exif_dict = {
-            "0th": {},
-            "Exif": {},
-            "GPS": {},
-            "1st": {},
-            "thumbnail": None
-        }
-
-    lat_ref = "N" if lat >= 0 else "S"
-    lon_ref = "E" if lon >= 0 else "W"
-    lat = abs(lat)
-    lon = abs(lon)
-
-    lat_deg = int(lat)
-    lat_min = int((lat - lat_deg) * 60)
-    lat_sec = int((lat - lat_deg - lat_min / 60) * 3600 * 10000)
-    lon_deg = int(lon)
-    lon_min = int((lon - lon_deg) * 60)
-    lon_sec = int((lon - lon_deg - lon_min / 60) * 3600 * 10000)
-
-    exif_dict["GPS"][piexif.GPSIFD.GPSLatitude] = [(lat_deg, 1), (lat_min, 1), (lat_sec, 10000)]
-    exif_dict["GPS"][piexif.GPSIFD.GPSLatitudeRef] = lat_ref.encode('utf-8')
-    exif_dict["GPS"][piexif.GPSIFD.GPSLongitude] = [(lon_deg, 1), (lon_min, 1), (lon_sec, 10000)]
-    exif_dict["GPS"][piexif.GPSIFD.GPSLongitudeRef] = lon_ref.encode('utf-8')
-
-    try:
-        exif_bytes = piexif.dump(exif_dict)
-        img.save(app.current_file_path, exif=exif_bytes)
-    except Exception as e:
-        messagebox.showerror("Fel", f"Kunde inte spara EXIF-data: {e}")
-    finally:
-        img.close()
+    """Skriver koordinaterna till den aktuella filens EXIF. Kastar ett undantag om det misslyckas."""
+    edit = BatchEdit(gps=(lat, lon))
+    apply_edit(app, app.current_file_path, edit, edit.describe())
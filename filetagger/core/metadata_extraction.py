@@ -0,0 +1,183 @@
+# core/metadata_extraction.py
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from filetagger.core.exif_reader import ImageMetadata, read_metadata
+from filetagger.core.metadata_store import MetadataStore
+
+EXTRACT_CHUNK_SIZE = 256  # Filer per jobb till arbetsprocesserna
+EXTRACT_POLL_MS = 100
+
+def _default_workers():
+    return max(1, min(8, (os.cpu_count() or 2) - 1))
+
+def extract_metadata_chunk(folder, rel_paths):
+    """Körs i en arbetsprocess. Läser metadata för en omgång filer.
+
+    Returnerar (rader, fel) där raderna följer METADATA_COLUMNS och fel är
+    en lista med (rel_path, felmeddelande).
+    """
+    rows = []
+    failures = []
+    for rel_path in rel_paths:
+        path = os.path.join(folder, rel_path)
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            failures.append((rel_path, str(e)))
+            continue
+        try:
+            metadata = read_metadata(path, st)
+        except Exception as e:
+            # Spara en tom rad så att filen inte läses om förrän den ändras
+            failures.append((rel_path, str(e)))
+            rows.append((rel_path, st.st_mtime_ns, st.st_size) + (None,) * 7)
+            continue
+        rows.append((rel_path, st.st_mtime_ns, st.st_size, metadata.width, metadata.height,
+                     metadata.date_taken, metadata.make, metadata.model,
+                     metadata.latitude, metadata.longitude))
+    return rows, failures
+
+def current_metadata(folder, file_paths, exif_reader):
+    """Returnerar {sökväg: ImageMetadata} för filerna.
+
+    Raderna i metadatalagret används så länge filens mtime och storlek är
+    oförändrade; övriga filer läses med exif_reader. Filer som inte går att
+    läsa saknas i resultatet.
+    """
+    stored = {}
+    if folder:
+        store = None
+        try:
+            store = MetadataStore()
+            stored = store.rows(folder)
+        except sqlite3.Error as e:
+            print(f"Metadatalagret kunde inte läsas: {e}")
+        finally:
+            if store is not None:
+                store.close()
+
+    result = {}
+    for path in file_paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        row = stored.get(os.path.relpath(path, folder)) if folder else None
+        if row is not None and row[1:3] == (st.st_mtime_ns, st.st_size):
+            metadata = ImageMetadata(st.st_mtime, st.st_size)
+            (metadata.width, metadata.height, metadata.date_taken, metadata.make,
+             metadata.model, metadata.latitude, metadata.longitude) = row[3:]
+            result[path] = metadata
+            continue
+        try:
+            result[path] = exif_reader.read(path)
+        except Exception as e:
+            print(f"Metadata kunde inte läsas för {path}: {e}")
+    return result
+
+def start_extraction(app):
+    """Läser metadata för alla listade filer i bakgrunden och sparar den i metadatalagret."""
+    cancel_extraction(app)
+    if not app.folder or not len(app.file_model):
+        return
+    model = app.file_model
+    rel_paths = [model.rel_path(file_id) for file_id in model.all_ids()]
+    cancel_event = threading.Event()
+    result_queue = queue.Queue()
+    app.metadata_cancel_event = cancel_event
+    threading.Thread(
+        target=_extract_thread,
+        args=(app.folder, rel_paths, result_queue, cancel_event),
+        daemon=True
+    ).start()
+    app.root.after(EXTRACT_POLL_MS, lambda: _poll_extraction(app, result_queue, cancel_event))
+
+def cancel_extraction(app):
+    cancel_event = getattr(app, "metadata_cancel_event", None)
+    if cancel_event is not None:
+        cancel_event.set()
+        app.hide_task_progress("metadata")
+    app.metadata_cancel_event = None
+
+def _extract_thread(folder, rel_paths, result_queue, cancel_event):
+    store = None
+    failures = []
+    try:
+        store = MetadataStore()
+        known = store.stamps(folder)
+        # Bara filer som är nya eller ändrade skickas till processerna; en
+        # oförändrad mapp startar ingen pool alls
+        changed = []
+        for rel_path in rel_paths:
+            if cancel_event.is_set():
+                return
+            try:
+                st = os.stat(os.path.join(folder, rel_path))
+            except OSError:
+                continue
+            if known.get(rel_path) != (st.st_mtime_ns, st.st_size):
+                changed.append(rel_path)
+        if changed:
+            _extract_in_pool(folder, changed, store, failures, result_queue, cancel_event)
+        if not cancel_event.is_set():
+            store.prune(folder, set(rel_paths))
+    except (sqlite3.Error, OSError) as e:
+        print(f"Metadatalagret kunde inte uppdateras: {e}")
+    except Exception as e:
+        print(f"Error in _extract_thread: {type(e).__name__}: {e}")
+    finally:
+        if store is not None:
+            store.close()
+        result_queue.put(("done", failures))
+
+def _extract_in_pool(folder, rel_paths, store, failures, result_queue, cancel_event):
+    total = len(rel_paths)
+    done = 0
+    with ProcessPoolExecutor(max_workers=_default_workers(),
+                             mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {}
+        for i in range(0, total, EXTRACT_CHUNK_SIZE):
+            chunk = rel_paths[i:i + EXTRACT_CHUNK_SIZE]
+            futures[pool.submit(extract_metadata_chunk, folder, chunk)] = len(chunk)
+        for future in as_completed(futures):
+            if cancel_event.is_set():
+                pool.shutdown(wait=False, cancel_futures=True)
+                return
+            rows, chunk_failures = future.result()
+            store.upsert(folder, rows)
+            failures.extend(chunk_failures)
+            done += futures[future]
+            result_queue.put(("progress", (done, total)))
+
+def _poll_extraction(app, result_queue, cancel_event):
+    if cancel_event.is_set():
+        return
+    progress = None
+    failures = None
+    try:
+        while True:
+            kind, payload = result_queue.get_nowait()
+            if kind == "progress":
+                progress = payload
+            elif kind == "done":
+                failures = payload
+                break
+    except queue.Empty:
+        pass
+
+    if failures is None:
+        if progress is not None:
+            done, total = progress
+            app.show_task_progress("metadata", f"Läser metadata... {done}/{total}", done, total)
+        app.root.after(EXTRACT_POLL_MS, lambda: _poll_extraction(app, result_queue, cancel_event))
+        return
+
+    app.metadata_cancel_event = None
+    app.hide_task_progress("metadata")
+    if failures:
+        print(f"Metadata kunde inte läsas för {len(failures)} filer, t.ex. {failures[0][0]}: {failures[0][1]}")
@@ -0,0 +1,76 @@
+# core/metadata_store.py
+import os
+import sqlite3
+
+from filetagger.core.config import METADATA_STORE_FILE
+from filetagger.core.file_index import index_root
+
+# Kolumnerna som lagras per fil, i samma ordning som raderna till upsert()
+METADATA_COLUMNS = ("rel_path", "mtime_ns", "size", "width", "height",
+                    "date_taken", "make", "model", "latitude", "longitude")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS image_metadata (
+    root TEXT NOT NULL,
+    rel_path TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    date_taken TEXT,
+    make TEXT,
+    model TEXT,
+    latitude REAL,
+    longitude REAL,
+    PRIMARY KEY (root, rel_path)
+) WITHOUT ROWID;
+"""
+
+class MetadataStore:
+    """Metadata för alla filer i en katalog, lagrad som en tabell i SQLite.
+
+    En rad per fil med de fält som visas i metadatapanelen. (mtime_ns, size)
+    sparas så att en ny genomgång bara behöver läsa filer som ändrats.
+
+    En instans får bara användas från tråden som skapade den.
+    """
+    def __init__(self, db_path=METADATA_STORE_FILE):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def stamps(self, folder):
+        """Returnerar {rel_path: (mtime_ns, size)} för allt som är lagrat under folder."""
+        cursor = self.conn.execute(
+            "SELECT rel_path, mtime_ns, size FROM image_metadata WHERE root = ?", (index_root(folder),)
+        )
+        return {rel_path: (mtime_ns, size) for rel_path, mtime_ns, size in cursor}
+
+    def rows(self, folder):
+        """Returnerar {rel_path: rad} för allt under folder, med värden i METADATA_COLUMNS-ordning."""
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(METADATA_COLUMNS)} FROM image_metadata WHERE root = ?", (index_root(folder),)
+        )
+        return {row[0]: row for row in cursor}
+
+    def upsert(self, folder, rows):
+        """Sparar rader med värden i METADATA_COLUMNS-ordning."""
+        root = index_root(folder)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO image_metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((root, *row) for row in rows)
+            )
+
+    def prune(self, folder, keep):
+        """Tar bort rader för filer under folder som inte finns i keep."""
+        root = index_root(folder)
+        stale = [(root, rel_path) for rel_path in self.stamps(folder) if rel_path not in keep]
+        if stale:
+            with self.conn:
+                self.conn.executemany("DELETE FROM image_metadata WHERE root = ? AND rel_path = ?", stale)
@@ -0,0 +1,228 @@
+# core/operation_journal.py
+import json
+import os
+import time
+from tkinter import messagebox
+
+from filetagger.core.config import OPERATION_HISTORY_FILE
+from filetagger.core import batch_metadata, rename_engine
+
+MAX_UNDO_STEPS = 200        # Så många steg bakåt kan ångras
+COMPACT_AFTER_LINES = 2000  # Historikfilen skrivs om vid start när den blivit så här lång
+
+class Operation:
+    """En ändring som kan ångras: flyttar (namnbyten, arkiveringar) eller metadata.
+
+    moves är en lista med (gammal sökväg, ny sökväg). changes är en lista
+    med (sökväg, före, efter) där före och efter kommer från
+    batch_metadata.capture_tags.
+    """
+    __slots__ = ("op_id", "kind", "description", "created", "moves", "changes")
+
+    def __init__(self, op_id, kind, description, created, moves=None, changes=None):
+        self.op_id = op_id
+        self.kind = kind  # "rename", "archive" eller "metadata"
+        self.description = description
+        self.created = created
+        self.moves = moves or []
+        self.changes = changes or []
+
+    def to_json(self):
+        return {"op": "do", "id": self.op_id, "kind": self.kind, "description": self.description,
+                "created": self.created, "moves": self.moves, "changes": self.changes}
+
+    @classmethod
+    def from_json(cls, entry):
+        return cls(entry["id"], entry["kind"], entry.get("description", ""), entry.get("created", 0),
+                   [tuple(move) for move in entry.get("moves", [])],
+                   [tuple(change) for change in entry.get("changes", [])])
+
+class OperationJournal:
+    """Historik för ångra/gör om, sparad som en JSONL-fil som bara växer.
+
+    Varje ny ändring, ångring och omgörning blir en rad som läggs till sist
+    i filen, så att spara ett steg kostar lika lite oavsett hur lång
+    historiken är. Vid start spelas raderna upp för att bygga stackarna
+    igen, och filen skrivs om till bara de steg som fortfarande kan ångras
+    eller göras om när den blivit lång.
+    """
+    def __init__(self, path=OPERATION_HISTORY_FILE):
+        self.path = path
+        self.undo_stack = []
+        self.redo_stack = []
+        self.next_id = 1
+        self.busy = False  # Ett ångra- eller gör om-steg pågår i bakgrunden
+        self._file = None
+        lines, skipped = self._load()
+        # En trasig rad skrivs bort direkt, annars hamnar nästa steg på samma rad
+        if lines > COMPACT_AFTER_LINES or skipped:
+            self._compact()
+
+    def _load(self):
+        lines = 0
+        skipped = 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    lines += 1
+                    try:
+                        self._replay(json.loads(line))
+                    except (ValueError, KeyError, TypeError) as e:
+                        # T.ex. en halvskriven sista rad efter en krasch
+                        print(f"Hoppar över trasig rad i historiken: {e}")
+                        skipped += 1
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Historiken kunde inte läsas från {self.path}: {e}")
+        return lines, skipped
+
+    def _replay(self, entry):
+        op = entry["op"]
+        if op == "do":
+            operation = Operation.from_json(entry)
+            self.undo_stack.append(operation)
+            self.redo_stack.clear()
+            self.next_id = max(self.next_id, operation.op_id + 1)
+            del self.undo_stack[:-MAX_UNDO_STEPS]
+        elif op == "undo" and self.undo_stack and self.undo_stack[-1].op_id == entry["id"]:
+            self.redo_stack.append(self.undo_stack.pop())
+        elif op == "redo" and self.redo_stack and self.redo_stack[-1].op_id == entry["id"]:
+            self.undo_stack.append(self.redo_stack.pop())
+
+    def _compact(self):
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for operation in self.undo_stack + self.redo_stack[::-1]:
+                    f.write(json.dumps(operation.to_json()) + "\n")
+                for operation in self.redo_stack:
+                    f.write(json.dumps({"op": "undo", "id": operation.op_id}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Historiken kunde inte komprimeras: {e}")
+
+    def _append(self, entry):
+        try:
+            if self._file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except OSError as e:
+            print(f"Historiken kunde inte sparas till {self.path}: {e}")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def record(self, kind, description, moves=None, changes=None):
+        """Lägger till en genomförd ändring. Det som kunde göras om försvinner."""
+        operation = Operation(self.next_id, kind, description, time.time(),
+                              [list(move) for move in moves or []],
+                              [list(change) for change in changes or []])
+        self.next_id += 1
+        self._append(operation.to_json())
+        self._replay_done(operation)
+        return operation
+
+    def _replay_done(self, operation):
+        self.undo_stack.append(operation)
+        self.redo_stack.clear()
+        del self.undo_stack[:-MAX_UNDO_STEPS]
+
+    def mark_undone(self, operation):
+        self._append({"op": "undo", "id": operation.op_id})
+        self._replay({"op": "undo", "id": operation.op_id})
+
+    def mark_redone(self, operation):
+        self._append({"op": "redo", "id": operation.op_id})
+        self._replay({"op": "redo", "id": operation.op_id})
+
+    def import_archived_files(self, archived_files):
+        """För över arkiveringar från den gamla listan i settings.json till historiken."""
+        if self.undo_stack or self.redo_stack:
+            return
+        for old_path, new_path in archived_files:
+            self.record("archive", f"arkivering av {os.path.basename(old_path)}", moves=[(old_path, new_path)])
+
+_KIND_NAMES = {"rename": "namnbyte", "archive": "arkivering", "metadata": "metadataändring"}
+
+def _run(app, operation, undo):
+    """Genomför ett ångra- eller gör om-steg via namnbytes- eller batchmotorn."""
+    journal = app.operation_journal
+    journal.busy = True
+
+    def on_done(result):
+        journal.busy = False
+        if result is None:
+            return
+        if undo:
+            journal.mark_undone(operation)
+        else:
+            journal.mark_redone(operation)
+
+    if operation.kind == "metadata":
+        edits = [(path, batch_metadata.TagSnapshot(before if undo else after))
+                 for path, before, after in operation.changes]
+        batch_metadata.start_batch_edits(app, edits, operation.description, on_done=on_done)
+        return
+
+    if undo:
+        moves = [(new_path, old_path) for old_path, new_path in reversed(operation.moves)]
+    else:
+        moves = list(operation.moves)
+    plan = rename_engine.plan_moves(moves)
+    if plan.conflicts:
+        journal.busy = False
+        action = "ångras" if undo else "göras om"
+        messagebox.showerror(
+            "Fel",
+            f"{_KIND_NAMES.get(operation.kind, 'Ändringen').capitalize()} kan inte {action}:\n\n"
+            f"{rename_engine.format_paths(plan.conflicts)}"
+        )
+        return
+
+    def on_moved(result):
+        on_done(result)
+        if result is not None:
+            # Markera filerna där de hamnade, t.ex. de som tagits tillbaka från arkivet
+            file_ids = [app.file_model.find(rel_path)
+                        for rel_path in (rename_engine.listed_rel_path(app, new_path) for _, new_path in result)
+                        if rel_path]
+            file_ids = [file_id for file_id in file_ids if file_id is not None]
+            if file_ids:
+                app.file_listbox.selection_clear()
+                app.file_listbox.select_ids(file_ids)
+                app.file_listbox.see_id(file_ids[0])
+            if operation.kind == "archive":
+                app.last_archived_label.config(text="Senast arkiverad: Ingen")
+    rename_engine.start_moves(app, plan, operation.description, kind=operation.kind, on_done=on_moved)
+
+def _can_start(app):
+    if app.operation_journal.busy or app.rename_cancel_event is not None or app.batch_cancel_event is not None:
+        messagebox.showwarning("Varning", "Vänta tills den pågående ändringen är klar.")
+        return False
+    return True
+
+def undo(app):
+    journal = app.operation_journal
+    if not journal.undo_stack:
+        messagebox.showwarning("Varning", "Det finns inget att ångra.")
+        return
+    if _can_start(app):
+        _run(app, journal.undo_stack[-1], undo=True)
+
+def redo(app):
+    journal = app.operation_journal
+    if not journal.redo_stack:
+        messagebox.showwarning("Varning", "Det finns inget att göra om.")
+        return
+    if _can_start(app):
+        _run(app, journal.redo_stack[-1], undo=False)
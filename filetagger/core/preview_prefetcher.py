@@ -0,0 +1,57 @@
+# core/preview_prefetcher.py
+import threading
+from collections import deque
+
+PREFETCH_WORKERS = 2
+
+class PreviewPrefetcher:
+    """Avkodar förhandsbilder i förväg i bakgrundstrådar och lägger dem i cachen.
+
+    schedule() ersätter hela kön, så när användaren hoppar till en annan del av
+    listan släpps de gamla grannarna direkt. En avkodning som redan pågår får
+    köra klart (den hamnar ändå i cachen), men inget nytt startas för den
+    gamla positionen.
+    """
+    def __init__(self, cache, workers=PREFETCH_WORKERS):
+        self.cache = cache
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._threads = []
+        for _ in range(workers):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def schedule(self, paths):
+        """Byter ut väntande arbete mot paths, i prioritetsordning."""
+        with self._condition:
+            self._queue.clear()
+            self._queue.extend(paths)
+            self._condition.notify_all()
+
+    def cancel(self):
+        with self._condition:
+            self._queue.clear()
+
+    def shutdown(self):
+        with self._condition:
+            self._stopped = True
+            self._queue.clear()
+            self._condition.notify_all()
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                path = self._queue.popleft()
+            try:
+                key = self.cache.make_key(path)
+                if key is not None and not self.cache.in_memory(key):
+                    # Läser från diskcachen eller avkodar originalet
+                    self.cache.get_preview(path)
+            except Exception as e:
+                print(f"Kunde inte förhämta förhandsbild för {path}: {e}")
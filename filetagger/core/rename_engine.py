@@ -0,0 +1,432 @@
+# core/rename_engine.py
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from tkinter import messagebox
+
+from filetagger.core.config import ARCHIVE_DIR_NAME, JOURNAL_DIR
+from filetagger.core.file_transfer import move_file
+
+RENAME_POLL_MS = 100
+PROGRESS_EVERY = 50       # Skicka förlopp till UI-tråden var 50:e flytt
+MAX_LISTED_CONFLICTS = 10
+PROGRESS_TEXTS = {"rename": "Byter namn", "archive": "Arkiverar"}
+# Texter i meddelandena när en omgång är klar: (omgången, filerna har ..., återställda filer har ..., feltitel)
+RESULT_TEXTS = {
+    "rename": ("Namnbytet", "döptes om", "fått tillbaka sina namn", "Fel vid namnbyte"),
+    "archive": ("Arkiveringen", "arkiverades", "flyttats tillbaka", "Fel vid arkivering"),
+}
+INLINE_MAX_STEPS = 8      # Så här små omgångar görs direkt, utan tråd och förloppsvisning
+
+class RenamePlan:
+    """Alla namnbyten i en omgång, uträknade och kontrollerade innan något ändras.
+
+    moves är en lista med (gammal sökväg, ny sökväg). steps är de faktiska
+    flyttarna i körordning: byten vars mål är en annan fils
+    nuvarande namn (t.ex. A->B och B->A) går via ett temporärt namn.
+    conflicts är en lista med (sökväg, felmeddelande) för filer som inte kan
+    döpas om.
+    """
+    __slots__ = ("moves", "steps", "conflicts")
+
+    def __init__(self):
+        self.moves = []
+        self.steps = []
+        self.conflicts = []
+
+def _key(path):
+    return os.path.normcase(path)
+
+def plan_renames(model, targets):
+    """Planerar namnbyten. targets är (file_id, nytt filnamn) i samma katalog som filen."""
+    moves = []
+    for file_id, new_name in targets:
+        old_path = model.full_path(file_id)
+        moves.append((old_path, os.path.join(os.path.dirname(old_path), new_name)))
+    return plan_moves(moves)
+
+def plan_moves(moves):
+    """Planerar flyttar (gammal sökväg, ny sökväg), även mellan kataloger.
+
+    Kollisioner upptäcks i minnet: varje målkatalog listas en gång och
+    målnamnen jämförs mot den och mot varandra.
+    """
+    plan = RenamePlan()
+    dir_listings = {}
+    sources = {}
+    for old_path, new_path in moves:
+        if new_path != old_path:
+            sources[_key(old_path)] = (old_path, new_path)
+
+    claimed = set()
+    planned = {}
+    for key, (old_path, new_path) in sources.items():
+        directory = os.path.dirname(new_path)
+        if directory not in dir_listings:
+            try:
+                dir_listings[directory] = {_key(os.path.join(directory, name)) for name in os.listdir(directory)}
+            except FileNotFoundError:
+                dir_listings[directory] = set()  # Skapas när flytten görs
+            except OSError as e:
+                print(f"Kunde inte lista {directory}: {e}")
+                dir_listings[directory] = set()
+        new_key = _key(new_path)
+        if new_key in claimed:
+            plan.conflicts.append((old_path, "En annan fil i omgången får samma namn."))
+        elif new_key in dir_listings[directory] and new_key not in sources and new_key != key:
+            plan.conflicts.append((old_path, f"{os.path.basename(new_path)} finns redan."))
+        else:
+            claimed.add(new_key)
+            planned[key] = (old_path, new_path)
+
+    # Ett mål som är en annan fils namn blir bara ledigt om den filen också
+    # flyttas; stryk flyttar som hänger på en fil som inte kan flyttas
+    blocked = True
+    while blocked:
+        blocked = [key for key, (_, new_path) in planned.items()
+                   if _key(new_path) in sources and _key(new_path) != key and _key(new_path) not in planned]
+        for key in blocked:
+            old_path, new_path = planned.pop(key)
+            plan.conflicts.append((old_path, f"{os.path.basename(new_path)} kan inte döpas om."))
+    plan.moves = list(planned.values())
+
+    # En flytt vars mål fortfarande upptas av en annan källa går först till
+    # ett temporärt namn och sist till sitt mål
+    moved = set(planned)
+    staged = []
+    direct = []
+    for old_path, new_path in plan.moves:
+        new_key = _key(new_path)
+        if new_key in moved and new_key != _key(old_path):
+            temp_path = os.path.join(os.path.dirname(old_path),
+                                     f".{os.path.basename(old_path)}.{os.getpid()}.renaming")
+            staged.append((old_path, temp_path, new_path))
+        else:
+            direct.append((old_path, new_path))
+    plan.steps = ([(old_path, temp_path) for old_path, temp_path, _ in staged]
+                  + direct
+                  + [(temp_path, new_path) for _, temp_path, new_path in staged])
+    return plan
+
+class RenameJournal:
+    """Journal som skrivs innan några filer döps om.
+
+    Alla steg i planen skrivs till en JSONL-fil som synkas till disk. Går
+    något fel backas de genomförda stegen i omvänd ordning och journalen tas
+    bort. Finns den kvar när programmet startar avbröts programmet mitt i
+    en omgång, och stegen kan backas utifrån vilka filer som finns.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def create(cls, description, steps, journal_dir=JOURNAL_DIR):
+        os.makedirs(journal_dir, exist_ok=True)
+        path = os.path.join(journal_dir, f"rename-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"description": description, "created": time.time()}) + "\n")
+            for old_path, new_path in steps:
+                f.write(json.dumps({"from": old_path, "to": new_path}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return cls(path)
+
+    @classmethod
+    def pending(cls, journal_dir=JOURNAL_DIR):
+        return [cls(path) for path in sorted(glob.glob(os.path.join(journal_dir, "rename-*.jsonl")))]
+
+    def _read(self):
+        with open(self.path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            steps = []
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    steps.append((entry["from"], entry["to"]))
+        return header, steps
+
+    def description(self):
+        return self._read()[0].get("description", "")
+
+    def step_count(self):
+        return len(self._read()[1])
+
+    def rollback(self):
+        """Backar de steg som genomförts, dvs. där målet finns men inte källan.
+
+        Returnerar (antal backade steg, lista med (sökväg, fel)).
+        """
+        _, steps = self._read()
+        return _undo_steps(reversed(steps), check=True)
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+def _undo_steps(steps, check=False):
+    undone = 0
+    failures = []
+    for old_path, new_path in steps:
+        try:
+            if check and (os.path.lexists(old_path) or not os.path.lexists(new_path)):
+                continue
+            move_file(new_path, old_path)
+            undone += 1
+        except OSError as e:
+            failures.append((new_path, str(e)))
+    return undone, failures
+
+def rename_files(app, targets, description):
+    """Döper om filer. targets är (file_id, nytt filnamn), eller en funktion
+    som returnerar dem när omgången startar.
+
+    Hela omgången är en transaktion: misslyckas ett namnbyte, eller avbryts
+    omgången, återställs alla filer. Fillistan uppdateras i en omgång när
+    allt är klart. Pågår redan en omgång ställs den här i kö efter den, så
+    att snabba tryck på kortkommandona inte tappas; ges targets som en
+    funktion räknas namnen fram först då, från filernas namn efter den
+    pågående omgången.
+    """
+    if app.rename_cancel_event is not None:
+        app.rename_queue.append((targets, description))
+        return
+    if callable(targets):
+        targets = targets()
+    plan = plan_renames(app.file_model, targets)
+    if plan.conflicts:
+        if not plan.moves:
+            messagebox.showerror("Fel vid namnbyte", f"Inga filer kunde döpas om:\n\n{format_paths(plan.conflicts)}")
+            return
+        if not messagebox.askyesno(
+            "Namnkonflikter",
+            f"{len(plan.conflicts)} filer kan inte döpas om:\n\n{format_paths(plan.conflicts)}\n\n"
+            f"Döpa om de övriga {len(plan.moves)} filerna?"
+        ):
+            return
+    start_moves(app, plan, description)
+
+def _start_queued_renames(app):
+    """Startar omgångar som köats medan en annan pågick, tills en av dem går i bakgrunden."""
+    while app.rename_queue and app.rename_cancel_event is None:
+        targets, description = app.rename_queue.popleft()
+        rename_files(app, targets, description)
+
+def _runs_inline(plan):
+    """Små omgångar utan temporära namn eller kopiering görs direkt i UI-tråden."""
+    return (len(plan.steps) <= INLINE_MAX_STEPS and len(plan.steps) == len(plan.moves)
+            and all(os.path.dirname(old_path) == os.path.dirname(new_path) for old_path, new_path in plan.steps))
+
+def start_moves(app, plan, description, kind="rename", on_done=None):
+    """Genomför en planerad omgång, i bakgrunden om den är större än INLINE_MAX_STEPS.
+
+    När omgången är klar förs den in i historiken för ångra/gör om, eller,
+    om on_done anges, anropas on_done(flyttar) i stället. Misslyckas eller
+    avbryts omgången anropas on_done(None).
+    """
+    if not plan.steps:
+        if on_done is not None:
+            on_done(plan.moves)
+        return
+    cancel_event = threading.Event()
+    if _runs_inline(plan):
+        result = _run_steps(plan.steps, description, cancel_event, lambda done, copied: None)
+        _finish_moves(app, plan, description, kind, on_done, result)
+        return
+    result_queue = queue.Queue()
+    app.rename_cancel_event = cancel_event
+    threading.Thread(
+        target=_rename_thread,
+        args=(plan.steps, description, result_queue, cancel_event),
+        daemon=True
+    ).start()
+    total = len(plan.steps)
+    text = PROGRESS_TEXTS.get(kind, PROGRESS_TEXTS["rename"])
+    app.show_task_progress("rename", f"{text}... 0/{total}", 0, total, on_cancel=cancel_event.set)
+    app.root.after(RENAME_POLL_MS, lambda: _poll_rename(app, plan, description, kind, on_done,
+                                                        result_queue, cancel_event))
+
+def _run_steps(steps, description, cancel_event, on_progress):
+    """Gör flyttarna i ordning och backar alla om någon misslyckas.
+
+    Returnerar ("done", None), eller ("error"/"aborted", (fel, misslyckade
+    återställningar)). Ett enda steg är ett atomärt os.rename och behöver
+    ingen journal.
+    """
+    journal = None
+    if len(steps) > 1:
+        try:
+            journal = RenameJournal.create(description, steps)
+        except OSError as e:
+            return "error", (f"Journalen kunde inte skrivas: {e}", [])
+    done = 0
+    error = None
+    for old_path, new_path in steps:
+        if cancel_event.is_set():
+            break
+        try:
+            # os.rename skriver över befintliga filer på Linux; kontrollera igen
+            # ifall filen skapats efter planeringen
+            if _key(new_path) != _key(old_path) and os.path.lexists(new_path):
+                raise FileExistsError(f"{os.path.basename(new_path)} finns redan.")
+            if os.path.dirname(new_path) != os.path.dirname(old_path):
+                os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            copied = move_file(old_path, new_path)
+        except OSError as e:
+            error = f"{os.path.basename(old_path)}: {e}"
+            break
+        done += 1
+        on_progress(done, copied)
+
+    if error is None and not cancel_event.is_set():
+        if journal is not None:
+            journal.discard()
+        return "done", None
+    _, failures = _undo_steps(reversed(steps[:done]))
+    if journal is not None and not failures:
+        journal.discard()  # Annars finns journalen kvar till nästa start
+    return ("error" if error else "aborted"), (error, failures)
+
+def _rename_thread(steps, description, result_queue, cancel_event):
+    def on_progress(done, copied):
+        if copied or done % PROGRESS_EVERY == 0:  # Kopior mellan filsystem tar tid
+            result_queue.put(("progress", done))
+    result_queue.put(_run_steps(steps, description, cancel_event, on_progress))
+
+def format_paths(entries):
+    lines = [f"{os.path.basename(path)}: {message}" for path, message in entries[:MAX_LISTED_CONFLICTS]]
+    if len(entries) > MAX_LISTED_CONFLICTS:
+        lines.append(f"... och {len(entries) - MAX_LISTED_CONFLICTS} till")
+    return "\n".join(lines)
+
+def _poll_rename(app, plan, description, kind, on_done, result_queue, cancel_event):
+    result = None
+    done = None
+    try:
+        while True:
+            message_kind, payload = result_queue.get_nowait()
+            if message_kind == "progress":
+                done = payload
+            else:
+                result = (message_kind, payload)
+                break
+    except queue.Empty:
+        pass
+
+    total = len(plan.steps)
+    if result is None:
+        if done is not None:
+            text = PROGRESS_TEXTS.get(kind, PROGRESS_TEXTS["rename"])
+            text = "Avbryter..." if cancel_event.is_set() else f"{text}... {done}/{total}"
+            app.show_task_progress("rename", text, done, total, on_cancel=cancel_event.set)
+        app.root.after(RENAME_POLL_MS, lambda: _poll_rename(app, plan, description, kind, on_done,
+                                                            result_queue, cancel_event))
+        return
+
+    app.rename_cancel_event = None
+    app.hide_task_progress("rename")
+    _finish_moves(app, plan, description, kind, on_done, result)
+    _start_queued_renames(app)
+
+def _finish_moves(app, plan, description, kind, on_done, result):
+    result_kind, payload = result
+    operation, done_text, restored_text, error_title = RESULT_TEXTS.get(kind, RESULT_TEXTS["rename"])
+    if result_kind == "done":
+        apply_moves_to_model(app, plan.moves)
+        if on_done is not None:
+            on_done(plan.moves)
+        else:
+            app.operation_journal.record(kind, description, moves=plan.moves)
+        app.update_preview(None)
+        if plan.conflicts:
+            messagebox.showwarning(
+                "Klart med fel",
+                f"{len(plan.moves)} filer {done_text}. Följande hoppades över:\n\n{format_paths(plan.conflicts)}"
+            )
+        return
+    if on_done is not None:
+        on_done(None)
+    error, failures = payload
+    message = f"{operation} avbröts" if result_kind == "aborted" else f"{operation} misslyckades ({error})"
+    if failures:
+        messagebox.showerror(
+            error_title,
+            f"{message}, men följande filer kunde inte återställas (journalen har sparats):\n\n"
+            f"{format_paths(failures)}"
+        )
+    elif result_kind == "error":
+        messagebox.showerror(error_title, f"{message}. Inga filer har ändrats.")
+    else:
+        messagebox.showinfo("Avbrutet", f"{operation} avbröts och alla filer har {restored_text}.")
+
+def listed_rel_path(app, path):
+    """Relativ sökväg om filen hör till fillistan för den öppna mappen, annars None."""
+    folder = app.file_model.folder
+    if not folder:
+        return None
+    try:
+        rel_path = os.path.relpath(path, folder)
+    except ValueError:
+        return None  # Annan enhet på Windows
+    parts = rel_path.split(os.sep)
+    if parts[0] == os.pardir or ARCHIVE_DIR_NAME in parts[:-1]:
+        return None
+    if os.path.splitext(rel_path)[1].lower() not in {ext.lower() for ext in app.allowed_extensions}:
+        return None
+    return rel_path
+
+def apply_moves_to_model(app, moves):
+    """För in flyttarna i fillistan och ritar om den en gång.
+
+    Filer som flyttas ut ur listan (t.ex. till arkivet) tas bort och filer
+    som flyttas in läggs till. Returnerar id:n för tillagda filer.
+    """
+    model = app.file_model
+    removed_ids = []
+    added = []
+    for old_path, new_path in moves:
+        old_rel = listed_rel_path(app, old_path)
+        new_rel = listed_rel_path(app, new_path)
+        file_id = model.find(old_rel) if old_rel else None
+        if file_id is not None and new_rel:
+            model.rename(file_id, new_rel)
+        elif file_id is not None:
+            removed_ids.append(file_id)
+        elif new_rel and model.find(new_rel) is None:
+            added.append(new_rel)
+    model.remove(removed_ids)
+    added_ids = model.extend(added)
+    app.file_listbox.refresh()
+    app.file_count_label.config(text=f"Filer: {len(model)}")
+    return added_ids
+
+def recover_interrupted_renames(app):
+    """Erbjuder att backa namnbyten som avbröts när programmet stängdes eller kraschade."""
+    for journal in RenameJournal.pending():
+        try:
+            description = journal.description()
+            count = journal.step_count()
+        except (OSError, ValueError) as e:
+            print(f"Kunde inte läsa journalen {journal.path}: {e}")
+            continue
+        answer = messagebox.askyesno(
+            "Avbrutet namnbyte",
+            f"Ett namnbyte ({description}) av {count} filer blev aldrig klart.\n\n"
+            "Vill du återställa filerna till sina tidigare namn?"
+        )
+        if not answer:
+            journal.discard()
+            continue
+        restored, failures = journal.rollback()
+        if failures:
+            messagebox.showerror(
+                "Fel",
+                f"{restored} namnbyten backades, men följande misslyckades:\n\n{format_paths(failures)}"
+            )
+        else:
+            journal.discard()
+            messagebox.showinfo("Klart", f"{restored} namnbyten har backats.")
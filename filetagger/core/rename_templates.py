@@ -0,0 +1,161 @@
+# core/rename_templates.py
+import os
+import re
+import string
+import threading
+from datetime import datetime
+
+from filetagger.core.metadata_extraction import current_metadata
+
+DEFAULT_TEMPLATE = "{date:%Y%m%d}_{seq}"
+DEFAULT_DATE_FORMAT = "%Y%m%d"
+DEFAULT_SEQ_FORMAT = "03d"
+PLACE_GRID_DECIMALS = 2  # Bilder inom ungefär en kilometer delar ortnamnsuppslag
+
+# Fält som kan användas i en mall och deras beskrivning i dialogen
+TEMPLATE_FIELDS = {
+    "date": "fotodatum, t.ex. {date:%Y%m%d_%H%M%S} (ändringstid om fotodatum saknas)",
+    "camera": "kameramodell",
+    "place": "ort från GPS-koordinaterna",
+    "seq": "löpnummer i listans ordning, t.ex. {seq:04d}",
+    "name": "nuvarande filnamn utan filändelse",
+}
+
+_INVALID_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+class RenameTemplate:
+    """En namnmall som {date:%Y%m%d}_{camera}_{place}_{seq}.
+
+    Mallen tolkas en gång när den skapas; render() fyller sedan i den för en
+    fil i taget. Filändelsen behålls alltid och ingår inte i mallen.
+    """
+    def __init__(self, text):
+        self.text = text
+        self.parts = []  # (bokstavlig text, fält eller None, formatangivelse)
+        try:
+            parsed = list(string.Formatter().parse(text))
+        except ValueError as e:
+            raise ValueError(f"Mallen kunde inte tolkas: {e}")
+        for literal, field, format_spec, conversion in parsed:
+            if field is not None:
+                if field not in TEMPLATE_FIELDS:
+                    raise ValueError(f"Okänt fält {{{field}}}. Tillgängliga fält: "
+                                     + ", ".join(f"{{{name}}}" for name in TEMPLATE_FIELDS))
+                if conversion:
+                    raise ValueError(f"Fältet {{{field}}} kan inte ha !{conversion}.")
+            self.parts.append((literal, field, format_spec))
+        self.fields = {field for _, field, _ in self.parts if field is not None}
+        if not self.fields and not text.strip():
+            raise ValueError("Mallen är tom.")
+        # Kontrollera formaten direkt i stället för vid första filen
+        self.render({"date": datetime(2000, 1, 1), "camera": "", "place": "", "seq": 1, "name": ""})
+
+    def render(self, values):
+        """Returnerar namnet (utan filändelse) för en fil med fältvärdena values."""
+        pieces = []
+        for literal, field, format_spec in self.parts:
+            pieces.append(literal)
+            if field is None:
+                continue
+            value = values.get(field)
+            if field == "date":
+                pieces.append(value.strftime(format_spec or DEFAULT_DATE_FORMAT) if value else "")
+            elif field == "seq":
+                try:
+                    pieces.append(format(value, format_spec or DEFAULT_SEQ_FORMAT))
+                except ValueError as e:
+                    raise ValueError(f"Ogiltigt format för {{seq}}: {e}")
+            else:
+                pieces.append(format(value or "", format_spec))
+        return "".join(pieces)
+
+def sanitize_filename(name):
+    """Ersätter tecken som inte får förekomma i filnamn och tar bort punkter och mellanslag i slutet."""
+    return _INVALID_CHARS.sub("_", name).rstrip(". ")
+
+def _date_value(metadata):
+    if metadata.date_taken:
+        try:
+            return datetime.strptime(metadata.date_taken.strip()[:19], "%Y:%m:%d %H:%M:%S")
+        except ValueError:
+            pass
+    return datetime.fromtimestamp(metadata.mtime)
+
+def _camera_value(metadata):
+    make = (metadata.make or "").strip()
+    model = (metadata.model or "").strip()
+    if make and model and not model.lower().startswith(make.split()[0].lower()):
+        return f"{make} {model}"
+    return model or make
+
+class PlaceCache:
+    """Ortnamn per ruta i ett rutnät av koordinater, så att bilder tagna nära
+    varandra bara kostar ett uppslag. Trådsäker."""
+    def __init__(self, lookup):
+        self.lookup = lookup  # (lat, lon) -> ortnamn eller None
+        self._places = {}
+        self._lock = threading.Lock()
+
+    def place(self, lat, lon):
+        """Returnerar ortnamnet, eller kastar samma fel igen om uppslaget för rutan misslyckats."""
+        key = (round(lat, PLACE_GRID_DECIMALS), round(lon, PLACE_GRID_DECIMALS))
+        with self._lock:
+            if key in self._places:
+                place = self._places[key]
+                if isinstance(place, Exception):
+                    raise place
+                return place
+        try:
+            place = self.lookup(*key)
+        except Exception as e:
+            with self._lock:
+                self._places[key] = e
+            raise
+        with self._lock:
+            self._places[key] = place
+        return place
+
+def evaluate_template(template, folder, entries, exif_reader, place_cache=None, cancel_event=None):
+    """Räknar fram nya namn för alla filer. entries är (file_id, sökväg) i listans ordning.
+
+    Returnerar en lista med (file_id, sökväg, nytt filnamn eller None, fel
+    eller None) i samma ordning. Löpnumret följer entries och börjar på 1.
+    """
+    paths = [path for _, path in entries]
+    metadata = current_metadata(folder, paths, exif_reader)
+    results = []
+    place_errors = 0
+    for seq, (file_id, path) in enumerate(entries, start=1):
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        base, ext = os.path.splitext(os.path.basename(path))
+        item = metadata.get(path)
+        if item is None:
+            results.append((file_id, path, None, "Filen kunde inte läsas."))
+            continue
+        values = {"seq": seq, "name": base, "date": _date_value(item), "camera": _camera_value(item), "place": ""}
+        if "place" in template.fields:
+            if item.latitude is None or item.longitude is None:
+                results.append((file_id, path, None, "Bilden saknar GPS-koordinater."))
+                continue
+            if place_cache is None:
+                results.append((file_id, path, None, "Ingen API-nyckel för Google Maps."))
+                continue
+            try:
+                values["place"] = place_cache.place(item.latitude, item.longitude) or ""
+            except Exception as e:
+                place_errors += 1
+                if place_errors == 1:
+                    print(f"Fel vid uppslag av ort: {e}")
+                results.append((file_id, path, None, f"Orten kunde inte slås upp: {e}"))
+                continue
+        try:
+            new_base = sanitize_filename(template.render(values))
+        except ValueError as e:
+            results.append((file_id, path, None, str(e)))
+            continue
+        if not new_base:
+            results.append((file_id, path, None, "Mallen gav ett tomt namn."))
+            continue
+        results.append((file_id, path, new_base + ext, None))
+    return results
@@ -0,0 +1,112 @@
+# core/settings_store.py
+import copy
+import json
+import os
+import threading
+import time
+
+from filetagger.core.config import SETTINGS_FILE
+
+SAVE_DELAY_SECONDS = 2.0  # Så länge ska det vara tyst innan ändringar skrivs till disk
+
+class SettingsStore:
+    """Håller inställningarna i minnet och skriver dem till settings.json i bakgrunden.
+
+    update() och replace() ändrar bara minnet och markerar att något
+    ändrats. En skrivtråd väntar tills det varit tyst i SAVE_DELAY_SECONDS
+    och skriver sedan allt på en gång, så att t.ex. en tagg som skrivs in
+    tecken för tecken blir en enda skrivning. Filen skrivs till en
+    temporär fil som sedan ersätter den gamla, så en krasch mitt i
+    lämnar aldrig en halv settings.json. close() skriver det som återstår.
+    """
+    def __init__(self, path=SETTINGS_FILE, delay=SAVE_DELAY_SECONDS):
+        self.path = path
+        self.delay = delay
+        self._values = self._read()
+        self._dirty = False
+        self._deadline = 0.0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()  # Skrivtråden och flush() skriver aldrig samtidigt
+        self._thread = None
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as f:
+                values = json.load(f)
+            return values if isinstance(values, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def update(self, values):
+        """Ändrar de angivna nycklarna och behåller resten."""
+        with self._condition:
+            merged = dict(self._values)
+            merged.update(copy.deepcopy(values))
+            self._set(merged)
+
+    def replace(self, values):
+        """Ersätter alla sparade inställningar med values."""
+        with self._condition:
+            self._set(copy.deepcopy(values))
+
+    def _set(self, values):
+        if values == self._values:
+            return
+        self._values = values
+        self._dirty = True
+        self._deadline = time.monotonic() + self.delay
+        if self._closed:
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer, daemon=True)
+            self._thread.start()
+        self._condition.notify()
+
+    def _writer(self):
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._dirty:
+                        remaining = self._deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                if self._closed:
+                    return
+            self.flush()
+
+    def flush(self):
+        """Skriver ändringar som ännu inte sparats direkt."""
+        with self._write_lock:
+            with self._condition:
+                if not self._dirty:
+                    return
+                values = self._values
+                self._dirty = False
+            try:
+                self._write(values)
+            except OSError as e:
+                print(f"Fel vid sparande av inställningar till {self.path}: {e}")
+
+    def _write(self, values):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(values, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def close(self):
+        """Stoppar skrivtråden och skriver det som återstår. Anropas när programmet stängs."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
@@ -0,0 +1,35 @@
+# core/startup_profile.py
+import time
+
+# Startas när modulen importeras, vilket run_filetagger.py gör först av allt
+_start = time.perf_counter()
+_last = _start
+_phases = []  # (fas, sekunder)
+_enabled = False
+
+def enable():
+    """Slår på mätningen; anropas av run_filetagger.py vid --profile-startup."""
+    global _enabled
+    _enabled = True
+
+def mark(phase):
+    """Avslutar en fas i uppstarten. Gör ingenting om mätningen inte är påslagen."""
+    global _last
+    if not _enabled:
+        return
+    now = time.perf_counter()
+    _phases.append((phase, now - _last))
+    _last = now
+
+def report():
+    """Skriver ut tiden för varje fas en gång, när uppstarten är klar."""
+    global _enabled
+    if not _enabled:
+        return
+    _enabled = False
+    total = time.perf_counter() - _start
+    width = max([len(phase) for phase, _ in _phases] + [len("Totalt")])
+    print("Uppstartstider:")
+    for phase, seconds in _phases:
+        print(f"  {phase:<{width}}  {seconds * 1000:8.1f} ms  {seconds / total:6.1%}")
+    print(f"  {'Totalt':<{width}}  {total * 1000:8.1f} ms")
@@ -0,0 +1,251 @@
+# core/thumbnail_cache.py
+import hashlib
+import io
+import os
+import threading
+import warnings
+from collections import OrderedDict
+from PIL import Image
+
+from filetagger.core.config import THUMBNAIL_CACHE_DIR
+
+PREVIEW_SOURCE_SIZE = (1600, 1600)         # Största storlek som sparas; förhandsvisningen skalas ner från den
+MEMORY_BUDGET_BYTES = 256 * 1024 * 1024    # Avkodade bilder i minnet
+DISK_BUDGET_BYTES = 1024 * 1024 * 1024     # Miniatyrfiler på disk
+DISK_EVICT_TARGET = 0.9                    # Rensa ner till denna andel av budgeten
+REDUCING_GAP = 2.0                         # reduce() tar bilden till högst så här många gånger målstorleken
+
+def _fit_size(size, max_size):
+    """Storleken som size får när den skalas ner proportionerligt till max_size."""
+    width, height = size
+    scale = min(max_size[0] / width, max_size[1] / height, 1.0)
+    return (max(1, round(width * scale)), max(1, round(height * scale)))
+
+def decode_preview(path, max_size):
+    """Avkodar originalbilden direkt i reducerad upplösning och skalar den till högst max_size.
+
+    JPEG-filer avkodas med DCT-skalning (1/2, 1/4, 1/8) via draft(), så att hela
+    bilden aldrig behöver packas upp. Andra format skalas först ner med
+    reduce() i heltalssteg till högst REDUCING_GAP gånger målstorleken och
+    omsamplas sedan, så även stora skanningar och panoramor får en
+    förhandsbild. Bara bilder över Pillows gräns (Image.MAX_IMAGE_PIXELS)
+    avvisas, med DecompressionBombError.
+    """
+    with warnings.catch_warnings():
+        # Bilder mellan en och två gånger Pillows gräns avkodas utan varning;
+        # över det kastar Image.open DecompressionBombError
+        warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+        with Image.open(path) as img:
+            if img.format == "JPEG":
+                img.draft(None, _fit_size(img.size, max_size))
+            img.thumbnail(max_size, reducing_gap=REDUCING_GAP)
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+    return img
+
+def read_embedded_thumbnail(path):
+    """Läser bildens storlek och den inbäddade EXIF-miniatyren utan att avkoda bilden.
+
+    Image.open läser bara filhuvudet, så det här är billigt nog att göra i
+    UI-tråden. Returnerar (storlek, miniatyr) där miniatyr är None om filen
+    saknar en; storlek är None om filen inte går att öppna.
+    """
+    try:
+        with Image.open(path) as img:
+            size = img.size
+            exif_raw = img.info.get("exif")
+    except Exception:
+        return None, None
+    if not exif_raw:
+        return size, None
+    try:
+        import piexif  # Laddas först när en miniatyr läses
+        thumbnail_bytes = piexif.load(exif_raw).get("thumbnail")
+        if not thumbnail_bytes:
+            return size, None
+        with Image.open(io.BytesIO(thumbnail_bytes)) as thumb:
+            thumb.load()
+            return size, thumb.convert("RGB")
+    except Exception as e:
+        print(f"Kunde inte läsa inbäddad miniatyr ({path}): {e}")
+        return size, None
+
+def _image_bytes(image):
+    return image.width * image.height * len(image.getbands())
+
+class ThumbnailCache:
+    """Cache i två nivåer för nedskalade förhandsbilder.
+
+    Nyckeln är (sökväg, mtime, storlek) så att en ändrad fil automatiskt ger
+    en ny post. Första nivån är en LRU i minnet med en budget i byte, andra
+    nivån en katalog med JPEG/PNG-filer som rensas på de äldsta filerna när
+    den växer över sin budget. Klassen är trådsäker.
+    """
+    def __init__(self, cache_dir=THUMBNAIL_CACHE_DIR, memory_budget=MEMORY_BUDGET_BYTES,
+                 disk_budget=DISK_BUDGET_BYTES, max_size=PREVIEW_SOURCE_SIZE):
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.max_size = max_size
+        self._memory = OrderedDict()  # nyckel -> PIL Image
+        self._memory_bytes = 0
+        self._disk_bytes = None       # Räknas ut första gången disken används
+        self._in_flight = {}          # nyckel -> Event för avkodningar som pågår
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(path):
+        """Returnerar cachenyckeln för en fil, eller None om den inte går att läsa."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+    def preview_size(self, image_size):
+        """Storleken som förhandsbilden får för en bild med storleken image_size."""
+        return _fit_size(image_size, self.max_size)
+
+    def get_preview(self, path):
+        """Hämtar en förhandsbild från cachen eller skapar och sparar den.
+
+        Om en annan tråd redan avkodar samma fil väntar anropet på den i
+        stället för att avkoda en gång till.
+        """
+        key = self.make_key(path)
+        if key is None:
+            return None
+        while True:
+            image = self.get(key)
+            if image is not None:
+                return image
+            with self._lock:
+                pending = self._in_flight.get(key)
+                if pending is None:
+                    self._in_flight[key] = threading.Event()
+                    break
+            pending.wait()
+        try:
+            image = decode_preview(path, self.max_size)
+            self.put(key, image)
+            return image
+        finally:
+            with self._lock:
+                self._in_flight.pop(key).set()
+
+    def get(self, key):
+        """Slår upp nyckeln i minnet och sedan på disk. Ger None vid miss."""
+        with self._lock:
+            image = self._memory.get(key)
+            if image is not None:
+                self._memory.move_to_end(key)
+                return image
+        image = self._load_from_disk(key)
+        if image is not None:
+            self._remember(key, image)
+        return image
+
+    def in_memory(self, key):
+        with self._lock:
+            return key in self._memory
+
+    def put(self, key, image):
+        self._remember(key, image)
+        self._save_to_disk(key, image)
+
+    # ----- Minnesnivån -----
+
+    def _remember(self, key, image):
+        size = _image_bytes(image)
+        if size > self.memory_budget:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._memory_bytes -= _image_bytes(previous)
+            self._memory[key] = image
+            self._memory_bytes += size
+            while self._memory_bytes > self.memory_budget:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= _image_bytes(evicted)
+
+    # ----- Disknivån -----
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def _load_from_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with Image.open(path) as img:
+                img.load()
+                image = img.copy()
+            os.utime(path)  # Markera som nyligen använd inför rensning
+            return image
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Kunde inte läsa miniatyr från cachen ({path}): {e}")
+            return None
+
+    def _save_to_disk(self, key, image):
+        path = self._disk_path(key)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if image.mode == "RGBA":
+                image.save(temp_path, format="PNG")
+            else:
+                image.save(temp_path, format="JPEG", quality=90)
+            os.replace(temp_path, path)
+            size = os.path.getsize(path)
+        except Exception as e:
+            print(f"Kunde inte spara miniatyr i cachen ({path}): {e}")
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = self._measure_disk()
+            else:
+                self._disk_bytes += size
+            over_budget = self._disk_bytes > self.disk_budget
+        if over_budget:
+            self._evict_disk()
+
+    def _list_disk_files(self):
+        files = []
+        if not os.path.isdir(self.cache_dir):
+            return files
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, entry.path))
+        return files
+
+    def _measure_disk(self):
+        return sum(size for _, size, _ in self._list_disk_files())
+
+    def _evict_disk(self):
+        """Tar bort de minst nyligen använda filerna tills disknivån är under budget."""
+        files = sorted(self._list_disk_files())
+        total = sum(size for _, size, _ in files)
+        target = self.disk_budget * DISK_EVICT_TARGET
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        with self._lock:
+            self._disk_bytes = total
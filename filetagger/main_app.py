@@ -2,13 +2,22 @@
 import tkinter as tk
 import os
 import threading
+from collections import deque
 from tkinter import filedialog, messagebox
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from PIL import Image, ImageTk
 
 from filetagger.ui.animated_button import AnimatedImageButton
-from filetagger.core import config, file_operations, image_processing, api_integration
+from filetagger.ui.virtual_listbox import VirtualListbox
+from filetagger.ui.preview_renderer import PreviewRenderer
+from filetagger.ui.thumbnail_grid import ThumbnailGrid
+from filetagger.ui.rename_template_dialog import RenameTemplateDialog
+from filetagger.core import config, file_operations, image_processing, api_integration, batch_metadata, rename_engine, rename_templates, operation_journal, startup_profile, http_client, geocode_cache
+from filetagger.core.file_model import FileModel
+from filetagger.core.thumbnail_cache import ThumbnailCache
+from filetagger.core.exif_reader import ExifReader
+from filetagger.core.preview_prefetcher import PreviewPrefetcher
+from filetagger.core.settings_store import SettingsStore
 
 class FileRenamerApp:
     def __init__(self, root):
@@ -16,6 +25,13 @@ class FileRenamerApp:
         self.root.title("Filnamnsändrare med Taggning")
         self.style = ttk.Style("darkly")
         self.analysis_thread = None # Håller reda på den aktiva analystråden
+        self.scan_thread = None # Bakgrundstråd som skannar mappen
+        self.scan_cancel_event = None
+        self.folder_watcher = None # Bevakar mappen efter externa ändringar
+        self.metadata_cancel_event = None # Avbryter genomgången av metadata för mappen
+        self.batch_cancel_event = None # Avbryter en pågående batchändring av metadata
+        self.rename_cancel_event = None # Avbryter ett pågående namnbyte
+        self.rename_queue = deque() # Namnbyten som väntar på att det pågående ska bli klart
         self.root.minsize(800, 600)
 
         self.folder = ""
@@ -24,14 +40,16 @@ class FileRenamerApp:
         self.tags = [""] * len(self.shortcut_keys)
         self.is_assigning_shortcut = False
         self.shortcut_assign_index = None
-        self.current_photo = None
         self.text_entries = []
         self.saved_horizontal_sash_pos = 300
         self.saved_vertical_sash_pos = 400
         self.saved_metadata_sash_pos = 300
         self.sash_positions_set = False
-        self.archived_files = []
+        self.operation_journal = operation_journal.OperationJournal() # Historik för ångra/gör om
+        self.settings_store = SettingsStore() # Sparar settings.json i bakgrunden
         self.external_viewer_path = ""
+        self.gpx_clock_offset = "+00:00"
+        self.rename_template = rename_templates.DEFAULT_TEMPLATE
         self.google_maps_api_key = ""
 
         self.imgbb_api_key = ""
@@ -42,16 +60,26 @@ class FileRenamerApp:
 
         self.progressbar = None
         self.progress_label = None
+        self.progress_cancel_btn = None
+        self.progress_tasks = {} # Bakgrundsuppgifter med förlopp: namn -> (text, klara, totalt, avbryt)
         self.last_archived_label = None
         self.metadata_labels = {}
         self.metadata_entries = {}
         self.current_file_path = None
+        self.file_model = FileModel()
+        self.thumbnail_cache = ThumbnailCache()
+        self.exif_reader = ExifReader()
+        self.preview_prefetcher = PreviewPrefetcher(self.thumbnail_cache)
 
         self.create_top_toolbar()
         self.create_path_display()
         self.create_main_content()
+        startup_profile.mark("widgetar")
 
         self.load_settings()
+        batch_metadata.recover_interrupted_batches(self)
+        rename_engine.recover_interrupted_renames(self)
+        startup_profile.mark("inställningar")
 
         # ----- UPPdaterade Felkontroller -----
         if not self.imgbb_api_key:
@@ -88,14 +116,20 @@ class FileRenamerApp:
             self.list_files()
         else:
             self.file_count_label.config(text="Filer: 0")
-            self.file_listbox.insert(tk.END, "Välj en katalog för att visa filer.")
+            self.file_listbox.set_placeholder("Välj en katalog för att visa filer.")
+            startup_profile.report()  # Ingen fillista att vänta på
 
         self.setup_keyboard_shortcuts()
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         self.root.bind("<Configure>", self.on_window_resize)
+        self.root.bind("<Control-z>", self.undo)
+        self.root.bind("<Control-y>", self.redo)
+        self.root.bind("<Control-Shift-Z>", self.redo)
         self.paned_window.bind("<Configure>", self.set_sash_positions_once)
 
     def show_progress(self):
+        self.progressbar.config(mode="indeterminate")
+        self.progress_label.config(text="Analyserar bild...")
         self.progressbar.pack(side=tk.LEFT, padx=5)
         self.progress_label.pack(side=tk.LEFT, padx=5)
         self.progressbar.start()
@@ -105,8 +139,45 @@ class FileRenamerApp:
         self.progressbar.stop()
         self.progressbar.pack_forget()
         self.progress_label.pack_forget()
+        self.progress_cancel_btn.pack_forget()
         self.root.update_idletasks()
 
+    def show_task_progress(self, task, text, done, total, on_cancel=None):
+        """Visar förloppet för bakgrundsuppgiften task.
+
+        Pågår flera uppgifter samtidigt visas den senaste som går att avbryta
+        (on_cancel), annars den senaste. En pågående bildanalys har företräde.
+        """
+        self.progress_tasks.pop(task, None)
+        self.progress_tasks[task] = (text, done, total, on_cancel)
+        self._show_current_task_progress()
+
+    def hide_task_progress(self, task):
+        if self.progress_tasks.pop(task, None) is not None:
+            self._show_current_task_progress()
+
+    def _show_current_task_progress(self):
+        if self.analysis_thread and self.analysis_thread.is_alive():
+            return
+        if not self.progress_tasks:
+            self.hide_progress()
+            return
+        tasks = list(self.progress_tasks.values())
+        cancellable = [task for task in tasks if task[3] is not None]
+        text, done, total, on_cancel = (cancellable or tasks)[-1]
+        self.progressbar.stop()
+        self.progressbar.config(mode="determinate", maximum=max(1, total), value=done)
+        self.progress_label.config(text=text)
+        if not self.progressbar.winfo_manager():
+            self.progressbar.pack(side=tk.LEFT, padx=5)
+            self.progress_label.pack(side=tk.LEFT, padx=5)
+        if on_cancel is not None:
+            self.progress_cancel_btn.config(command=on_cancel)
+            if not self.progress_cancel_btn.winfo_manager():
+                self.progress_cancel_btn.pack(side=tk.LEFT, padx=5)
+        else:
+            self.progress_cancel_btn.pack_forget()
+
     def upload_image_to_imgbb(self, file_path):
         return api_integration.upload_image_to_imgbb(file_path, self.imgbb_api_key)
 
@@ -114,8 +185,8 @@ class FileRenamerApp:
     #    api_integration.analyze_image_with_google_lens(self)
 
     def analyze_image_with_google_lens(self):
-        selected_indices = self.file_listbox.curselection()
-        if len(selected_indices) != 1:
+        selected_paths = file_operations.selected_file_paths(self)
+        if len(selected_paths) != 1:
             messagebox.showwarning("Varning", "Välj exakt en fil för analys.")
             return
 
@@ -128,15 +199,15 @@ class FileRenamerApp:
         self.show_progress()
 
         # Starta och spara trådobjektet
-        self.analysis_thread = threading.Thread(target=api_integration._analyze_image_thread, args=(self, selected_indices))
+        self.analysis_thread = threading.Thread(target=api_integration._analyze_image_thread, args=(self, selected_paths[0]))
         # Gör tråden till en daemon-tråd (valfritt men ofta bra för bakgrundsuppgifter)
         # En daemon-tråd avslutas automatiskt när huvudprogrammet avslutas,
         # vilket KAN hjälpa med detta fel, men det är bättre att hantera det explicit.
         self.analysis_thread.daemon = True
         self.analysis_thread.start()
 
-    def _analyze_image_thread(self, selected_indices):
-        api_integration._analyze_image_thread(self, selected_indices)
+    def _analyze_image_thread(self, file_path):
+        api_integration._analyze_image_thread(self, file_path)
 
     def _update_tags(self, tags):
         api_integration._update_tags(self, tags)
@@ -144,8 +215,19 @@ class FileRenamerApp:
     def archive_file(self):
         file_operations.archive_file(self)
 
-    def undo_archive(self):
-        file_operations.undo_archive(self)
+    def undo(self, event=None):
+        if event is not None and self._focus_in_entry():
+            return  # Låt textfälten sköta sina egna kortkommandon
+        operation_journal.undo(self)
+
+    def redo(self, event=None):
+        if event is not None and self._focus_in_entry():
+            return
+        operation_journal.redo(self)
+
+    def _focus_in_entry(self):
+        widget = self.root.focus_get()
+        return widget is not None and widget.winfo_class() in ("Entry", "TEntry")
 
     def open_in_external_viewer(self, event):
         file_operations.open_in_external_viewer(self, event)
@@ -154,11 +236,10 @@ class FileRenamerApp:
         toolbar = ttk.Frame(self.main_frame, bootstyle="dark")
         toolbar.pack(fill=tk.X, pady=(0, 10))
 
-        folder_image = self.load_icon("folder", size=(24, 24))
         self.select_folder_btn = AnimatedImageButton(
             toolbar,
             text="Välj mapp",
-            base_pil_image=folder_image,
+            icon_name="folder",
             command=self.select_folder
         )
         self.select_folder_btn.pack(side=tk.LEFT, padx=5)
@@ -166,17 +247,17 @@ class FileRenamerApp:
         self.path_label = ttk.Label(toolbar, text="Sökväg: Ingen katalog vald", bootstyle="light")
         self.path_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
 
-        analyze_image = self.load_icon("analyze", size=(24, 24))
         self.analyze_btn = AnimatedImageButton(
             toolbar,
             text="Analysera",
-            base_pil_image=analyze_image,
+            icon_name="analyze",
             command=self.analyze_image_with_google_lens
         )
         self.analyze_btn.pack(side=tk.LEFT, padx=5)
 
         self.progressbar = ttk.Progressbar(toolbar, mode="indeterminate", bootstyle="info")
         self.progress_label = ttk.Label(toolbar, text="Analyserar bild...", bootstyle="info")
+        self.progress_cancel_btn = ttk.Button(toolbar, text="Avbryt", bootstyle="danger-outline")
         self.progressbar.pack_forget()
         self.progress_label.pack_forget()
 
@@ -193,11 +274,10 @@ class FileRenamerApp:
         self.extension_entry.pack(side=tk.LEFT, padx=5, pady=5)
         self.extension_entry.bind("<Return>", lambda event: self.update_extensions())
 
-        refresh_image = self.load_icon("refresh", size=(24, 24))
         self.extension_update_btn = AnimatedImageButton(
             extension_frame,
             text="Uppdatera",
-            base_pil_image=refresh_image,
+            icon_name="refresh",
             command=self.update_extensions
         )
         self.extension_update_btn.pack(side=tk.LEFT, padx=5, pady=5)
@@ -208,31 +288,21 @@ class FileRenamerApp:
         self.single_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5, pady=5)
         self.single_entry.bind("<Return>", lambda event: self.rename_single_file())
 
-        rename_image = self.load_icon("rename", size=(24, 24))
         self.rename_single_btn = AnimatedImageButton(
             name_change_frame,
             text="Byt namn",
-            base_pil_image=rename_image,
+            icon_name="rename",
             command=self.rename_single_file
         )
         self.rename_single_btn.pack(side=tk.LEFT, padx=5, pady=5)
 
-    def load_icon(self, base_name, size=(24, 24)):
-        """Laddar en basbild och returnerar den som en PIL Image."""
-        try:
-            # Använd resource_path för att hitta bilderna
-            img_path = config.resource_path(f"{base_name}.png")
-            img = Image.open(img_path)
-            img = img.resize(size, Image.Resampling.LANCZOS)
-            return img
-        except FileNotFoundError as e:
-            print(f"Varning: Bildfil för {base_name} hittades inte: {e}. Använder platshållare.")
-            placeholder = Image.new("RGBA", size, (255, 255, 255, 0))
-            return placeholder
-        except Exception as e:
-            print(f"Fel vid laddning av bild för {base_name}: {e}")
-            placeholder = Image.new("RGBA", size, (255, 255, 255, 0))
-            return placeholder
+        self.rename_template_btn = AnimatedImageButton(
+            name_change_frame,
+            text="Mall...",
+            icon_name="rename",
+            command=self.open_rename_template_dialog
+        )
+        self.rename_template_btn.pack(side=tk.LEFT, padx=5, pady=5)
 
     def set_sash_positions_once(self, event):
         if not self.sash_positions_set:
@@ -284,15 +354,19 @@ class FileRenamerApp:
 
         list_frame = ttk.LabelFrame(left_frame, text="Filer", bootstyle="info")
         list_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=(0, 5))
-        self.file_listbox = tk.Listbox(
+        list_scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL)
+        list_scrollbar.pack(side=tk.RIGHT, fill=tk.Y, pady=5)
+        self.file_listbox = VirtualListbox(
             list_frame,
-            selectmode=tk.EXTENDED,
+            self.file_model,
             bg="#2c2c2c",
             fg="white",
             selectbackground="#4a4a4a",
             highlightthickness=0,
-            borderwidth=0
+            borderwidth=0,
+            yscrollcommand=list_scrollbar.set
         )
+        list_scrollbar.config(command=self.file_listbox.yview)
         self.file_listbox.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         self.file_listbox.bind("<<ListboxSelect>>", self.update_preview)
         self.file_listbox.bind("<Double-Button-1>", self.open_in_external_viewer)
@@ -306,9 +380,31 @@ class FileRenamerApp:
         self.paned_window.add(self.right_paned_window)
 
         preview_container = ttk.LabelFrame(self.right_paned_window, text="Förhandsgranskning", bootstyle="info")
-        self.preview_canvas = tk.Canvas(preview_container, bg="#2c2c2c", highlightthickness=0)
-        self.preview_canvas.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
-        self.preview_canvas.bind("<Configure>", self.update_preview)
+        self.preview_notebook = ttk.Notebook(preview_container, bootstyle="info")
+        self.preview_notebook.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+
+        single_tab = ttk.Frame(self.preview_notebook)
+        self.preview_notebook.add(single_tab, text="Bild")
+        self.preview_canvas = tk.Canvas(single_tab, bg="#2c2c2c", highlightthickness=0)
+        self.preview_canvas.pack(fill=tk.BOTH, expand=True)
+        self.preview_renderer = PreviewRenderer(self.preview_canvas, self.thumbnail_cache)
+
+        grid_tab = ttk.Frame(self.preview_notebook)
+        self.preview_notebook.add(grid_tab, text="Rutnät")
+        grid_scrollbar = ttk.Scrollbar(grid_tab, orient=tk.VERTICAL)
+        grid_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.thumbnail_grid = ThumbnailGrid(
+            grid_tab,
+            self.file_model,
+            self.file_listbox,
+            bg="#2c2c2c",
+            highlightthickness=0,
+            borderwidth=0,
+            yscrollcommand=grid_scrollbar.set
+        )
+        grid_scrollbar.config(command=self.thumbnail_grid.yview)
+        self.thumbnail_grid.pack(fill=tk.BOTH, expand=True)
+        self.thumbnail_grid.bind("<Double-Button-1>", self.open_in_external_viewer)
         self.right_paned_window.add(preview_container)
 
         self.bottom_paned_window = ttk.PanedWindow(self.right_paned_window, orient=tk.HORIZONTAL)
@@ -338,11 +434,10 @@ class FileRenamerApp:
                 if field in ["GPS Latitud", "GPS Longitud"]:
                     value_label.bind("<Double-Button-1>", lambda event, f=field: image_processing.open_google_maps(self, f))
 
-        save_metadata_image = self.load_icon("save_metadata", size=(24, 24))
         save_metadata_btn = AnimatedImageButton(
             metadata_frame,
             text="Spara metadata",
-            base_pil_image=save_metadata_image,
+            icon_name="save_metadata",
             command=self.save_metadata
         )
         save_metadata_btn.pack(pady=2)
@@ -353,20 +448,26 @@ class FileRenamerApp:
         self.gps_location_entry = ttk.Entry(gps_frame)
         self.gps_location_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
 
-        fetch_gps_image = self.load_icon("fetch_gps", size=(24, 24))
         fetch_gps_btn = AnimatedImageButton(
             gps_frame,
             text="Hämta GPS",
-            base_pil_image=fetch_gps_image,
+            icon_name="fetch_gps",
             command=self.fetch_and_save_gps
         )
         fetch_gps_btn.pack(side=tk.LEFT, padx=2)
 
-        fetch_place_image = self.load_icon("fetch_place", size=(24, 24))
+        gpx_btn = AnimatedImageButton(
+            gps_frame,
+            text="GPX-spår",
+            icon_name="fetch_gps",
+            command=self.geotag_from_gpx
+        )
+        gpx_btn.pack(side=tk.LEFT, padx=2)
+
         fetch_place_btn = AnimatedImageButton(
             gps_frame,
             text="Hämta plats",
-            base_pil_image=fetch_place_image,
+            icon_name="fetch_place",
             command=self.fetch_place_from_gps
         )
         fetch_place_btn.pack(side=tk.LEFT, padx=2)
@@ -380,11 +481,10 @@ class FileRenamerApp:
             row_frame = ttk.Frame(text_buttons_frame)
             row_frame.pack(fill=tk.X, pady=2, padx=5)
 
-            shortcut_image = self.load_icon("shortcut", size=(24, 24))
             shortcut_btn = AnimatedImageButton(
                 row_frame,
                 text="N/A",
-                base_pil_image=shortcut_image,
+                icon_name="shortcut",
                 command=lambda index=i: self.start_shortcut_assignment(index)
             )
             shortcut_btn.pack(side=tk.LEFT, padx=5)
@@ -396,11 +496,10 @@ class FileRenamerApp:
             entry.bind("<KeyRelease>", lambda event, index=i: self.update_tag(index))
             self.text_entries.append(entry)
 
-            tag_image = self.load_icon("tag", size=(24, 24))
             btn = AnimatedImageButton(
                 row_frame,
                 text=f"Tagg {i+1}",
-                base_pil_image=tag_image,
+                icon_name="tag",
                 command=lambda i=i: self.handle_shortcut(i, None)
             )
             btn.pack(side=tk.LEFT, padx=5)
@@ -410,11 +509,10 @@ class FileRenamerApp:
             row_frame = ttk.Frame(text_buttons_frame)
             row_frame.pack(fill=tk.X, pady=2, padx=5)
 
-            shortcut_image = self.load_icon("shortcut", size=(24, 24))
             shortcut_btn = AnimatedImageButton(
                 row_frame,
                 text="N/A",
-                base_pil_image=shortcut_image,
+                icon_name="shortcut",
                 command=lambda index=i: self.start_shortcut_assignment(index)
             )
             shortcut_btn.pack(side=tk.LEFT, padx=5)
@@ -422,12 +520,11 @@ class FileRenamerApp:
 
             button_name = "archive" if i == 10 else "undo"
             button_text = "Arkivera" if i == 10 else "Ångra"
-            button_image = self.load_icon(button_name, size=(24, 24))
             btn = AnimatedImageButton(
                 row_frame,
                 text=button_text,
-                base_pil_image=button_image,
-                command=self.archive_file if i == 10 else self.undo_archive
+                icon_name=button_name,
+                command=self.archive_file if i == 10 else self.undo
             )
             btn.pack(side=tk.LEFT, padx=5)
             self.rename_buttons.append(btn)
@@ -448,6 +545,9 @@ class FileRenamerApp:
     def fetch_and_save_gps(self):
         image_processing.fetch_and_save_gps(self)
 
+    def geotag_from_gpx(self):
+        image_processing.geotag_from_gpx(self)
+
     def fetch_place_from_gps(self):
         image_processing.fetch_place_from_gps(self)
 
@@ -460,7 +560,8 @@ class FileRenamerApp:
     def update_tag(self, index):
         if index < len(self.text_entries):
             self.tags[index] = self.text_entries[index].get()
-            self.save_settings()
+            # Bara taggarna ändras; skrivningen väntar tills det blivit tyst
+            self.settings_store.update({"tags": self.tags})
 
     def handle_shortcut_and_save_tag(self, index, event):
         self.handle_shortcut(index, event)
@@ -481,6 +582,18 @@ class FileRenamerApp:
     def rename_single_file(self):
         file_operations.rename_single_file(self)
 
+    def open_rename_template_dialog(self):
+        """Döper om de markerade filerna med en namnmall, eller alla listade om högst en är markerad."""
+        selected_ids = file_operations.selected_file_ids(self)
+        if len(selected_ids) > 1:
+            file_ids = self.file_model.in_order(selected_ids)
+        else:
+            file_ids = list(self.file_model.all_ids())
+        if not file_ids:
+            messagebox.showwarning("Varning", "Det finns inga filer att döpa om.")
+            return
+        RenameTemplateDialog(self, [(file_id, self.file_model.full_path(file_id)) for file_id in file_ids])
+
     def start_shortcut_assignment(self, index):
         if self.is_assigning_shortcut:
             return
@@ -523,11 +636,11 @@ class FileRenamerApp:
                 elif i == 10:
                     self.root.bind(f"<{key}>", lambda event: self.archive_file())
                 elif i == 11:
-                    self.root.bind(f"<{key}>", lambda event: self.undo_archive())
+                    self.root.bind(f"<{key}>", lambda event: self.undo())
 
     def handle_shortcut(self, index, event):
-        selected_indices = self.file_listbox.curselection()
-        if not selected_indices:
+        selected_ids = file_operations.selected_file_ids(self)
+        if not selected_ids:
             messagebox.showwarning("Varning", "Ingen fil är vald.")
             return
         if index >= len(self.text_entries):
@@ -537,23 +650,16 @@ class FileRenamerApp:
             messagebox.showwarning("Varning", f"Text {index+1} är tom. Ange en tagg först.")
             return
 
-        for idx in selected_indices:
-            old_rel_path = self.file_listbox.get(idx)
-            old_full_path = os.path.join(self.folder, old_rel_path)
-            dir_name = os.path.dirname(old_full_path)
-            filename, ext = os.path.splitext(os.path.basename(old_rel_path))
-            new_filename = f"{filename}{tag}{ext}"
-            new_full_path = os.path.join(dir_name, new_filename)
-            try:
-                if old_full_path != new_full_path:
-                    os.rename(old_full_path, new_full_path)
-                    new_rel_path = os.path.relpath(new_full_path, self.folder)
-                    self.file_listbox.delete(idx)
-                    self.file_listbox.insert(idx, new_rel_path)
-                    self.file_listbox.selection_set(idx)
-            except Exception as e:
-                messagebox.showerror("Fel vid namnbyte", f"Kunde inte byta namn:\n{str(e)}")
-        self.update_preview(None)
+        def targets():
+            # Räknas fram när namnbytet startar, så att en tagg som köats efter
+            # ett pågående namnbyte läggs till det nya namnet
+            result = []
+            for file_id in selected_ids:
+                if file_id in self.file_model:
+                    filename, ext = os.path.splitext(self.file_model.name(file_id))
+                    result.append((file_id, f"{filename}{tag}{ext}"))
+            return result
+        rename_engine.rename_files(self, targets, f"taggen {tag}")
 
     def on_close(self):
         # Kolla om analystråden fortfarande lever
@@ -563,7 +669,14 @@ class FileRenamerApp:
             # Vi gör INGET join här nu, förlitar oss på daemon=True
             # Men vi noterar att den levde.
 
+        file_operations.cancel_scan(self)
+        self.preview_prefetcher.shutdown()
+        self.thumbnail_grid.shutdown()
+        self.operation_journal.close()
+        http_client.close()
+        geocode_cache.close()
         self.save_settings()
+        self.settings_store.close()
         self.root.destroy()
         if thread_was_alive:
              print("Root window destroyed while analysis thread was potentially still running (as daemon).")
@@ -604,5 +717,7 @@ class FileRenamerApp:
         self.imgbb_api_key = settings.get("imgbb_api_key", "")
         self.serpapi_api_key = settings.get("serpapi_api_key", "")
         self.google_maps_api_key = settings.get("google_maps_api_key", "")
-        self.archived_files = settings.get("archived_files", [])
+        self.operation_journal.import_archived_files(settings.get("archived_files", []))
         self.external_viewer_path = settings.get("external_viewer_path", "")
+        self.gpx_clock_offset = settings.get("gpx_clock_offset", "+00:00")
+        self.rename_template = settings.get("rename_template", rename_templates.DEFAULT_TEMPLATE)
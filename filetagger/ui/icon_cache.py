@@ -0,0 +1,94 @@
+# ui/icon_cache.py
+import os
+from PIL import Image, ImageDraw, ImageFilter, ImageOps, ImageTk
+
+from filetagger.core.config import ICON_CACHE_DIR, resource_path
+
+ICON_BASE_SIZE = (24, 24)  # Ikonerna skalas först till denna storlek och sedan till knappens
+USE_DISK_CACHE = True      # Spara färdigskalade bilder i ICON_CACHE_DIR mellan körningar
+
+# Delas av alla knappar i processen: (namn, storlek, variant) -> bild
+_images = {}
+_photos = {}
+
+def _load_base(name):
+    key = (name, ICON_BASE_SIZE, "base")
+    image = _images.get(key)
+    if image is None:
+        try:
+            with Image.open(resource_path(f"{name}.png")) as img:
+                image = img.resize(ICON_BASE_SIZE, Image.Resampling.LANCZOS)
+        except FileNotFoundError as e:
+            print(f"Varning: Bildfil för {name} hittades inte: {e}. Använder platshållare.")
+            image = Image.new("RGBA", ICON_BASE_SIZE, (255, 255, 255, 0))
+        except Exception as e:
+            print(f"Fel vid laddning av bild för {name}: {e}")
+            image = Image.new("RGBA", ICON_BASE_SIZE, (255, 255, 255, 0))
+        _images[key] = image
+    return image
+
+def _render(name, size, variant):
+    if variant == "passive":
+        return _load_base(name).resize(size, Image.Resampling.LANCZOS)
+    passive = icon_image(name, size)
+    if variant == "hover":
+        # Emboss-effekt och en gul ram
+        image = passive.filter(ImageFilter.EMBOSS)
+        draw = ImageDraw.Draw(image)
+        draw.rectangle([0, 0, size[0] - 1, size[1] - 1], outline="yellow", width=2)
+        return image
+    if variant == "active":
+        # Negativ (inverterade färger); invert klarar inte alfakanal
+        return ImageOps.invert(passive.convert("RGB") if passive.mode == "RGBA" else passive)
+    raise ValueError(f"Okänd variant: {variant}")
+
+def _sprite_path(name, size, variant):
+    return os.path.join(ICON_CACHE_DIR, f"{name}-{size[0]}x{size[1]}-{variant}.png")
+
+def _load_sprite(name, size, variant):
+    """Läser en tidigare sparad bild om den är nyare än ikonfilen."""
+    sprite_path = _sprite_path(name, size, variant)
+    try:
+        if os.path.getmtime(sprite_path) < os.path.getmtime(resource_path(f"{name}.png")):
+            return None
+        with Image.open(sprite_path) as img:
+            img.load()
+            return img
+    except (OSError, ValueError):
+        return None
+
+def _save_sprite(name, size, variant, image):
+    if not os.path.exists(resource_path(f"{name}.png")):
+        return  # Platshållare sparas inte
+    sprite_path = _sprite_path(name, size, variant)
+    temp_path = f"{sprite_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(ICON_CACHE_DIR, exist_ok=True)
+        image.save(temp_path, "PNG")
+        os.replace(temp_path, sprite_path)
+    except OSError as e:
+        print(f"Varning: Ikonen {name} kunde inte sparas i cachen: {e}")
+
+def icon_image(name, size, variant="passive"):
+    """Returnerar ikonen name skalad till size som PIL-bild. Får inte ändras av anroparen."""
+    size = tuple(size)
+    key = (name, size, variant)
+    image = _images.get(key)
+    if image is None:
+        image = _load_sprite(name, size, variant) if USE_DISK_CACHE else None
+        if image is None:
+            image = _render(name, size, variant)
+            if USE_DISK_CACHE:
+                _save_sprite(name, size, variant, image)
+        _images[key] = image
+    return image
+
+def icon_photo(name, size, variant="passive"):
+    """Returnerar ikonen som PhotoImage. Knappar med samma ikon och storlek delar samma objekt."""
+    size = tuple(size)
+    key = (name, size, variant)
+    photo = _photos.get(key)
+    if photo is None:
+        photo = ImageTk.PhotoImage(icon_image(name, size, variant))
+        _photos[key] = photo
+    return photo
@@ -0,0 +1,141 @@
+# ui/preview_renderer.py
+import threading
+import tkinter as tk
+from PIL import Image, ImageTk
+
+from filetagger.core.thumbnail_cache import read_embedded_thumbnail
+
+RESIZE_DEBOUNCE_MS = 80  # Väntetid efter sista <Configure> innan bilden ritas om
+CANVAS_MARGIN = 10
+
+class PreviewRenderer:
+    """Ritar förhandsbilden på en canvas.
+
+    Den avkodade källbilden (från miniatyrcachen) sparas, så när canvasen ändrar
+    storlek skalas bara den om. En serie <Configure>-händelser, t.ex. när ett
+    fönster eller en avdelare dras, slås ihop till en enda omritning.
+
+    Finns bilden inte redan i minnescachen ritas först den inbäddade
+    EXIF-miniatyren, uppskalad till slutlig storlek, medan den riktiga
+    förhandsbilden avkodas i en bakgrundstråd. Bara den senast valda filen
+    avkodas; väljer användaren en annan fil under tiden hoppas den gamla över.
+    """
+    def __init__(self, canvas, cache):
+        self.canvas = canvas
+        self.cache = cache
+        self.path = None
+        self.key = None
+        self.source = None
+        self.target_size = None  # Förhandsbildens storlek, känd från filhuvudet innan avkodning
+        self.message = ""        # Text som visas när det inte finns någon bild att rita
+        self.photo = None
+        self._rendered_size = None
+        self._resize_job = None
+        self._request = None     # (nyckel, sökväg) som väntar på bakgrundstråden
+        self._condition = threading.Condition()
+        canvas.bind("<Configure>", self._on_configure)
+        threading.Thread(target=self._worker, daemon=True).start()
+
+    def show(self, path):
+        """Visar filen på path, eller tömmer canvasen om path är None."""
+        key = self.cache.make_key(path) if path else None
+        if key is None:
+            self.clear()
+            return
+        if key == self.key:
+            self.render(force=True)
+            return
+
+        self.path = path
+        self.key = key
+        self.target_size = None
+        self.message = "Laddar förhandsbild..."
+        self.source = self.cache.get(key) if self.cache.in_memory(key) else None
+        if self.source is None:
+            image_size, thumbnail = read_embedded_thumbnail(path)
+            if image_size is not None:
+                self.target_size = self.cache.preview_size(image_size)
+            self.source = thumbnail
+            with self._condition:
+                self._request = (key, path)
+                self._condition.notify()
+        self.render(force=True)
+
+    def clear(self):
+        self.path = None
+        self.key = None
+        self.source = None
+        self.target_size = None
+        self.photo = None
+        self._rendered_size = None
+        with self._condition:
+            self._request = None
+        self.canvas.delete("all")
+
+    def render(self, force=False):
+        """Skalar källbilden till canvasens aktuella storlek och ritar den."""
+        width = self.canvas.winfo_width()
+        height = self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return
+        if not force and self._rendered_size == (width, height):
+            return
+        self.canvas.delete("all")
+        self._rendered_size = (width, height)
+        if self.source is None:
+            if self.key is not None and self.message:
+                self.canvas.create_text(width // 2, height // 2, text=self.message, fill="#888888")
+            return
+
+        # En inbäddad miniatyr skalas upp till den storlek som den riktiga bilden får
+        base_width, base_height = self.target_size or self.source.size
+        box = (width - CANVAS_MARGIN, height - CANVAS_MARGIN)
+        scale = min(box[0] / base_width, box[1] / base_height, 1.0)
+        size = (max(1, int(base_width * scale)), max(1, int(base_height * scale)))
+        image = self.source if size == self.source.size else self.source.resize(size, Image.Resampling.LANCZOS)
+
+        self.photo = ImageTk.PhotoImage(image)
+        x = (width - self.photo.width()) // 2
+        y = (height - self.photo.height()) // 2
+        self.canvas.create_image(x, y, anchor=tk.NW, image=self.photo)
+
+    def _on_configure(self, event):
+        if self._resize_job is not None:
+            self.canvas.after_cancel(self._resize_job)
+        self._resize_job = self.canvas.after(RESIZE_DEBOUNCE_MS, self._render_after_resize)
+
+    def _render_after_resize(self):
+        self._resize_job = None
+        self.render()
+
+    # ----- Avkodning i bakgrunden -----
+
+    def _worker(self):
+        while True:
+            with self._condition:
+                while self._request is None:
+                    self._condition.wait()
+                key, path = self._request
+                self._request = None
+            try:
+                image = self.cache.get_preview(path)
+            except Exception as e:
+                print(f"Error loading preview: {e}")
+                image = None
+            try:
+                self.canvas.after(0, self._finish_decode, key, image)
+            except (RuntimeError, tk.TclError):
+                return  # Fönstret har stängts
+
+    def _finish_decode(self, key, image):
+        if key != self.key:
+            return  # Användaren har hunnit välja en annan fil
+        if image is None:
+            # Avkodningen misslyckades; behåll den inbäddade miniatyren om det finns en
+            self.message = "Förhandsvisning saknas"
+            if self.source is None:
+                self.render(force=True)
+            return
+        self.source = image
+        self.target_size = None
+        self.render(force=True)
@@ -0,0 +1,161 @@
+# ui/rename_template_dialog.py
+import os
+import queue
+import threading
+import tkinter as tk
+import ttkbootstrap as ttk
+
+from filetagger.core import rename_engine
+from filetagger.core.api_integration import get_place_name_from_gps_coordinates
+from filetagger.core.rename_templates import TEMPLATE_FIELDS, PlaceCache, RenameTemplate, evaluate_template
+
+PREVIEW_POLL_MS = 100
+TREE_CHUNK = 500  # Rader som läggs in i förhandsvisningen per varv i händelseloopen
+
+class RenameTemplateDialog(tk.Toplevel):
+    """Dialog där en namnmall förhandsgranskas för alla filer innan de döps om.
+
+    Namnen räknas fram i en bakgrundstråd och visas sida vid sida med de
+    nuvarande. Namnbytet görs sedan av rename_engine som en enda omgång.
+    """
+    def __init__(self, app, entries):
+        super().__init__(app.root)
+        self.app = app
+        self.entries = entries  # (file_id, sökväg) i listans ordning
+        self.results = None
+        self.cancel_event = None
+        self.place_cache = None
+        if app.google_maps_api_key:
+            api_key = app.google_maps_api_key
+            self.place_cache = PlaceCache(lambda lat, lon: get_place_name_from_gps_coordinates(lat, lon, api_key))
+
+        self.title(f"Byt namn med mall ({len(entries)} filer)")
+        self.geometry("760x520")
+        self.transient(app.root)
+
+        template_frame = ttk.Frame(self)
+        template_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        ttk.Label(template_frame, text="Mall:").pack(side=tk.LEFT)
+        self.template_var = tk.StringVar(value=app.rename_template)
+        template_entry = ttk.Entry(template_frame, textvariable=self.template_var)
+        template_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        template_entry.bind("<Return>", lambda event: self.preview())
+        ttk.Button(template_frame, text="Förhandsgranska", command=self.preview).pack(side=tk.LEFT)
+
+        help_text = "\n".join(f"{{{name}}}  {description}" for name, description in TEMPLATE_FIELDS.items())
+        ttk.Label(self, text=help_text, bootstyle="secondary", justify=tk.LEFT).pack(fill=tk.X, padx=10, pady=5)
+
+        tree_frame = ttk.Frame(self)
+        tree_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+        self.tree = ttk.Treeview(tree_frame, columns=("old", "new"), show="headings")
+        self.tree.heading("old", text="Nuvarande namn")
+        self.tree.heading("new", text="Nytt namn")
+        self.tree.tag_configure("error", foreground="#e74c3c")
+        scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        bottom_frame = ttk.Frame(self)
+        bottom_frame.pack(fill=tk.X, padx=10, pady=10)
+        self.status_label = ttk.Label(bottom_frame, text="")
+        self.status_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Button(bottom_frame, text="Stäng", bootstyle="secondary", command=self.close).pack(side=tk.RIGHT)
+        self.commit_btn = ttk.Button(bottom_frame, text="Byt namn", command=self.commit, state=tk.DISABLED)
+        self.commit_btn.pack(side=tk.RIGHT, padx=5)
+
+        self.template_var.trace_add("write", lambda *args: self._invalidate())
+        self.protocol("WM_DELETE_WINDOW", self.close)
+        template_entry.focus_set()
+        self.preview()
+
+    def _invalidate(self):
+        self.results = None
+        self.commit_btn.config(state=tk.DISABLED)
+
+    def preview(self):
+        self._cancel()
+        self._invalidate()
+        self.tree.delete(*self.tree.get_children())
+        try:
+            template = RenameTemplate(self.template_var.get())
+        except ValueError as e:
+            self.status_label.config(text=str(e), bootstyle="danger")
+            return
+        self.status_label.config(text="Räknar fram nya namn...", bootstyle="default")
+        cancel_event = threading.Event()
+        result_queue = queue.Queue()
+        self.cancel_event = cancel_event
+        threading.Thread(
+            target=self._evaluate_thread,
+            args=(template, result_queue, cancel_event),
+            daemon=True
+        ).start()
+        self.after(PREVIEW_POLL_MS, lambda: self._poll(template, result_queue, cancel_event))
+
+    def _evaluate_thread(self, template, result_queue, cancel_event):
+        try:
+            results = evaluate_template(template, self.app.folder, self.entries, self.app.exif_reader,
+                                        self.place_cache, cancel_event)
+            result_queue.put(("done", results))
+        except Exception as e:
+            print(f"Error in _evaluate_thread: {type(e).__name__}: {e}")
+            result_queue.put(("error", str(e)))
+
+    def _poll(self, template, result_queue, cancel_event):
+        if cancel_event.is_set():
+            return
+        try:
+            kind, payload = result_queue.get_nowait()
+        except queue.Empty:
+            self.after(PREVIEW_POLL_MS, lambda: self._poll(template, result_queue, cancel_event))
+            return
+        self.cancel_event = None
+        if kind == "error":
+            self.status_label.config(text=f"Namnen kunde inte räknas fram: {payload}", bootstyle="danger")
+            return
+        if payload is None:
+            return
+        self._fill_tree(template, payload, 0, cancel_event)
+
+    def _fill_tree(self, template, results, start, cancel_event):
+        """Lägger in raderna i omgångar så att dialogen svarar även för tusentals filer."""
+        if cancel_event.is_set() or template.text != self.template_var.get():
+            return
+        for _, path, new_name, error in results[start:start + TREE_CHUNK]:
+            old_name = os.path.basename(path)
+            if error:
+                self.tree.insert("", tk.END, values=(old_name, error), tags=("error",))
+            else:
+                self.tree.insert("", tk.END, values=(old_name, new_name))
+        if start + TREE_CHUNK < len(results):
+            self.after(1, lambda: self._fill_tree(template, results, start + TREE_CHUNK, cancel_event))
+            return
+
+        self.results = results
+        renamable = sum(1 for _, path, new_name, _ in results if new_name and new_name != os.path.basename(path))
+        skipped = sum(1 for result in results if result[3])
+        status = f"{renamable} filer får nya namn."
+        if skipped:
+            status += f" {skipped} hoppas över."
+        self.status_label.config(text=status, bootstyle="default")
+        self.commit_btn.config(state=tk.NORMAL if renamable else tk.DISABLED)
+
+    def commit(self):
+        if self.results is None:
+            return
+        template_text = self.template_var.get()
+        targets = [(file_id, new_name) for file_id, _, new_name, _ in self.results if new_name]
+        self.app.rename_template = template_text
+        self.app.save_settings()
+        self.close()
+        rename_engine.rename_files(self.app, targets, f"mallen {template_text}")
+
+    def _cancel(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_event = None
+
+    def close(self):
+        self._cancel()
+        self.destroy()
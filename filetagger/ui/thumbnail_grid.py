@@ -0,0 +1,254 @@
+# ui/thumbnail_grid.py
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import font as tkFont
+from PIL import ImageTk
+
+from filetagger.core.grid_thumbnails import GridThumbnailLoader
+
+CELL_PADDING = 8
+LABEL_HEIGHT = 18
+PHOTO_CACHE_SIZE = 400  # Antal PhotoImage-objekt som sparas mellan omritningar
+
+class ThumbnailGrid(tk.Canvas):
+    """Rutnät med miniatyrer för filerna i en FileModel.
+
+    Rutnätet har ingen egen markering utan läser och ändrar fillistans, så
+    kortkommandon, arkivering och förhandsvisning fungerar likadant oavsett
+    vilken vy användaren markerade i. Bara de rutor som syns ritas, och
+    miniatyrer skapas bara för dem, och bara medan rutnätet visas.
+    """
+    def __init__(self, master, model, listbox, fg="white", cellbackground="#333333",
+                 selectbackground="#4a4a4a", font=None, yscrollcommand=None, **kwargs):
+        kwargs.setdefault("takefocus", True)
+        super().__init__(master, **kwargs)
+        self.model = model
+        self.listbox = listbox
+        self.fg = fg
+        self.cellbackground = cellbackground
+        self.selectbackground = selectbackground
+        self.font = font or tkFont.nametofont("TkDefaultFont")
+        self.yscrollcommand = yscrollcommand
+        self.loader = GridThumbnailLoader(self, self._on_thumbnails_loaded)
+
+        thumb_width, thumb_height = self.loader.cache.max_size
+        self.cell_width = thumb_width + 2 * CELL_PADDING
+        self.cell_height = thumb_height + LABEL_HEIGHT + 2 * CELL_PADDING
+        self._label_chars = max(4, (self.cell_width - 4) // max(1, self.font.measure("n")))
+        self._photos = OrderedDict()  # cachenyckel -> PhotoImage
+        self._keys = {}               # file_id -> (sökväg, cachenyckel) för laddade miniatyrer
+        self._anchor = 0
+        self._active = 0
+        self._top_y = 0
+        self._redraw_pending = False
+
+        self.bind("<Configure>", lambda event: self._schedule_redraw())
+        self.bind("<Map>", lambda event: self._schedule_redraw())
+        self.bind("<Button-1>", self._on_click)
+        self.bind("<Control-Button-1>", self._on_control_click)
+        self.bind("<Shift-Button-1>", self._on_shift_click)
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", lambda event: self._scroll_pixels(-self.cell_height // 2))
+        self.bind("<Button-5>", lambda event: self._scroll_pixels(self.cell_height // 2))
+        self.bind("<Left>", lambda event: self._move_active(-1, extend=False))
+        self.bind("<Right>", lambda event: self._move_active(1, extend=False))
+        self.bind("<Up>", lambda event: self._move_active(-self._columns(), extend=False))
+        self.bind("<Down>", lambda event: self._move_active(self._columns(), extend=False))
+        self.bind("<Shift-Left>", lambda event: self._move_active(-1, extend=True))
+        self.bind("<Shift-Right>", lambda event: self._move_active(1, extend=True))
+        self.bind("<Shift-Up>", lambda event: self._move_active(-self._columns(), extend=True))
+        self.bind("<Shift-Down>", lambda event: self._move_active(self._columns(), extend=True))
+        self.bind("<Control-a>", self._on_select_all)
+        listbox.bind("<<ListboxSelect>>", self._on_selection_changed, add="+")
+        listbox.bind("<<ModelChanged>>", self._on_model_changed, add="+")
+
+    def shutdown(self):
+        self.loader.shutdown()
+
+    def yview(self, *args):
+        total = self._content_height()
+        if not args:
+            if not total:
+                return (0.0, 1.0)
+            return (self._top_y / total, min(1.0, (self._top_y + self.winfo_height()) / total))
+        if args[0] == "moveto":
+            self._set_top(int(float(args[1]) * total))
+        elif args[0] == "scroll":
+            step = self.winfo_height() if args[2] == "pages" else self.cell_height
+            self._scroll_pixels(int(args[1]) * step)
+
+    # ----- Geometri -----
+
+    def _columns(self):
+        return max(1, self.winfo_width() // self.cell_width)
+
+    def _content_height(self):
+        rows = -(-len(self.model) // self._columns())
+        return rows * self.cell_height
+
+    def _position_at(self, x, y):
+        """Listposition för rutan under (x, y), eller None om det inte finns någon där."""
+        column = int(x) // self.cell_width
+        if column >= self._columns():
+            return None
+        position = (self._top_y + int(y)) // self.cell_height * self._columns() + column
+        return position if 0 <= position < len(self.model) else None
+
+    def _set_top(self, top_y):
+        top_y = max(0, min(top_y, self._content_height() - self.winfo_height()))
+        if top_y != self._top_y:
+            self._top_y = top_y
+            self._schedule_redraw()
+
+    def _scroll_pixels(self, amount):
+        self._set_top(self._top_y + amount)
+
+    def see(self, position):
+        row_top = position // self._columns() * self.cell_height
+        if row_top < self._top_y:
+            self._set_top(row_top)
+        elif row_top + self.cell_height > self._top_y + self.winfo_height():
+            self._set_top(row_top + self.cell_height - self.winfo_height())
+
+    # ----- Ritning -----
+
+    def _schedule_redraw(self):
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._redraw)
+
+    def _photo(self, key):
+        photo = self._photos.get(key)
+        if photo is not None:
+            self._photos.move_to_end(key)
+            return photo
+        image = self.loader.get(key)
+        if image is None:
+            return None
+        photo = ImageTk.PhotoImage(image)
+        self._photos[key] = photo
+        if len(self._photos) > PHOTO_CACHE_SIZE:
+            self._photos.popitem(last=False)
+        return photo
+
+    def _label(self, name):
+        if len(name) <= self._label_chars:
+            return name
+        return name[:self._label_chars - 1] + "…"
+
+    def _redraw(self):
+        self._redraw_pending = False
+        self.delete("all")
+        if not self.winfo_ismapped():
+            return  # Rutnätet är dolt; inga miniatyrer behövs förrän det visas
+        count = len(self.model)
+        self._top_y = max(0, min(self._top_y, self._content_height() - self.winfo_height()))
+        if not count:
+            self.create_text(CELL_PADDING, CELL_PADDING, text="Inga filer att visa.", anchor=tk.NW,
+                             fill=self.fg, font=self.font)
+
+        columns = self._columns()
+        first_row = self._top_y // self.cell_height
+        last_row = (self._top_y + self.winfo_height()) // self.cell_height
+        visible = []
+        for position in range(first_row * columns, min(count, (last_row + 1) * columns)):
+            file_id = self.model.id_at(position)
+            x = position % columns * self.cell_width
+            y = position // columns * self.cell_height - self._top_y
+            selected = self.listbox.is_selected(file_id)
+            self.create_rectangle(x + 2, y + 2, x + self.cell_width - 2, y + self.cell_height - 2,
+                                  fill=self.selectbackground if selected else self.cellbackground, outline="")
+
+            # Nyckeln kommer från laddaren, som statar filerna i bakgrunden
+            path = self.model.full_path(file_id)
+            loaded = self._keys.get(file_id)
+            key = loaded[1] if loaded is not None and loaded[0] == path else None
+            photo = self._photo(key) if key is not None else None
+            if photo is not None:
+                self.create_image(x + self.cell_width // 2, y + CELL_PADDING + self.loader.cache.max_size[1] // 2,
+                                  image=photo)
+            visible.append((file_id, path, key if photo is not None else None))
+            self.create_text(x + self.cell_width // 2, y + self.cell_height - CELL_PADDING - LABEL_HEIGHT // 2,
+                             text=self._label(self.model.name(file_id)), fill=self.fg, font=self.font)
+        self.loader.request(visible)
+        if self.yscrollcommand:
+            self.yscrollcommand(*self.yview())
+
+    def _on_thumbnails_loaded(self, loaded):
+        for file_id, path, key in loaded:
+            self._keys[file_id] = (path, key)
+        self._schedule_redraw()
+
+    def _on_model_changed(self, event):
+        self._keys = {file_id: entry for file_id, entry in self._keys.items() if file_id in self.model}
+        self._schedule_redraw()
+
+    # ----- Markering -----
+
+    def _on_selection_changed(self, event):
+        # Följ fillistans aktiva rad, oavsett om ändringen gjordes här eller i listan
+        self._active = self._anchor = self.listbox.active_index()
+        if self.winfo_ismapped():
+            self.see(self._active)
+        self._schedule_redraw()
+
+    def _select(self, file_ids, position):
+        self.listbox.selection_clear()
+        self.listbox.select_ids(file_ids)
+        self._activate(position)
+
+    def _activate(self, position):
+        anchor = self._anchor
+        self.listbox.see_id(self.model.id_at(position))
+        self.listbox.event_generate("<<ListboxSelect>>")
+        self._anchor = anchor
+
+    def _on_click(self, event):
+        self.focus_set()
+        position = self._position_at(event.x, event.y)
+        if position is None:
+            return
+        self._anchor = position
+        self._select([self.model.id_at(position)], position)
+
+    def _on_control_click(self, event):
+        self.focus_set()
+        position = self._position_at(event.x, event.y)
+        if position is None:
+            return
+        self._anchor = position
+        file_id = self.model.id_at(position)
+        if self.listbox.is_selected(file_id):
+            self.listbox.deselect_ids([file_id])
+        else:
+            self.listbox.select_ids([file_id])
+        self._activate(position)
+
+    def _on_shift_click(self, event):
+        self.focus_set()
+        position = self._position_at(event.x, event.y)
+        if position is None:
+            return
+        first, last = sorted((self._anchor, position))
+        self._select(self.model.ids_between(first, last), position)
+
+    def _on_mousewheel(self, event):
+        self._scroll_pixels(-self.cell_height // 2 if event.delta > 0 else self.cell_height // 2)
+
+    def _move_active(self, step, extend):
+        count = len(self.model)
+        if not count:
+            return "break"
+        position = max(0, min(self._active + step, count - 1))
+        if extend:
+            first, last = sorted((self._anchor, position))
+            self._select(self.model.ids_between(first, last), position)
+        else:
+            self._anchor = position
+            self._select([self.model.id_at(position)], position)
+        return "break"
+
+    def _on_select_all(self, event):
+        if len(self.model):
+            self._select(self.model.all_ids(), self._active)
+        return "break"
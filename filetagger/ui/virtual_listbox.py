@@ -0,0 +1,245 @@
+# ui/virtual_listbox.py
+import tkinter as tk
+from tkinter import font as tkFont
+
+class VirtualListbox(tk.Canvas):
+    """En listruta som visar en FileModel och bara ritar de rader som syns.
+
+    Widgeten lagrar inga rader själv; antal rader och texterna hämtas från
+    modellen och markeringen hålls som en mängd stabila fil-id:n, så den
+    överlever namnbyten och borttagningar utan omräkning. Markeringen fungerar
+    som EXTENDED i tk.Listbox och <<ListboxSelect>> genereras när användaren
+    ändrar den. Efter ändringar i modellen anropas refresh().
+    """
+    def __init__(self, master, model, fg="white", selectbackground="#4a4a4a", selectforeground=None,
+                 font=None, yscrollcommand=None, **kwargs):
+        kwargs.setdefault("takefocus", True)
+        super().__init__(master, **kwargs)
+        self.model = model
+        self.fg = fg
+        self.selectbackground = selectbackground
+        self.selectforeground = selectforeground or fg
+        self.font = font or tkFont.nametofont("TkDefaultFont")
+        self.row_height = self.font.metrics("linespace") + 2
+        self.yscrollcommand = yscrollcommand
+
+        self.placeholder = ""
+        self._selection = set()  # Markerade fil-id:n
+        self._anchor = 0
+        self._active = 0
+        self._top = 0  # Index för första synliga rad
+        self._redraw_pending = False
+
+        self.bind("<Configure>", lambda event: self._schedule_redraw())
+        self.bind("<Button-1>", self._on_click)
+        self.bind("<Control-Button-1>", self._on_control_click)
+        self.bind("<Shift-Button-1>", self._on_shift_click)
+        self.bind("<B1-Motion>", self._on_drag)
+        self.bind("<MouseWheel>", self._on_mousewheel)
+        self.bind("<Button-4>", lambda event: self._scroll_rows(-3))
+        self.bind("<Button-5>", lambda event: self._scroll_rows(3))
+        self.bind("<Up>", lambda event: self._move_active(-1, extend=False))
+        self.bind("<Down>", lambda event: self._move_active(1, extend=False))
+        self.bind("<Shift-Up>", lambda event: self._move_active(-1, extend=True))
+        self.bind("<Shift-Down>", lambda event: self._move_active(1, extend=True))
+        self.bind("<Prior>", lambda event: self._move_active(-self._visible_rows(), extend=False))
+        self.bind("<Next>", lambda event: self._move_active(self._visible_rows(), extend=False))
+        self.bind("<Home>", lambda event: self._move_active(-len(self.model), extend=False))
+        self.bind("<End>", lambda event: self._move_active(len(self.model), extend=False))
+        self.bind("<Control-a>", self._on_select_all)
+
+    # ----- Gränssnitt mot modellen -----
+
+    def size(self):
+        return len(self.model)
+
+    def refresh(self):
+        """Ritar om efter att modellen ändrats och släpper markering av borttagna filer.
+
+        Genererar <<ModelChanged>> så att andra vyer över samma modell kan rita om.
+        """
+        if self._selection:
+            self._selection = {file_id for file_id in self._selection if file_id in self.model}
+        count = len(self.model)
+        self._top = max(0, min(self._top, count - 1))
+        self._anchor = max(0, min(self._anchor, count - 1))
+        self._active = max(0, min(self._active, count - 1))
+        self._schedule_redraw()
+        self.event_generate("<<ModelChanged>>")
+
+    def set_placeholder(self, text):
+        """Text som visas när modellen är tom."""
+        self.placeholder = text
+        self._schedule_redraw()
+
+    def selected_ids(self):
+        """Markerade fil-id:n i listans ordning."""
+        return self.model.in_order(self._selection)
+
+    def is_selected(self, file_id):
+        return file_id in self._selection
+
+    def select_ids(self, file_ids):
+        self._selection.update(file_id for file_id in file_ids if file_id in self.model)
+        self._schedule_redraw()
+
+    def deselect_ids(self, file_ids):
+        self._selection.difference_update(file_ids)
+        self._schedule_redraw()
+
+    def selection_clear(self):
+        self._selection.clear()
+        self._schedule_redraw()
+
+    def active_index(self):
+        """Raden som senast klickades på eller valdes med piltangenterna."""
+        return self._active
+
+    def nearest(self, y):
+        count = len(self.model)
+        if not count:
+            return 0
+        return max(0, min(self._top + int(y) // self.row_height, count - 1))
+
+    def see(self, index):
+        visible = self._visible_rows()
+        if index < self._top:
+            self._set_top(index)
+        elif index >= self._top + visible:
+            self._set_top(index - visible + 1)
+
+    def see_id(self, file_id):
+        positions = self.model.positions_of([file_id])
+        if positions:
+            self._active = self._anchor = positions[0]
+            self.see(positions[0])
+
+    def yview(self, *args):
+        count = len(self.model)
+        if not args:
+            if not count:
+                return (0.0, 1.0)
+            return (self._top / count, min(1.0, (self._top + self._visible_rows()) / count))
+        if args[0] == "moveto":
+            self._set_top(int(float(args[1]) * count))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= max(1, self._visible_rows() - 1)
+            self._scroll_rows(amount)
+
+    # ----- Ritning -----
+
+    def _visible_rows(self):
+        return max(1, self.winfo_height() // self.row_height)
+
+    def _set_top(self, top):
+        top = max(0, min(top, len(self.model) - self._visible_rows()))
+        if top != self._top:
+            self._top = top
+            self._schedule_redraw()
+
+    def _scroll_rows(self, amount):
+        self._set_top(self._top + amount)
+
+    def _schedule_redraw(self):
+        if not self._redraw_pending:
+            self._redraw_pending = True
+            self.after_idle(self._redraw)
+
+    def _redraw(self):
+        self._redraw_pending = False
+        self.delete("all")
+        width = self.winfo_width()
+        count = len(self.model)
+        if not count and self.placeholder:
+            self.create_text(2, 1, text=self.placeholder, anchor=tk.NW, fill=self.fg, font=self.font)
+        last = min(count, self._top + self._visible_rows() + 1)
+        for row in range(self._top, last):
+            y = (row - self._top) * self.row_height
+            if self.model.id_at(row) in self._selection:
+                self.create_rectangle(0, y, width, y + self.row_height,
+                                      fill=self.selectbackground, outline="")
+                color = self.selectforeground
+            else:
+                color = self.fg
+            self.create_text(2, y + 1, text=self.model.display_text(row), anchor=tk.NW, fill=color, font=self.font)
+        if self.yscrollcommand:
+            self.yscrollcommand(*self.yview())
+
+    # ----- Markering med mus och tangentbord -----
+
+    def _select_range(self, first, last):
+        if first > last:
+            first, last = last, first
+        self._selection = set(self.model.ids_between(first, last))
+
+    def _notify_select(self):
+        self._schedule_redraw()
+        self.event_generate("<<ListboxSelect>>")
+
+    def _on_click(self, event):
+        self.focus_set()
+        if not len(self.model):
+            return
+        index = self.nearest(event.y)
+        self._anchor = self._active = index
+        self._selection = {self.model.id_at(index)}
+        self._notify_select()
+
+    def _on_control_click(self, event):
+        self.focus_set()
+        if not len(self.model):
+            return
+        index = self.nearest(event.y)
+        self._anchor = self._active = index
+        file_id = self.model.id_at(index)
+        if file_id in self._selection:
+            self._selection.discard(file_id)
+        else:
+            self._selection.add(file_id)
+        self._notify_select()
+
+    def _on_shift_click(self, event):
+        self.focus_set()
+        if not len(self.model):
+            return
+        self._active = self.nearest(event.y)
+        self._select_range(self._anchor, self._active)
+        self._notify_select()
+
+    def _on_drag(self, event):
+        if not len(self.model):
+            return
+        # Rulla automatiskt när musen dras utanför listan
+        if event.y < 0:
+            self._scroll_rows(-1)
+        elif event.y > self.winfo_height():
+            self._scroll_rows(1)
+        index = self.nearest(max(0, min(event.y, self.winfo_height() - 1)))
+        if index != self._active:
+            self._active = index
+            self._select_range(self._anchor, index)
+            self._notify_select()
+
+    def _on_mousewheel(self, event):
+        self._scroll_rows(-3 if event.delta > 0 else 3)
+
+    def _move_active(self, step, extend):
+        if not len(self.model):
+            return "break"
+        self._active = max(0, min(self._active + step, len(self.model) - 1))
+        if extend:
+            self._select_range(self._anchor, self._active)
+        else:
+            self._anchor = self._active
+            self._selection = {self.model.id_at(self._active)}
+        self.see(self._active)
+        self._notify_select()
+        return "break"
+
+    def _on_select_all(self, event):
+        if len(self.model):
+            self._select_range(0, len(self.model) - 1)
+            self._notify_select()
+        return "break"
@@ -1,8 +1,24 @@
 # run_filetagger.py
-import ttkbootstrap as ttk
-from filetagger.main_app import FileRenamerApp
+import multiprocessing
+import sys
+from filetagger.core import startup_profile
 
-if __name__ == "__main__":
+def main():
+    # --profile-startup skriver ut hur lång tid varje del av uppstarten tar
+    if "--profile-startup" in sys.argv:
+        startup_profile.enable()
+
+    # Importeras här så att processpoolens arbetsprocesser, som också läser
+    # in den här filen, slipper ladda Tk, ttkbootstrap och hela programmet
+    import ttkbootstrap as ttk
+    from filetagger.main_app import FileRenamerApp
+
+    startup_profile.mark("importer")
     root = ttk.Window(themename="darkly")
+    startup_profile.mark("Tk-fönster")
     app = FileRenamerApp(root)
     root.mainloop()
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Krävs för processpoolen i en paketerad exe
+    main()
@@ -0,0 +1,49 @@
+# tests/test_folder_watcher.py
+import os
+
+from filetagger.core.folder_watcher import (_EVENT_HEADER, IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO,
+                                            FolderChanges, FolderWatcher)
+
+def _event(mask, name, cookie=0, wd=1):
+    encoded = os.fsencode(name) + b"\0"
+    encoded += b"\0" * (-len(encoded) % 4)
+    return _EVENT_HEADER.pack(wd, mask, cookie, len(encoded)) + encoded
+
+def _move(old, new, cookie):
+    return _event(IN_MOVED_FROM, old, cookie) + _event(IN_MOVED_TO, new, cookie)
+
+def _watcher():
+    watcher = FolderWatcher("/inte/startad", [".jpg"], lambda changes: None)
+    watcher.wd_to_dir = {1: ""}
+    watcher.dir_to_wd = {"": 1}
+    return watcher
+
+def test_swap_through_staging_names_removes_nothing():
+    watcher = _watcher()
+    staged_a = f".A.jpg.{os.getpid()}.renaming"
+    staged_b = f".B.jpg.{os.getpid()}.renaming"
+    watcher._handle_events(_move("A.jpg", staged_a, 1) + _move("B.jpg", staged_b, 2)
+                           + _move(staged_a, "B.jpg", 3) + _move(staged_b, "A.jpg", 4))
+    changes = watcher.pending
+    assert changes.removed == set()
+    assert set(changes.added) == {"A.jpg", "B.jpg"}
+    assert changes.renamed == {}
+
+def test_rename_via_temp_file_is_an_add():
+    watcher = _watcher()
+    watcher._handle_events(_event(IN_CREATE, "bild.jpg.tmp") + _move("bild.jpg.tmp", "bild.jpg", 7))
+    assert list(watcher.pending.added) == ["bild.jpg"]
+    assert watcher.pending.renamed == {}
+
+def test_plain_rename_and_delete():
+    watcher = _watcher()
+    watcher._handle_events(_move("a.jpg", "b.jpg", 1) + _event(IN_DELETE, "c.jpg"))
+    assert watcher.pending.renamed == {"a.jpg": "b.jpg"}
+    assert watcher.pending.removed == {"c.jpg"}
+
+def test_rename_onto_removed_name_keeps_it():
+    changes = FolderChanges()
+    changes.remove("A.jpg")
+    changes.rename("B.jpg", "A.jpg")
+    assert changes.removed == set()
+    assert changes.renamed == {"B.jpg": "A.jpg"}
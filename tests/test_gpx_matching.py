@@ -0,0 +1,42 @@
+# tests/test_gpx_matching.py
+import pytest
+
+from filetagger.core.gpx_matching import MAX_POINT_DISTANCE_S, MAX_TRACK_GAP_S, GpxTrack
+
+START = 1_700_000_000.0
+
+def _track(*offsets):
+    return GpxTrack([(START + offset, 57.0 + offset / 1000, 18.0 + offset / 1000) for offset in offsets])
+
+def test_exact_point():
+    assert _track(0, 60, 120).position_at(START + 60) == (57.06, 18.06)
+
+def test_interpolates_between_points():
+    lat, lon = _track(0, 100).position_at(START + 25)
+    assert lat == pytest.approx(57.025)
+    assert lon == pytest.approx(18.025)
+
+def test_gap_larger_than_max_gap_uses_nearest_point():
+    gap = MAX_TRACK_GAP_S + 100
+    track = _track(0, gap)
+    assert track.position_at(START + 30) == (57.0, 18.0)
+    assert track.position_at(START + gap - 30) == track.position_at(START + gap)
+    # Mitt i luckan är båda punkterna för långt bort
+    assert track.position_at(START + gap / 2) is None
+
+def test_without_interpolation_the_nearest_point_is_used():
+    track = _track(0, 100)
+    assert track.position_at(START + 40, interpolate=False) == (57.0, 18.0)
+    assert track.position_at(START + 60, interpolate=False) == (57.1, 18.1)
+
+def test_before_and_after_the_track():
+    track = _track(0, 60)
+    assert track.position_at(START - MAX_POINT_DISTANCE_S) == (57.0, 18.0)
+    assert track.position_at(START - MAX_POINT_DISTANCE_S - 1) is None
+    assert track.position_at(START + 60 + MAX_POINT_DISTANCE_S) == (57.06, 18.06)
+    assert track.position_at(START + 60 + MAX_POINT_DISTANCE_S + 1) is None
+
+def test_empty_track_and_unsorted_points():
+    assert GpxTrack([]).position_at(START) is None
+    track = GpxTrack([(START + 100, 1.0, 1.0), (START, 0.0, 0.0)])
+    assert track.position_at(START + 50) == (0.5, 0.5)
@@ -0,0 +1,35 @@
+# tests/test_http_client.py
+import pytest
+
+pytest.importorskip("requests")
+from urllib3.util import retry as urllib3_retry
+
+from filetagger.core import http_client
+
+def _retry(session):
+    return session.get_adapter("https://example.com").max_retries
+
+def test_retry_caps_backoff():
+    retry = _retry(http_client._create_session())
+    assert retry.total == http_client.MAX_RETRIES
+    assert retry.allowed_methods == frozenset({"GET"})
+    assert getattr(retry, "backoff_max", type(retry).DEFAULT_BACKOFF_MAX) == http_client.RETRY_BACKOFF_MAX
+
+def test_retry_on_urllib3_without_backoff_max(monkeypatch):
+    original = urllib3_retry.Retry
+    if not hasattr(original(), "backoff_max"):
+        pytest.skip("urllib3 1.x är installerat; reservvägen testas redan av test_retry_caps_backoff")
+    default_max = original.DEFAULT_BACKOFF_MAX
+
+    class OldRetry(original):
+        """Som Retry i urllib3 1.x: tar inte emot backoff_max utan läser taket från klassen."""
+        def __init__(self, **options):
+            super().__init__(backoff_max=type(self).DEFAULT_BACKOFF_MAX, **options)
+
+    monkeypatch.setattr(urllib3_retry, "Retry", OldRetry)
+    retry = _retry(http_client._create_session())
+    assert isinstance(retry, OldRetry)
+    assert type(retry).DEFAULT_BACKOFF_MAX == http_client.RETRY_BACKOFF_MAX
+    assert retry.backoff_max == http_client.RETRY_BACKOFF_MAX
+    # Taket ändras bara för programmets egna anrop
+    assert OldRetry.DEFAULT_BACKOFF_MAX == original.DEFAULT_BACKOFF_MAX == default_max
@@ -0,0 +1,68 @@
+# tests/test_operation_journal.py
+import json
+
+from filetagger.core import operation_journal
+from filetagger.core.operation_journal import OperationJournal
+
+def _ids(operations):
+    return [operation.op_id for operation in operations]
+
+def _reopen(journal):
+    journal.close()
+    return OperationJournal(journal.path)
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    journal = OperationJournal(path)
+    journal.record("rename", "a", moves=[("a", "b")])
+    journal.record("rename", "b", moves=[("b", "c")])
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "do", "id": 3, "kind": "ren')
+
+    journal = OperationJournal(path)
+    assert _ids(journal.undo_stack) == [1, 2]
+    assert journal.next_id == 3
+
+    # Nästa ändring får inte hamna på samma rad som den trasiga
+    journal.record("rename", "c", moves=[("c", "d")])
+    journal = _reopen(journal)
+    assert _ids(journal.undo_stack) == [1, 2, 3]
+    assert journal.undo_stack[-1].moves == [("c", "d")]
+
+def test_undo_and_redo_survive_restart(tmp_path):
+    journal = OperationJournal(str(tmp_path / "history.jsonl"))
+    for name in "abc":
+        journal.record("rename", name)
+    journal.mark_undone(journal.undo_stack[-1])
+    journal.mark_undone(journal.undo_stack[-1])
+    journal.mark_redone(journal.redo_stack[-1])
+    journal = _reopen(journal)
+    assert _ids(journal.undo_stack) == [1, 2]
+    assert _ids(journal.redo_stack) == [3]
+
+def test_compaction_keeps_undo_and_redo_stacks(tmp_path, monkeypatch):
+    monkeypatch.setattr(operation_journal, "MAX_UNDO_STEPS", 3)
+    monkeypatch.setattr(operation_journal, "COMPACT_AFTER_LINES", 5)
+    path = str(tmp_path / "history.jsonl")
+    journal = OperationJournal(path)
+    for name in "abcdef":
+        journal.record("metadata", name, changes=[(name, {}, {"title": name})])
+    journal.mark_undone(journal.undo_stack[-1])
+    journal.mark_undone(journal.undo_stack[-1])
+    journal = _reopen(journal)
+
+    with open(path, encoding="utf-8") as f:
+        entries = [json.loads(line) for line in f]
+    # Bara de tre senaste stegen finns kvar, varav två ångrade
+    assert [(entry["op"], entry["id"]) for entry in entries] == [
+        ("do", 4), ("do", 5), ("do", 6), ("undo", 6), ("undo", 5)
+    ]
+    assert _ids(journal.undo_stack) == [4]
+    assert _ids(journal.redo_stack) == [6, 5]
+    assert journal.redo_stack[-1].changes == [("e", {}, {"title": "e"})]
+
+    journal.record("rename", "g")
+    journal = _reopen(journal)
+    assert _ids(journal.undo_stack) == [4, 7]
+    assert journal.redo_stack == []
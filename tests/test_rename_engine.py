@@ -0,0 +1,173 @@
+# tests/test_rename_engine.py
+import errno
+import os
+import threading
+
+import pytest
+
+from filetagger.core.rename_engine import RenameJournal, _run_steps, plan_moves
+
+def _touch(directory, *names):
+    for name in names:
+        open(os.path.join(directory, name), "w").close()
+    return [os.path.join(directory, name) for name in names]
+
+def _run(plan):
+    for old_path, new_path in plan.steps:
+        os.rename(old_path, new_path)
+
+def test_swap_goes_through_temporary_names(tmp_path):
+    a, b = _touch(tmp_path, "A.jpg", "B.jpg")
+    with open(a, "w") as f:
+        f.write("a")
+    plan = plan_moves([(a, b), (b, a)])
+    assert plan.conflicts == []
+    assert sorted(plan.moves) == sorted([(a, b), (b, a)])
+    assert len(plan.steps) == 4
+    assert all(new_path.endswith(".renaming") for _, new_path in plan.steps[:2])
+    _run(plan)
+    assert sorted(os.listdir(tmp_path)) == ["A.jpg", "B.jpg"]
+    with open(b) as f:
+        assert f.read() == "a"
+
+def test_cycle_of_three(tmp_path):
+    a, b, c = _touch(tmp_path, "a.jpg", "b.jpg", "c.jpg")
+    for path in (a, b, c):
+        with open(path, "w") as f:
+            f.write(os.path.basename(path))
+    plan = plan_moves([(a, b), (b, c), (c, a)])
+    assert plan.conflicts == []
+    _run(plan)
+    contents = {}
+    for name in os.listdir(tmp_path):
+        with open(os.path.join(tmp_path, name)) as f:
+            contents[name] = f.read()
+    assert contents == {"a.jpg": "c.jpg", "b.jpg": "a.jpg", "c.jpg": "b.jpg"}
+
+def test_chain_into_a_name_that_is_freed(tmp_path):
+    a, b = _touch(tmp_path, "a.jpg", "b.jpg")
+    c = os.path.join(tmp_path, "c.jpg")
+    plan = plan_moves([(a, b), (b, c)])
+    assert plan.conflicts == []
+    _run(plan)
+    assert sorted(os.listdir(tmp_path)) == ["b.jpg", "c.jpg"]
+
+def test_existing_target_is_a_conflict(tmp_path):
+    a, b = _touch(tmp_path, "a.jpg", "b.jpg")
+    plan = plan_moves([(a, b)])
+    assert plan.moves == []
+    assert [path for path, _ in plan.conflicts] == [a]
+
+def test_two_files_with_the_same_target(tmp_path):
+    a, b = _touch(tmp_path, "a.jpg", "b.jpg")
+    c = os.path.join(tmp_path, "c.jpg")
+    plan = plan_moves([(a, c), (b, c)])
+    assert plan.moves == [(a, c)]
+    assert [path for path, _ in plan.conflicts] == [b]
+
+def test_move_blocked_by_a_conflicting_file_is_dropped(tmp_path):
+    # b kan inte bli c eftersom c finns, så a kan inte heller bli b
+    a, b, c = _touch(tmp_path, "a.jpg", "b.jpg", "c.jpg")
+    plan = plan_moves([(a, b), (b, c)])
+    assert plan.moves == []
+    assert sorted(path for path, _ in plan.conflicts) == [a, b]
+
+def test_move_to_new_directory(tmp_path):
+    (a,) = _touch(tmp_path, "a.jpg")
+    target = os.path.join(tmp_path, "Arkiv", "a.jpg")
+    plan = plan_moves([(a, target)])
+    assert plan.conflicts == []
+    assert plan.steps == [(a, target)]
+
+# ----- Genomförande och återställning -----
+
+def _contents(directory):
+    result = {}
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            with open(path) as f:
+                result[name] = f.read()
+    return result
+
+def _write(directory, **files):
+    for name, text in files.items():
+        with open(os.path.join(directory, name), "w") as f:
+            f.write(text)
+
+@pytest.fixture
+def journal_dir(tmp_path, monkeypatch):
+    directory = str(tmp_path / "journal")
+    create = RenameJournal.create
+    monkeypatch.setattr(RenameJournal, "create",
+                        lambda description, steps: create(description, steps, journal_dir=directory))
+    return directory
+
+def _fail_rename_of(monkeypatch, failing_name):
+    """Låter första os.rename från failing_name misslyckas; återställningen får lyckas."""
+    real_rename = os.rename
+    failed = []
+
+    def rename(src, dst):
+        if os.path.basename(src) == failing_name and not failed:
+            failed.append(src)
+            raise PermissionError(errno.EACCES, "Åtkomst nekad", src)
+        real_rename(src, dst)
+    monkeypatch.setattr(os, "rename", rename)
+
+def test_failed_step_undoes_the_steps_already_done(tmp_path, journal_dir, monkeypatch):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    _write(photos, **{"a.jpg": "a", "b.jpg": "b", "c.jpg": "c"})
+    plan = plan_moves([(str(photos / name), str(photos / f"x_{name}")) for name in ("a.jpg", "b.jpg", "c.jpg")])
+    _fail_rename_of(monkeypatch, "c.jpg")
+
+    result_kind, (error, failures) = _run_steps(plan.steps, "test", threading.Event(), lambda done, copied: None)
+    assert result_kind == "error"
+    assert error.startswith("c.jpg")
+    assert failures == []
+    assert _contents(photos) == {"a.jpg": "a", "b.jpg": "b", "c.jpg": "c"}
+    assert RenameJournal.pending(journal_dir) == []
+
+def test_failed_swap_restores_staged_files(tmp_path, journal_dir, monkeypatch):
+    _write(tmp_path, **{"A.jpg": "a", "B.jpg": "b"})
+    plan = plan_moves([(str(tmp_path / "A.jpg"), str(tmp_path / "B.jpg")),
+                       (str(tmp_path / "B.jpg"), str(tmp_path / "A.jpg"))])
+    # Sista steget flyttar B:s temporära namn till A
+    _fail_rename_of(monkeypatch, os.path.basename(plan.steps[-1][0]))
+
+    result_kind, (_, failures) = _run_steps(plan.steps, "byte", threading.Event(), lambda done, copied: None)
+    assert result_kind == "error"
+    assert failures == []
+    assert _contents(tmp_path) == {"A.jpg": "a", "B.jpg": "b"}
+
+def test_cancel_undoes_the_steps_already_done(tmp_path, journal_dir):
+    _write(tmp_path, **{"a.jpg": "a", "b.jpg": "b"})
+    plan = plan_moves([(str(tmp_path / "a.jpg"), str(tmp_path / "a2.jpg")),
+                       (str(tmp_path / "b.jpg"), str(tmp_path / "b2.jpg"))])
+    cancel_event = threading.Event()
+
+    result_kind, _ = _run_steps(plan.steps, "test", cancel_event, lambda done, copied: cancel_event.set())
+    assert result_kind == "aborted"
+    assert _contents(tmp_path) == {"a.jpg": "a", "b.jpg": "b"}
+
+def test_journal_rolls_back_a_swap_interrupted_by_a_crash(tmp_path):
+    photos = tmp_path / "photos"
+    photos.mkdir()
+    _write(photos, **{"A.jpg": "a", "B.jpg": "b"})
+    plan = plan_moves([(str(photos / "A.jpg"), str(photos / "B.jpg")),
+                       (str(photos / "B.jpg"), str(photos / "A.jpg"))])
+    directory = str(tmp_path / "journal")
+    RenameJournal.create("byte", plan.steps, journal_dir=directory)
+    # Programmet dör efter tre av fyra steg: A har sitt nya namn och B ligger kvar under sitt temporära
+    for old_path, new_path in plan.steps[:3]:
+        os.rename(old_path, new_path)
+    assert sorted(_contents(photos)) == sorted(["B.jpg", os.path.basename(plan.steps[1][1])])
+
+    (journal,) = RenameJournal.pending(directory)
+    assert journal.description() == "byte"
+    assert journal.step_count() == 4
+    assert journal.rollback() == (3, [])
+    assert _contents(photos) == {"A.jpg": "a", "B.jpg": "b"}
+    journal.discard()
+    assert RenameJournal.pending(directory) == []